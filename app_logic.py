@@ -1,20 +1,78 @@
-from database import Database
+import sqlite3
+from database import Database, HISTORY_PAGE_SIZE
+from cache import LRUCache
+from autocomplete import PrefixIndex, DEFAULT_COMPLETIONS_COUNT
+import suggestions
+import history_export
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class ChangeSet:
+    """Изменения строк текущего списка после операции AppLogic.
+
+    inserted и updated содержат строки в формате get_shopping_list,
+    removed - id товаров, которые больше не показываются в списке.
+    reset означает, что список нужно перечитать целиком. list_id - список,
+    к которому относятся изменения (None - неизвестен).
+    """
+
+    def __init__(self, inserted=None, updated=None, removed=None, reset=False, list_id=None):
+        self.inserted = inserted or []
+        self.updated = updated or []
+        self.removed = removed or []
+        self.reset = reset
+        self.list_id = list_id
+
+    def is_empty(self):
+        return not (self.inserted or self.updated or self.removed or self.reset)
 
 
 class AppLogic:
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db=None):
+        self.db = db or Database()
         self.current_list_id = None
+        # Кэш редко меняющихся данных списков; сбрасывается методами записи
+        self.cache = LRUCache()
+        # Индексы автодополнения по спискам; строятся одним запросом и дополняются при добавлении
+        self.name_indexes = {}
+
+    def _list_id(self, list_id):
+        # Фоновые вызовы получают list_id, зафиксированный при постановке в очередь
+        return self.current_list_id if list_id is None else list_id
+
+    def _cached(self, scope, scope_id, kind, loader):
+        return self.cache.get_or_load((scope, scope_id, kind), loader)
+
+    def _invalidate_list(self, list_id):
+        if list_id:
+            self.cache.invalidate("list", list_id)
+
+    def _invalidate_user_lists(self):
+        self.cache.invalidate("user", self.db.get_current_user_id())
+
+    def get_cache_stats(self):
+        """Возвращает счетчики попаданий и промахов кэша"""
+        return self.cache.get_stats()
+
+    def ensure_password_hasher(self):
+        """Калибровка хеширования паролей при первом запуске; медленная, вызывается в фоне"""
+        self.db.ensure_password_hasher()
 
     def register_user(self, username, password):
         return self.db.register_user(username, password)
 
     def login_user(self, username, password):
+        self.cache.clear()
+        self.name_indexes.clear()
         return self.db.login_user(username, password)
 
     def logout_user(self):
         self.db.logout_user()
         self.current_list_id = None
+        self.cache.clear()
+        self.name_indexes.clear()
 
     def is_logged_in(self):
         return self.db.is_logged_in()
@@ -32,6 +90,7 @@ class AppLogic:
 
         list_id = self.db.create_shopping_list(list_name)
         if list_id:
+            self._invalidate_user_lists()
             self.current_list_id = list_id
             return list_id, f"Список '{list_name}' создан"
         return None, "Ошибка создания списка"
@@ -41,35 +100,42 @@ class AppLogic:
             return "Сначала войдите в систему"
 
         # Очищаем код от пробелов и приводим к верхнему регистру
-        share_code = share_code.strip().upper()
+        share_code = self.db.normalize_share_code(share_code)
 
         if len(share_code) != 8:
+            logger.warning("Неверная длина кода списка: %s", len(share_code))
             return "Код должен содержать 8 символов"
 
         success = self.db.join_shopping_list(share_code)
         if success:
+            self._invalidate_user_lists()
             # Находим ID списка по коду и устанавливаем как текущий
             lists = self.db.get_user_shopping_lists()
             for list_data in lists:
                 list_id, list_name, owner_id, owner_name, list_share_code = list_data
-                if list_share_code.upper() == share_code:
+                if list_share_code == share_code:
+                    self._invalidate_list(list_id)
                     self.current_list_id = list_id
+                    # Товары списка, созданного на другом устройстве, приходят с сервера
+                    self.sync_current_list(list_id=list_id)
                     break
             return "Вы успешно присоединились к списку"
+        logger.info("Не удалось присоединиться к списку по коду %s", share_code)
         return "Не удалось присоединиться к списку. Проверьте код."
 
     def get_user_lists(self):
         if not self.is_logged_in():
             return []
-        return self.db.get_user_shopping_lists()
+        return self._cached("user", self.db.get_current_user_id(), "lists", self.db.get_user_shopping_lists)
 
     def set_current_list(self, list_id):
         self.current_list_id = list_id
 
-    def get_current_list_info(self):
-        if not self.current_list_id:
+    def get_current_list_info(self, list_id=None):
+        list_id = self._list_id(list_id)
+        if not list_id:
             return None
-        return self.db.get_list_info(self.current_list_id)
+        return self._cached("list", list_id, "info", lambda: self.db.get_list_info(list_id))
 
     def delete_shopping_list(self, list_id):
         if not self.is_logged_in():
@@ -77,80 +143,282 @@ class AppLogic:
 
         success = self.db.delete_shopping_list(list_id)
         if success:
+            self._invalidate_list(list_id)
+            self._invalidate_user_lists()
+            self.name_indexes.pop(list_id, None)
             if self.current_list_id == list_id:
                 self.current_list_id = None
             return "Список удален"
         return "Ошибка удаления списка"
 
-    def add_item(self, product_name, category='Другое'):
-        if not self.is_logged_in():
-            return "Сначала войдите в систему"
-        if not self.current_list_id:
-            return "Выберите или создайте список покупок"
+    def predict_category(self, product_name):
+        """Возвращает вероятную категорию товара по названию или None"""
+        if not product_name.strip():
+            return None
+        return self.db.predict_category(product_name)
+
+    def _category_for(self, product_name, category):
+        return category or self.predict_category(product_name) or 'Другое'
+
+    def add_item(self, product_name, category=None, list_id=None):
+        """Добавляет товар в текущий список, возвращает (сообщение, ChangeSet).
 
-        success = self.db.add_product(self.current_list_id, product_name, category)
-        return f"'{product_name}' добавлен" if success else "Ошибка"
+        Без category категория предсказывается по названию.
+        """
+        list_id = self._list_id(list_id)
+        if not self.is_logged_in():
+            return "Сначала войдите в систему", ChangeSet()
+        if not list_id:
+            return "Выберите или создайте список покупок", ChangeSet()
+
+        product_id = self.db.add_product(list_id, product_name, self._category_for(product_name, category))
+        self._invalidate_list(list_id)
+        if not product_id:
+            return "Ошибка", ChangeSet()
+        self._remember_names(list_id, [product_name])
+        return f"'{product_name}' добавлен", self._inserted_item_changes(product_id, list_id)
+
+    def add_items(self, product_names, category=None, list_id=None):
+        """Добавляет несколько товаров одной транзакцией, возвращает (сообщение, ChangeSet).
+
+        Без category категория предсказывается для каждого товара отдельно.
+        """
+        list_id = self._list_id(list_id)
+        if not self.is_logged_in():
+            return "Сначала войдите в систему", ChangeSet()
+        if not list_id:
+            return "Выберите или создайте список покупок", ChangeSet()
+
+        names = [name.strip() for name in product_names if name.strip()]
+        if not names:
+            return "Нет товаров для добавления", ChangeSet()
+
+        products = self.db.add_products(
+            list_id, [(name, self._category_for(name, category)) for name in names]
+        )
+        self._invalidate_list(list_id)
+        if not products:
+            return "Ошибка", ChangeSet()
+        self._remember_names(list_id, names)
+        return f"Добавлено товаров: {len(products)}", ChangeSet(inserted=products, list_id=list_id)
+
+    def _inserted_item_changes(self, product_id, list_id):
+        row = self.db.get_item(product_id)
+        return ChangeSet(inserted=[row], list_id=list_id) if row else ChangeSet(reset=True, list_id=list_id)
+
+    def _name_index(self, list_id):
+        index = self.name_indexes.get(list_id)
+        if index is None:
+            index = PrefixIndex(self.db.get_product_names(list_id))
+            self.name_indexes[list_id] = index
+        return index
+
+    def _remember_names(self, list_id, product_names):
+        # Индекс дополняется, только если он уже построен для этого списка
+        index = self.name_indexes.get(list_id)
+        if index is not None:
+            for product_name in product_names:
+                index.add(product_name)
+
+    def complete_product_name(self, prefix, limit=DEFAULT_COMPLETIONS_COUNT, list_id=None):
+        """Возвращает названия товаров текущего списка, начинающиеся с prefix"""
+        list_id = self._list_id(list_id)
+        if not self.is_logged_in() or not list_id:
+            return []
+        return self._name_index(list_id).complete(prefix, limit)
 
-    def get_current_list(self):
-        if not self.is_logged_in() or not self.current_list_id:
+    def get_current_list(self, list_id=None):
+        list_id = self._list_id(list_id)
+        if not self.is_logged_in() or not list_id:
             return []
-        return self.db.get_shopping_list(self.current_list_id)
+        return self._cached("list", list_id, "items", lambda: self.db.get_shopping_list(list_id))
 
     def toggle_bought(self, product_id):
+        """Переключает статус покупки, возвращает (сообщение, ChangeSet)"""
         if not self.is_logged_in():
-            return "Сначала войдите в систему"
+            return "Сначала войдите в систему", ChangeSet()
 
+        # Товар может быть не из текущего списка (после синхронизации или переключения)
+        list_id = self.db.get_item_list_id(product_id)
         success = self.db.toggle_bought_status(product_id)
-        return "Статус товара изменен" if success else "Ошибка"
+        self._invalidate_list(list_id)
+        if not success:
+            return "Ошибка", ChangeSet()
+
+        # В списке показываются только некупленные товары
+        row = self.db.get_item(product_id)
+        if row is None or row[5] is not None:
+            changes = ChangeSet(removed=[product_id], list_id=list_id)
+        else:
+            changes = ChangeSet(inserted=[row], list_id=list_id)
+        return "Статус товара изменен", changes
+
+    def move_item(self, product_id, new_index):
+        """Перемещает товар на позицию new_index, возвращает (сообщение, ChangeSet)"""
+        if not self.is_logged_in():
+            return "Сначала войдите в систему", ChangeSet()
+
+        list_id = self.db.get_item_list_id(product_id)
+        changed = self.db.move_product(product_id, new_index)
+        self._invalidate_list(list_id)
+        if not changed:
+            return "Ошибка", ChangeSet()
+        if changed > 1:
+            # Список был перенумерован: sort_order изменился у всех строк
+            return "Товар перемещен", ChangeSet(reset=True, list_id=list_id)
+
+        row = self.db.get_item(product_id)
+        if row is None:
+            return "Товар перемещен", ChangeSet(reset=True, list_id=list_id)
+        return "Товар перемещен", ChangeSet(removed=[product_id], inserted=[row], list_id=list_id)
 
     def delete_item(self, product_id):
+        """Удаляет товар, возвращает (сообщение, ChangeSet)"""
         if not self.is_logged_in():
-            return "Сначала войдите в систему"
+            return "Сначала войдите в систему", ChangeSet()
+        # Список запоминается до удаления строки
+        list_id = self.db.get_item_list_id(product_id)
         success = self.db.delete_product(product_id)
-        return "Товар удален" if success else "Ошибка"
-
-    def clear_all_items(self):
-        if not self.is_logged_in() or not self.current_list_id:
-            return "Сначала войдите в систему и выберите список"
-        count = self.db.clear_shopping_list(self.current_list_id)
-        return f"Список очищен, удалено {count} товаров"
-
-    def get_purchase_history(self):
+        self._invalidate_list(list_id)
+        if not success:
+            return "Ошибка", ChangeSet()
+        return "Товар удален", ChangeSet(removed=[product_id], list_id=list_id)
+
+    def clear_all_items(self, list_id=None):
+        """Очищает текущий список, возвращает (сообщение, ChangeSet)"""
+        list_id = self._list_id(list_id)
+        if not self.is_logged_in() or not list_id:
+            return "Сначала войдите в систему и выберите список", ChangeSet()
+        count = self.db.clear_shopping_list(list_id)
+        self._invalidate_list(list_id)
+        return f"Список очищен, удалено {count} товаров", ChangeSet(reset=True, list_id=list_id)
+
+    def get_purchase_history(self, list_id=None):
         """Возвращает историю покупок для текущего списка"""
-        if not self.is_logged_in() or not self.current_list_id:
+        list_id = self._list_id(list_id)
+        if not self.is_logged_in() or not list_id:
             return []
-        history = self.db.get_purchase_history(self.current_list_id)
+        history = self.db.get_purchase_history(list_id)
         return history
 
-    def get_smart_suggestions(self):
-        """Возвращает умные предложения для текущего списка"""
-        if not self.is_logged_in() or not self.current_list_id:
+    def get_purchase_history_page(self, cursor=None, limit=HISTORY_PAGE_SIZE, list_id=None):
+        """Возвращает страницу истории текущего списка: (строки, next_cursor)"""
+        list_id = self._list_id(list_id)
+        if not self.is_logged_in() or not list_id:
+            return [], None
+        return self.db.get_purchase_history_page(list_id, cursor, limit)
+
+    def export_history(self, path, fmt="csv", date_from=None, date_to=None, compress=False, list_id=None):
+        """Потоково выгружает историю текущего списка в файл CSV или JSON Lines.
+
+        date_from и date_to - даты 'ГГГГ-ММ-ДД' (включительно) или полные
+        отметки времени. Возвращает сообщение о результате.
+        """
+        list_id = self._list_id(list_id)
+        if not self.is_logged_in() or not list_id:
+            return "Сначала войдите в систему и выберите список"
+
+        try:
+            rows = self.db.iter_purchase_history(
+                list_id,
+                history_export.date_bound(date_from),
+                history_export.date_bound(date_to, end_of_day=True)
+            )
+            count = history_export.export_rows(rows, path, fmt, compress)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            logger.error("Ошибка экспорта истории: %s", e)
+            return "Ошибка экспорта истории"
+        return f"Экспортировано записей: {count}"
+
+    def search(self, text, offset=0):
+        """Ищет товары и покупки во всех списках пользователя: (строки, next_offset)"""
+        if not self.is_logged_in():
+            return [], None
+        return self.db.search(text, offset)
+
+    def sync_enabled(self):
+        return self.db.sync_client is not None
+
+    def sync_current_list(self, wait=0, list_id=None):
+        """Синхронизирует текущий список с сервером, возвращает (сообщение, ChangeSet).
+
+        wait - сколько секунд сервер может ждать изменений других участников.
+        Тот же обмен по шагам: start_sync, exchange_sync, finish_sync -
+        AsyncAppLogic выполняет сетевой запрос вне рабочего потока.
+        """
+        request, result = self.start_sync(list_id)
+        if request is None:
+            return result
+        return self.finish_sync(request, self.exchange_sync(request, wait))
+
+    def start_sync(self, list_id=None):
+        """Возвращает (запрос к серверу, None) или (None, результат sync_current_list)"""
+        list_id = self._list_id(list_id)
+        if not self.is_logged_in() or not list_id:
+            return None, ("Сначала войдите в систему и выберите список", ChangeSet())
+        if not self.sync_enabled():
+            return None, ("Сервер синхронизации не задан", ChangeSet())
+
+        request = self.db.start_sync(list_id)
+        if request is None:
+            return None, ("Сервер синхронизации недоступен", ChangeSet())
+        return request, None
+
+    def exchange_sync(self, request, wait=0):
+        return self.db.exchange_sync(request, wait)
+
+    def finish_sync(self, request, response):
+        applied = self.db.finish_sync(request, response)
+        if applied is None:
+            return "Сервер синхронизации недоступен", ChangeSet()
+        if not applied:
+            return "Новых изменений нет", ChangeSet()
+        self._invalidate_list(request.list_id)
+        self.name_indexes.pop(request.list_id, None)
+        return f"Получено изменений: {applied}", ChangeSet(reset=True, list_id=request.list_id)
+
+    def get_smart_suggestions(self, k=suggestions.DEFAULT_SUGGESTIONS_COUNT, list_id=None):
+        """Возвращает k предложений для текущего списка: (название, число покупок, пора_купить)"""
+        list_id = self._list_id(list_id)
+        if not self.is_logged_in() or not list_id:
             return []
-        suggestions = self.db.get_smart_suggestions(self.current_list_id)
-        return suggestions
+        stats_rows = self.db.get_product_stats(list_id)
+        return suggestions.rank_products(stats_rows, k=k)
 
-    def get_last_purchased_product(self):
+    def get_last_purchased_product(self, list_id=None):
         """Возвращает последний купленный товар для текущего списка"""
-        if not self.is_logged_in() or not self.current_list_id:
+        list_id = self._list_id(list_id)
+        if not self.is_logged_in() or not list_id:
             return None
-        last_product = self.db.get_last_purchased_product(self.current_list_id)
-        return last_product
-
-    def add_suggestion(self, product_name):
-        if not self.is_logged_in() or not self.current_list_id:
-            return "Сначала войдите в систему и выберите список"
-        success = self.db.add_suggestion_to_list(self.current_list_id, product_name)
-        return f"'{product_name}' добавлен в список" if success else "Ошибка"
-
-    def get_list_members(self):
-        if not self.current_list_id:
+        return self._cached("list", list_id, "last_purchased", lambda: self.db.get_last_purchased_product(list_id))
+
+    def add_suggestion(self, product_name, list_id=None):
+        """Добавляет предложенный товар, возвращает (сообщение, ChangeSet)"""
+        list_id = self._list_id(list_id)
+        if not self.is_logged_in() or not list_id:
+            return "Сначала войдите в систему и выберите список", ChangeSet()
+        product_id = self.db.add_suggestion_to_list(list_id, product_name)
+        self._invalidate_list(list_id)
+        if not product_id:
+            return "Ошибка", ChangeSet()
+        self._remember_names(list_id, [product_name])
+        return f"'{product_name}' добавлен в список", self._inserted_item_changes(product_id, list_id)
+
+    def get_list_members(self, list_id=None):
+        list_id = self._list_id(list_id)
+        if not list_id:
             return []
-        return self.db.get_list_members(self.current_list_id)
+        return self._cached("list", list_id, "members", lambda: self.db.get_list_members(list_id))
 
-    def leave_current_list(self):
-        if self.current_list_id:
-            self.db.leave_shopping_list(self.current_list_id)
-            self.current_list_id = None
+    def leave_current_list(self, list_id=None):
+        list_id = self._list_id(list_id)
+        if list_id:
+            self.db.leave_shopping_list(list_id)
+            self._invalidate_list(list_id)
+            self.name_indexes.pop(list_id, None)
+            self._invalidate_user_lists()
+            if self.current_list_id == list_id:
+                self.current_list_id = None
         return "Вы вышли из списка"
 
     def get_quick_categories(self):
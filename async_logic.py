@@ -0,0 +1,108 @@
+import functools
+import inspect
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class AsyncAppLogic:
+    """Фоновое выполнение методов AppLogic.
+
+    Любой метод AppLogic доступен под тем же именем и принимает те же
+    аргументы плюс callback и error_callback. Метод сразу возвращает Future,
+    а колбэки передаются в schedule - UI подставляет туда Clock.schedule_once,
+    чтобы результат обрабатывался в главном потоке.
+
+    По умолчанию используется один рабочий поток: операции выполняются
+    строго в порядке вызова, как и при синхронной работе. Исключение -
+    сетевой запрос sync_current_list: он идет в отдельном потоке и не
+    задерживает локальные операции, а подготовка и применение ответа
+    выполняются в рабочем потоке в общей очереди.
+
+    Методам с параметром list_id, если он не передан явно, подставляется
+    текущий список на момент вызова: переключение списка, пока операция
+    ждет в очереди, не перенаправляет ее в другой список.
+    """
+
+    def __init__(self, logic, schedule=None, max_workers=1):
+        self.logic = logic
+        self.schedule = schedule or (lambda func: func())
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self.sync_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sync-worker")
+        self.signatures = {}
+
+    def _with_list_id(self, method_name, method, args, kwargs):
+        signature = self.signatures.get(method_name)
+        if signature is None:
+            signature = self.signatures[method_name] = inspect.signature(method)
+        if "list_id" in signature.parameters and "list_id" not in signature.bind_partial(*args, **kwargs).arguments:
+            kwargs = dict(kwargs, list_id=self.logic.current_list_id)
+        return kwargs
+
+    def submit(self, method_name, *args, callback=None, error_callback=None, **kwargs):
+        method = getattr(self.logic, method_name)
+        kwargs = self._with_list_id(method_name, method, args, kwargs)
+        future = self.executor.submit(method, *args, **kwargs)
+        future.add_done_callback(
+            lambda done: self._dispatch(done, method_name, callback, error_callback)
+        )
+        return future
+
+    def sync_current_list(self, wait=0, list_id=None, callback=None, error_callback=None):
+        """AppLogic.sync_current_list по шагам: сетевой запрос - в потоке синхронизации"""
+        if list_id is None:
+            list_id = self.logic.current_list_id
+        future = Future()
+        future.add_done_callback(
+            lambda done: self._dispatch(done, "sync_current_list", callback, error_callback)
+        )
+
+        def run(executor, step, *args):
+            def call():
+                try:
+                    step(*args)
+                except Exception as e:
+                    future.set_exception(e)
+            executor.submit(call)
+
+        def start():
+            request, result = self.logic.start_sync(list_id)
+            if request is None:
+                future.set_result(result)
+            else:
+                run(self.sync_executor, exchange, request)
+
+        def exchange(request):
+            response = self.logic.exchange_sync(request, wait)
+            run(self.executor, finish, request, response)
+
+        def finish(request, response):
+            future.set_result(self.logic.finish_sync(request, response))
+
+        run(self.executor, start)
+        return future
+
+    def _dispatch(self, future, method_name, callback, error_callback):
+        error = future.exception()
+        if error is not None:
+            if error_callback:
+                self.schedule(lambda: error_callback(error))
+            else:
+                logger.error("Ошибка фоновой операции %s: %s", method_name, error)
+            return
+
+        if callback:
+            result = future.result()
+            self.schedule(lambda: callback(result))
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+        self.sync_executor.shutdown(wait=wait)
+
+    def __getattr__(self, name):
+        attr = getattr(self.logic, name)
+        if not callable(attr):
+            raise AttributeError(f"{name} не является методом AppLogic")
+        return functools.partial(self.submit, name)
@@ -0,0 +1,60 @@
+"""Автодополнение названий товаров по префиксу.
+
+Названия хранятся в отсортированном массиве ключей без учета регистра;
+поиск по префиксу - это bisect до первого подходящего ключа и проход
+вперед, пока ключи начинаются с префикса. Поиск не обращается к базе,
+поэтому его можно выполнять на каждое нажатие клавиши.
+"""
+import bisect
+
+DEFAULT_COMPLETIONS_COUNT = 5
+
+
+def normalize(name):
+    return " ".join(name.split()).casefold()
+
+
+class PrefixIndex:
+    """Отсортированный индекс названий с поиском по префиксу"""
+
+    def __init__(self, names=()):
+        # Ключ без учета регистра -> название в том виде, как его ввели первым
+        self._names = {}
+        for name in names:
+            key = normalize(name)
+            if key and key not in self._names:
+                self._names[key] = name.strip()
+        self._keys = sorted(self._names)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, name):
+        return normalize(name) in self._names
+
+    def add(self, name):
+        """Добавляет название; возвращает False, если оно уже есть"""
+        key = normalize(name)
+        if not key or key in self._names:
+            return False
+        self._names[key] = name.strip()
+        bisect.insort(self._keys, key)
+        return True
+
+    def complete(self, prefix, limit=DEFAULT_COMPLETIONS_COUNT):
+        """Возвращает до limit названий, начинающихся с prefix, по алфавиту"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        results = []
+        index = bisect.bisect_left(self._keys, prefix)
+        while index < len(self._keys) and len(results) < limit:
+            key = self._keys[index]
+            if not key.startswith(prefix):
+                break
+            # Точное совпадение не подсказываем: название уже введено
+            if key != prefix:
+                results.append(self._names[key])
+            index += 1
+        return results
@@ -0,0 +1,221 @@
+"""Размер базы и скорость агрегатов до и после перехода на справочник товаров.
+
+Сначала создается база со схемой до миграции 9 (названия товаров и
+категорий текстом в каждой строке shopping_items и purchase_history) и
+заполняется синтетической историей за несколько лет. Каждая покупка, как
+в приложении, оставляет купленную строку в shopping_items и запись в
+purchase_history. Затем к базе применяется только миграция 9, которая
+переводит строки на справочники products и categories. До и после
+миграции (после VACUUM) замеряются размер файла, размер таблиц с
+индексами (dbstat) и время агрегатов по истории.
+
+    python bench_catalog.py --rows 600000 --years 6 --lists 4
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import database
+import passwords
+from database import Database
+from log_config import configure_logging
+from suggestions import DATE_FORMAT
+
+# Последняя версия схемы с названиями текстом и версия со справочником;
+# более поздние миграции (например, uid для синхронизации) не замеряются
+LEGACY_VERSION = 8
+CATALOG_VERSION = 9
+
+PRODUCT_WORDS = [
+    "Молоко", "Кефир", "Сметана", "Творог", "Сыр", "Йогурт", "Хлеб", "Батон", "Яблоки", "Бананы",
+    "Картофель", "Морковь", "Лук", "Помидоры", "Огурцы", "Курица", "Говядина", "Фарш", "Рис", "Гречка",
+    "Макароны", "Чай", "Кофе", "Сок", "Печенье",
+]
+PRODUCT_VARIANTS = [
+    "", "фермерский", "домашний", "отборный", "1 кг", "0.5 кг", "1 л", "0.9 л", "эконом", "био",
+    "большой", "в упаковке", "весовой", "органический", "3.2%", "2.5%", "цельный", "нарезанный",
+    "охлажденный", "замороженный", "местный", "импортный", "семейный", "мини",
+]
+CATEGORY_WORDS = [
+    "Молочные продукты", "Хлеб и выпечка", "Овощи", "Фрукты", "Мясо и птица", "Крупы", "Напитки",
+    "Сладости", "Бытовая химия", "Гигиена", "Заморозка", "Консервы",
+]
+
+LEGACY_QUERIES = {
+    "топ-10 товаров списка": """
+        SELECT product_name, COUNT(*) AS n FROM purchase_history
+        WHERE list_id = :list_id GROUP BY product_name ORDER BY n DESC LIMIT 10""",
+    "категория x год": """
+        SELECT category, substr(bought_date, 1, 4) AS year, COUNT(*) FROM purchase_history
+        GROUP BY category, year""",
+    "различных товаров": "SELECT COUNT(DISTINCT product_name) FROM purchase_history",
+}
+CATALOG_QUERIES = {
+    "топ-10 товаров списка": """
+        SELECT p.name, top.n FROM (
+            SELECT product_id, COUNT(*) AS n FROM purchase_history
+            WHERE list_id = :list_id GROUP BY product_id ORDER BY n DESC LIMIT 10
+        ) top JOIN products p ON p.id = top.product_id""",
+    "категория x год": """
+        SELECT c.name, totals.year, totals.n FROM (
+            SELECT category_id, substr(bought_date, 1, 4) AS year, COUNT(*) AS n FROM purchase_history
+            GROUP BY category_id, year
+        ) totals JOIN categories c ON c.id = totals.category_id""",
+    "различных товаров": "SELECT COUNT(DISTINCT product_id) FROM purchase_history",
+}
+TABLE_GROUPS = {
+    "purchase_history": ("purchase_history", "idx_history_"),
+    "shopping_items": ("shopping_items", "idx_items_"),
+}
+
+
+def catalog(products, categories):
+    names = [f"{word} {variant}".strip() for variant in PRODUCT_VARIANTS for word in PRODUCT_WORDS]
+    category_names = [f"{word} {index // len(CATEGORY_WORDS) + 1}" if index >= len(CATEGORY_WORDS) else word
+                      for index, word in enumerate(CATEGORY_WORDS * (categories // len(CATEGORY_WORDS) + 1))]
+    category_names = category_names[:categories]
+    return [(name, category_names[index % len(category_names)]) for index, name in enumerate(names[:products])]
+
+
+def open_database(path, max_version=None):
+    """Открывает базу; с max_version применяются только миграции не новее нее"""
+    migrations = database.MIGRATIONS
+    if max_version is not None:
+        database.MIGRATIONS = [migration for migration in migrations if migration[0] <= max_version]
+    try:
+        return Database(path, password_hasher=passwords.PBKDF2Hasher(passwords.PBKDF2Hasher.min_iterations))
+    finally:
+        database.MIGRATIONS = migrations
+
+
+def fill_legacy(path, args, batch_size=50000):
+    """Создает базу версии LEGACY_VERSION и заполняет ее историей покупок"""
+    db = open_database(path, LEGACY_VERSION)
+    rng = random.Random(0)
+    products = catalog(args.products, args.categories)
+    end = datetime.now()
+    start = end - timedelta(days=365 * args.years)
+    try:
+        for index in range(3):
+            db.register_user(f"user{index}", "password")
+        conn = db.get_connection()
+        try:
+            user_ids = [row[0] for row in conn.execute("SELECT id FROM users ORDER BY id")]
+            list_ids = []
+            for index in range(args.lists):
+                cursor = conn.execute("INSERT INTO shopping_lists (name, owner_id, share_code) VALUES (?, ?, ?)",
+                                      (f"Список {index + 1}", user_ids[0], f"CODE{index:04d}"))
+                list_ids.append(cursor.lastrowid)
+                conn.executemany("INSERT INTO list_members (list_id, user_id) VALUES (?, ?)",
+                                 [(cursor.lastrowid, user_id) for user_id in user_ids])
+
+            for offset in range(0, args.rows, batch_size):
+                items = []
+                history = []
+                for index in range(offset, min(offset + batch_size, args.rows)):
+                    list_id = rng.choice(list_ids)
+                    product_name, category = rng.choice(products)
+                    user_id = rng.choice(user_ids)
+                    bought = (start + (end - start) * rng.random()).strftime(DATE_FORMAT)
+                    items.append((list_id, product_name, category, index * 1024, user_id, user_id, bought))
+                    history.append((list_id, product_name, category, user_id, bought))
+                conn.executemany(
+                    """INSERT INTO shopping_items
+                       (list_id, product_name, category, sort_order, created_by, bought_by, bought_date)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)""", items)
+                conn.executemany(
+                    """INSERT INTO purchase_history (list_id, product_name, category, bought_by, bought_date)
+                       VALUES (?, ?, ?, ?, ?)""", history)
+            conn.commit()
+            return list_ids[0]
+        finally:
+            db.release_connection(conn)
+    finally:
+        db.close()
+
+
+def measure(path, queries, list_id, repeat, max_version=None):
+    """Возвращает (размер файла, размеры групп таблиц, время запросов) после VACUUM"""
+    db = open_database(path, max_version)
+    try:
+        conn = db.get_connection()
+        try:
+            conn.execute("VACUUM")
+            sizes = {}
+            for label, (table, index_prefix) in TABLE_GROUPS.items():
+                sizes[label] = conn.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = ? OR name LIKE ?", (table, index_prefix + "%")
+                ).fetchone()[0]
+            sizes["индекс поиска"] = conn.execute(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'search_index%'"
+            ).fetchone()[0] or 0
+
+            timings = {}
+            for label, sql in queries.items():
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    conn.execute(sql, {"list_id": list_id}).fetchall()
+                timings[label] = (time.perf_counter() - started) / repeat * 1000
+        finally:
+            db.release_connection(conn)
+    finally:
+        db.close()
+    # Соединения пула закрыты: WAL влит в основной файл
+    return os.path.getsize(path), sizes, timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Справочник товаров: размер базы и скорость агрегатов")
+    parser.add_argument("--rows", type=int, default=600000, help="Покупок в истории")
+    parser.add_argument("--years", type=int, default=6, help="Лет истории")
+    parser.add_argument("--lists", type=int, default=4, help="Число списков")
+    parser.add_argument("--products", type=int, default=600, help="Различных товаров")
+    parser.add_argument("--categories", type=int, default=24, help="Различных категорий")
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов каждого запроса")
+    args = parser.parse_args(argv)
+
+    configure_logging("ERROR")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "catalog.db")
+        started = time.perf_counter()
+        list_id = fill_legacy(path, args)
+        print(f"Синтетическая история: {args.rows} покупок за {args.years} лет, {args.lists} списка, "
+              f"{args.products} товаров, {args.categories} категорий ({time.perf_counter() - started:.1f} с)")
+
+        before = measure(path, LEGACY_QUERIES, list_id, args.repeat, LEGACY_VERSION)
+
+        started = time.perf_counter()
+        open_database(path, CATALOG_VERSION).close()
+        print(f"Миграция на справочник: {time.perf_counter() - started:.1f} с")
+
+        after = measure(path, CATALOG_QUERIES, list_id, args.repeat, CATALOG_VERSION)
+
+        db = open_database(path, CATALOG_VERSION)
+        try:
+            db.login_user("user0", "password")
+            started = time.perf_counter()
+            db.rebuild_product_stats()
+            rebuild = time.perf_counter() - started
+        finally:
+            db.close()
+
+        mib = 2 ** 20
+        print(f"\n{'':<30}{'до':>10}{'после':>10}")
+        print(f"{'файл, МБ':<30}{before[0] / mib:>10.1f}{after[0] / mib:>10.1f}")
+        # До миграции 9 индекс поиска пуст: она заполняет его впервые
+        print(f"{'файл без индекса поиска, МБ':<30}{(before[0] - before[1]['индекс поиска']) / mib:>10.1f}"
+              f"{(after[0] - after[1]['индекс поиска']) / mib:>10.1f}")
+        for label in before[1]:
+            print(f"{label + ', МБ':<30}{before[1][label] / mib:>10.1f}{after[1][label] / mib:>10.1f}")
+        for label in before[2]:
+            print(f"{label + ', мс':<30}{before[2][label]:>10.1f}{after[2][label]:>10.1f}")
+        print(f"{'rebuild_product_stats, с':<30}{'':>10}{rebuild:>10.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Пропускная способность массового импорта истории покупок.
+
+Генерируется CSV в формате history_export (--rows записей истории за два
+года от нескольких участников списка и --items некупленных товаров), затем
+файл загружается тем же путем, что и history_import.py: read_records ->
+Database.import_records. Замер повторяется для каждого профиля PRAGMA и
+размера пачки executemany. Для сравнения --legacy товаров добавляются
+по одному, как через AddItemScreen: add_product и toggle_bought_status.
+
+    python bench_import.py --rows 1000000 --profiles balanced fast
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import passwords
+from database import Database, IMPORT_BATCH_SIZE
+from history_export import EXPORT_FIELDS
+from history_import import read_records
+from log_config import configure_logging
+from suggestions import DATE_FORMAT
+
+MEMBERS = ["bench", "member1", "member2"]
+CATEGORIES = ["Молочные", "Хлеб", "Овощи", "Фрукты", "Мясо", "Напитки", "Другое"]
+
+
+def write_csv(path, rows, items, products, seed=0):
+    rng = random.Random(seed)
+    names = [(f"Товар {index}", CATEGORIES[index % len(CATEGORIES)]) for index in range(products)]
+    start = datetime.now() - timedelta(days=730)
+    with open(path, "w", encoding="utf-8", newline="") as output:
+        writer = csv.writer(output)
+        writer.writerow(EXPORT_FIELDS)
+        for index in range(rows + items):
+            product_name, category = rng.choice(names)
+            bought_date = ""
+            if index < rows:
+                bought_date = (start + timedelta(seconds=rng.uniform(0, 730 * 24 * 60 * 60))).strftime(DATE_FORMAT)
+            writer.writerow((product_name, category, rng.choice(MEMBERS), bought_date))
+
+
+def open_database(path, profile):
+    db = Database(path, pragma_profile=profile,
+                  password_hasher=passwords.PBKDF2Hasher(passwords.PBKDF2Hasher.min_iterations))
+    for username in MEMBERS:
+        db.register_user(username, username)
+    db.login_user("bench", "bench")
+    return db
+
+
+def run_import(directory, csv_path, profile, batch_size):
+    db = open_database(os.path.join(directory, f"import-{profile}-{batch_size}.db"), profile)
+    try:
+        list_id = db.create_shopping_list("Импорт")
+        started = time.perf_counter()
+        counts = db.import_records(read_records(csv_path), list_id, batch_size)
+        return counts, time.perf_counter() - started
+    finally:
+        db.close()
+
+
+def run_legacy(directory, count, profile):
+    db = open_database(os.path.join(directory, f"legacy-{profile}.db"), profile)
+    try:
+        list_id = db.create_shopping_list("По одному")
+        started = time.perf_counter()
+        for index in range(count):
+            db.toggle_bought_status(db.add_product(list_id, f"Товар {index % 500}", "Другое"))
+        return time.perf_counter() - started
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пропускная способность массового импорта")
+    parser.add_argument("--rows", type=int, default=1000000, help="Записей истории в файле")
+    parser.add_argument("--items", type=int, default=1000, help="Некупленных товаров в файле")
+    parser.add_argument("--products", type=int, default=2000, help="Различных названий товаров")
+    parser.add_argument("--profiles", nargs="+", default=["balanced", "fast"], help="Профили PRAGMA")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[IMPORT_BATCH_SIZE],
+                        help="Размеры пачки executemany")
+    parser.add_argument("--legacy", type=int, default=1000, help="Товаров, добавляемых по одному")
+    args = parser.parse_args(argv)
+
+    configure_logging("ERROR")
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "history.csv")
+        started = time.perf_counter()
+        write_csv(csv_path, args.rows, args.items, args.products)
+        print(f"CSV: {args.rows + args.items} записей, {os.path.getsize(csv_path) / 2 ** 20:.0f} МБ "
+              f"за {time.perf_counter() - started:.1f} с")
+
+        print(f"{'способ':<24}{'профиль':<10}{'пачка':>7}{'строк':>10}{'время, с':>10}{'строк/с':>10}")
+        for profile in args.profiles:
+            for batch_size in args.batch_sizes:
+                counts, elapsed = run_import(directory, csv_path, profile, batch_size)
+                if counts is None:
+                    print(f"Ошибка импорта ({profile}, {batch_size})", file=sys.stderr)
+                    return 1
+                total = counts["items"] + counts["history"]
+                print(f"{'import_records':<24}{profile:<10}{batch_size:>7}{total:>10}{elapsed:>10.1f}"
+                      f"{total / elapsed:>10.0f}")
+
+            if args.legacy:
+                elapsed = run_legacy(directory, args.legacy, profile)
+                print(f"{'add + toggle по одному':<24}{profile:<10}{1:>7}{args.legacy:>10}{elapsed:>10.1f}"
+                      f"{args.legacy / elapsed:>10.0f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
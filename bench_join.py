@@ -0,0 +1,87 @@
+"""Присоединение к списку по коду при большом числе существующих списков.
+
+База заполняется --lists списками со случайными кодами. Затем замеряются
+join_shopping_list для случайных кодов и, для сравнения, прежний поиск
+WHERE UPPER(share_code) = ?, который не может использовать UNIQUE-индекс.
+
+    python bench_join.py --lists 1000000 --joins 1000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+import passwords
+import statements
+from database import Database, SHARE_CODE_LENGTH
+from log_config import configure_logging
+
+LEGACY_LOOKUP = "SELECT id FROM shopping_lists WHERE UPPER(share_code) = ?"
+
+
+def fill_lists(db, count, owner_id, batch_size=50000):
+    conn = db.get_connection()
+    try:
+        for start in range(0, count, batch_size):
+            batch = [uuid.uuid4().hex[:SHARE_CODE_LENGTH].upper() for _ in range(min(batch_size, count - start))]
+            conn.executemany("INSERT OR IGNORE INTO shopping_lists (name, owner_id, share_code) VALUES ('Список', ?, ?)",
+                             [(owner_id, code) for code in batch])
+        conn.commit()
+        # Совпавшие коды пропущены INSERT OR IGNORE: берем только вставленные
+        return [code for (code,) in conn.execute("SELECT share_code FROM shopping_lists WHERE owner_id = ?",
+                                                 (owner_id,))]
+    finally:
+        db.release_connection(conn)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Поиск списка по коду среди большого числа списков")
+    parser.add_argument("--lists", type=int, default=1000000, help="Число существующих списков")
+    parser.add_argument("--joins", type=int, default=1000, help="Число присоединений")
+    parser.add_argument("--legacy", type=int, default=20, help="Число поисков прежним запросом")
+    args = parser.parse_args(argv)
+
+    configure_logging("ERROR")
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        db = Database(os.path.join(directory, "join.db"),
+                      password_hasher=passwords.PBKDF2Hasher(passwords.PBKDF2Hasher.min_iterations))
+        try:
+            db.register_user("owner", "owner")
+            db.register_user("member", "member")
+            db.login_user("owner", "owner")
+            owner_id = db.get_current_user_id()
+
+            started = time.perf_counter()
+            codes = fill_lists(db, args.lists, owner_id)
+            print(f"Создано списков: {len(codes)} за {time.perf_counter() - started:.1f} с")
+
+            db.login_user("member", "member")
+            sample = rng.sample(codes, min(args.joins, len(codes)))
+            started = time.perf_counter()
+            joined = sum(bool(db.join_shopping_list(code.lower())) for code in sample)
+            elapsed = time.perf_counter() - started
+            print(f"join_shopping_list: {elapsed / len(sample) * 1000:.3f} мс на вызов ({joined} из {len(sample)})")
+
+            conn = db.get_connection()
+            try:
+                for label, sql in (("по индексу", statements.statement_sql("find_list_by_code")),
+                                   ("UPPER(share_code)", LEGACY_LOOKUP)):
+                    lookups = sample[:args.legacy]
+                    started = time.perf_counter()
+                    for code in lookups:
+                        conn.execute(sql, (code,)).fetchone()
+                    elapsed = time.perf_counter() - started
+                    print(f"Поиск {label}: {elapsed / len(lookups) * 1000:.3f} мс")
+            finally:
+                db.release_connection(conn)
+        finally:
+            db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
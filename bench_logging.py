@@ -0,0 +1,103 @@
+"""Накладные расходы логирования на вызов при выключенном уровне.
+
+Сравниваются:
+- пустой вызов (нижняя граница);
+- logger.debug с ленивыми %-аргументами при уровне WARNING;
+- прежний print(f"...") в /dev/null, как в Database до логгеров;
+- logger.info в файл с ротацией при уровне INFO.
+
+Отдельно замеряется get_shopping_list на списке из 50 товаров при
+уровне ERROR и DEBUG с записью в файл.
+
+    python bench_logging.py --calls 1000000
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+import passwords
+from database import Database
+from log_config import configure_logging, get_logger
+
+logger = get_logger("bench")
+
+
+def per_call(func, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - started) / calls * 1e9
+
+
+def bench_calls(calls, log_file):
+    products = list(range(50))
+
+    def noop():
+        pass
+
+    def disabled_debug():
+        logger.debug("Найдено %s товаров в списке", len(products))
+
+    def legacy_print():
+        print(f"Найдено {len(products)} товаров в списке")
+
+    def enabled_info():
+        logger.info("Найдено %s товаров в списке", len(products))
+
+    results = []
+    configure_logging("WARNING", console=False)
+    results.append(("пустой вызов", per_call(noop, calls)))
+    results.append(("debug выключен", per_call(disabled_debug, calls)))
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results.append(("print в devnull", per_call(legacy_print, calls)))
+    # Запись в файл на порядки дороже: достаточно меньшего числа вызовов
+    configure_logging("INFO", log_file=log_file, console=False)
+    results.append(("info в файл", per_call(enabled_info, max(calls // 20, 1))))
+    return results
+
+
+def bench_reads(path, log_file, reads):
+    db = Database(path, password_hasher=passwords.PBKDF2Hasher(passwords.PBKDF2Hasher.min_iterations))
+    try:
+        db.register_user("bench", "bench")
+        db.login_user("bench", "bench")
+        list_id = db.create_shopping_list("Бенчмарк")
+        db.add_products(list_id, [(f"Товар {index}", "Другое") for index in range(50)])
+
+        results = []
+        for label, level, target in (("ERROR", "ERROR", None), ("DEBUG в файл", "DEBUG", log_file)):
+            configure_logging(level, log_file=target, console=False)
+            results.append((label, per_call(lambda: db.get_shopping_list(list_id), reads) / 1000))
+        return results
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Накладные расходы логирования на вызов")
+    parser.add_argument("--calls", type=int, default=1000000, help="Число вызовов в микробенчмарке")
+    parser.add_argument("--reads", type=int, default=5000, help="Число вызовов get_shopping_list")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        log_file = os.path.join(directory, "bench.log")
+        try:
+            print(f"{'вариант':<20}{'нс на вызов':>14}")
+            for label, value in bench_calls(args.calls, log_file):
+                print(f"{label:<20}{value:>14.1f}")
+
+            print()
+            print(f"{'get_shopping_list':<20}{'мкс на вызов':>14}")
+            for label, value in bench_reads(os.path.join(directory, "logging.db"), log_file, args.reads):
+                print(f"{label:<20}{value:>14.1f}")
+        finally:
+            # Закрывает файловый обработчик до удаления каталога
+            configure_logging("WARNING", console=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
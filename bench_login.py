@@ -0,0 +1,101 @@
+"""Время и пропускная способность входа при разных алгоритмах хеширования.
+
+Для PBKDF2 и scrypt стоимость калибруется под --target-ms на этом
+устройстве, затем замеряются:
+- время одного хеширования с подобранной стоимостью;
+- login_user подряд в одном потоке и в --threads потоках (hashlib
+  отпускает GIL на время вычисления хеша);
+- вход с неверным паролем и с несуществующим именем (время должно быть
+  тем же, что и у успешного входа);
+- первый вход пользователя со старым несоленым SHA-256, при котором хеш
+  пересчитывается.
+
+    python bench_login.py --target-ms 100 --logins 50 --threads 4
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import passwords
+import statements
+from database import Database
+from log_config import configure_logging
+
+
+def timed_logins(db, credentials, threads):
+    """Возвращает (секунды всего, число успешных входов)"""
+    started = time.perf_counter()
+    if threads == 1:
+        results = [db.login_user(username, password) for username, password in credentials]
+    else:
+        with ThreadPoolExecutor(threads) as executor:
+            results = list(executor.map(lambda item: db.login_user(*item), credentials))
+    return time.perf_counter() - started, sum(results)
+
+
+def add_legacy_user(db, username, password):
+    conn = db.get_connection()
+    try:
+        statements.execute(conn, "insert_user", (username, hashlib.sha256(password.encode()).hexdigest()))
+        conn.commit()
+    finally:
+        db.release_connection(conn)
+
+
+def run(path, hasher, args):
+    db = Database(path, pool_size=max(args.threads, 1), password_hasher=hasher)
+    try:
+        users = [(f"user{index}", f"password{index}") for index in range(args.users)]
+        for username, password in users:
+            db.register_user(username, password)
+        credentials = [users[index % len(users)] for index in range(args.logins)]
+
+        rows = []
+        for threads in sorted({1, args.threads}):
+            elapsed, succeeded = timed_logins(db, credentials, threads)
+            rows.append((f"вход, потоков: {threads}", elapsed / len(credentials) * 1000,
+                         succeeded / elapsed))
+
+        for label, attempts in (("неверный пароль", [(name, "wrong") for name, _ in credentials]),
+                                ("нет пользователя", [("nobody", "wrong")] * len(credentials))):
+            elapsed, _ = timed_logins(db, attempts, 1)
+            rows.append((label, elapsed / len(attempts) * 1000, len(attempts) / elapsed))
+
+        legacy_users = [(f"legacy{index}", f"password{index}") for index in range(min(args.logins, args.users))]
+        for username, password in legacy_users:
+            add_legacy_user(db, username, password)
+        elapsed, _ = timed_logins(db, legacy_users, 1)
+        rows.append(("SHA-256 + пересчет", elapsed / len(legacy_users) * 1000, len(legacy_users) / elapsed))
+        return rows
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Время и пропускная способность входа")
+    parser.add_argument("--target-ms", type=float, default=passwords.DEFAULT_TARGET_MS,
+                        help="Целевое время хеширования для калибровки")
+    parser.add_argument("--logins", type=int, default=50, help="Входов на замер")
+    parser.add_argument("--users", type=int, default=10, help="Число пользователей")
+    parser.add_argument("--threads", type=int, default=4, help="Потоков для параллельного входа")
+    args = parser.parse_args(argv)
+
+    configure_logging("ERROR")
+    with tempfile.TemporaryDirectory() as directory:
+        for hasher_class in (passwords.PBKDF2Hasher, passwords.ScryptHasher):
+            hasher = passwords.calibrate(args.target_ms, hasher_class)
+            print(f"{passwords.hasher_config(hasher)}: хеш {passwords.measure(hasher):.1f} мс "
+                  f"(цель {args.target_ms:.0f} мс)")
+            print(f"  {'замер':<24}{'мс на вход':>12}{'входов/с':>10}")
+            path = os.path.join(directory, f"{hasher.algorithm}.db")
+            for label, latency, throughput in run(path, hasher, args):
+                print(f"  {label:<24}{latency:>12.1f}{throughput:>10.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Задержка операций Database с пулом соединений и без него.
+
+Без пула каждый вызов открывает соединение sqlite3.connect, применяет
+PRAGMA профиля и закрывает его, как до появления ConnectionPool. Оба
+варианта выполняют одинаковые циклы "добавить товар - отметить купленным"
+на новой базе во временном каталоге.
+
+    python bench_pool.py --cycles 10000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import passwords
+from database import Database
+from log_config import configure_logging
+
+
+class ConnectPerCallDatabase(Database):
+    """Database без пула: соединение на каждый вызов"""
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_name)
+        self.apply_pragmas(conn)
+        return conn
+
+    def release_connection(self, conn):
+        conn.close()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run(database_class, path, cycles):
+    # Минимальная стоимость хеша: регистрация не должна влиять на замер
+    db = database_class(path, password_hasher=passwords.PBKDF2Hasher(passwords.PBKDF2Hasher.min_iterations))
+    try:
+        db.register_user("bench", "bench")
+        db.login_user("bench", "bench")
+        list_id = db.create_shopping_list("Бенчмарк")
+
+        add_times = []
+        toggle_times = []
+        for index in range(cycles):
+            started = time.perf_counter()
+            product_id = db.add_product(list_id, f"Товар {index % 500}", "Другое")
+            add_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            db.toggle_bought_status(product_id)
+            toggle_times.append(time.perf_counter() - started)
+        return add_times, toggle_times
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Задержка add/toggle с пулом соединений и без него")
+    parser.add_argument("--cycles", type=int, default=10000, help="Число циклов добавить/купить")
+    args = parser.parse_args(argv)
+
+    configure_logging("ERROR")
+    print(f"{'вариант':<18}{'операция':<10}{'среднее, мс':>12}{'p50, мс':>10}{'p95, мс':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, database_class in (("без пула", ConnectPerCallDatabase), ("с пулом", Database)):
+            path = os.path.join(directory, f"{database_class.__name__}.db")
+            add_times, toggle_times = run(database_class, path, args.cycles)
+            for operation, times in (("add", add_times), ("toggle", toggle_times)):
+                print(f"{label:<18}{operation:<10}{sum(times) / len(times) * 1000:>12.3f}"
+                      f"{percentile(times, 0.5) * 1000:>10.3f}{percentile(times, 0.95) * 1000:>10.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Пропускная способность профилей PRAGMA при одновременных чтении и записи.
+
+Писатели в своих потоках добавляют товары и отмечают их купленными,
+читатели перечитывают список, как экраны участников. Для сравнения
+добавлен профиль "rollback" - durable с журналом DELETE, то есть настройки
+SQLite по умолчанию. Каждый профиль проверяется на новой базе.
+
+    python bench_pragmas.py --writers 4 --readers 4 --seconds 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import passwords
+from database import Database, PRAGMA_PROFILES
+from log_config import configure_logging
+
+# Профиль -> (базовый профиль, переопределения)
+VARIANTS = {
+    "rollback": ("durable", {"journal_mode": "DELETE"}),
+    **{name: (name, {}) for name in PRAGMA_PROFILES},
+}
+
+
+def run(path, profile, overrides, writers, readers, seconds):
+    db = Database(path, pool_size=writers + readers, pragma_profile=profile, pragmas=overrides,
+                  password_hasher=passwords.PBKDF2Hasher(passwords.PBKDF2Hasher.min_iterations))
+    try:
+        db.register_user("bench", "bench")
+        db.login_user("bench", "bench")
+        list_id = db.create_shopping_list("Бенчмарк")
+        db.add_products(list_id, [(f"Товар {index}", "Другое") for index in range(200)])
+
+        counts = {"write": 0, "read": 0, "error": 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def writer(number):
+            done = errors = 0
+            while not stop.is_set():
+                product_id = db.add_product(list_id, f"Товар {number}-{done}")
+                if product_id and db.toggle_bought_status(product_id):
+                    done += 1
+                else:
+                    errors += 1
+            with lock:
+                counts["write"] += done
+                counts["error"] += errors
+
+        def reader():
+            done = 0
+            while not stop.is_set():
+                db.get_shopping_list(list_id)
+                done += 1
+            with lock:
+                counts["read"] += done
+
+        threads = [threading.Thread(target=writer, args=(number,)) for number in range(writers)]
+        threads += [threading.Thread(target=reader) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return counts
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Профили PRAGMA под одновременной нагрузкой")
+    parser.add_argument("--writers", type=int, default=4, help="Потоков записи")
+    parser.add_argument("--readers", type=int, default=4, help="Потоков чтения")
+    parser.add_argument("--seconds", type=float, default=5, help="Длительность замера для профиля")
+    args = parser.parse_args(argv)
+
+    # Ошибки блокировок считаются отдельно и не засоряют вывод
+    configure_logging("CRITICAL")
+    print(f"{'профиль':<10}{'запись/с':>10}{'чтение/с':>10}{'ошибок':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (profile, overrides) in VARIANTS.items():
+            counts = run(os.path.join(directory, f"{name}.db"), profile, overrides,
+                         args.writers, args.readers, args.seconds)
+            print(f"{name:<10}{counts['write'] / args.seconds:>10.0f}"
+                  f"{counts['read'] / args.seconds:>10.0f}{counts['error']:>8}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
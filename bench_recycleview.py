@@ -0,0 +1,183 @@
+"""Время кадра и память списка товаров MainScreen для 100/1k/10k товаров.
+
+Список показывается в настоящем окне Kivy двумя способами: через
+RecycleView экрана (строки создаются только для видимой области) и, для
+сравнения, прежним способом - по ProductItem на каждый товар в GridLayout
+внутри ScrollView. Для каждого способа замеряются время от получения
+данных до первого кадра, число созданных строк и виджетов, прирост
+памяти Python (tracemalloc) и время кадра при прокрутке списка.
+
+    python bench_recycleview.py --sizes 100 1000 10000 --frames 120
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+
+try:
+    from kivy.config import Config
+except ImportError:
+    sys.exit("Kivy не установлен: замер RecycleView требует графического окружения")
+
+# Без ограничения частоты кадров: EventLoop.idle() не ждет следующего кадра
+Config.set("graphics", "maxfps", "0")
+
+from kivy.base import EventLoop
+from kivy.uix.gridlayout import GridLayout
+from kivy.uix.scrollview import ScrollView
+
+import passwords
+from app_logic import AppLogic
+from database import Database
+from log_config import configure_logging
+from ui_controls import ProductItem
+from ui_layouts import MainScreen
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def count_widgets(widget):
+    return sum(1 for _ in widget.walk(restrict=True))
+
+
+class RecycleVariant:
+    """Текущий MainScreen: данные передаются в RecycleView"""
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.view = screen.products_view
+
+    def show(self, products):
+        self.screen.show_products(products)
+
+    def rows(self):
+        return len(self.view.layout_manager.children)
+
+    def clear(self):
+        self.screen.show_products([])
+
+
+class LegacyVariant:
+    """Прежний способ: ProductItem на каждый товар"""
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.layout = GridLayout(cols=1, size_hint_y=None, spacing=5)
+        self.layout.bind(minimum_height=self.layout.setter("height"))
+        self.view = ScrollView(size=screen.products_view.size, pos=screen.products_view.pos)
+        self.view.add_widget(self.layout)
+
+    def show(self, products):
+        self.layout.clear_widgets()
+        for index, product_data in enumerate(products):
+            item = ProductItem()
+            item.refresh_view_attrs(None, index, self.screen.make_product_data(product_data))
+            self.layout.add_widget(item)
+
+    def rows(self):
+        return len(self.layout.children)
+
+    def clear(self):
+        self.layout.clear_widgets()
+
+
+def measure(variant, products, frames):
+    started = time.perf_counter()
+    variant.show(products)
+    EventLoop.idle()
+    first_frame = time.perf_counter() - started
+    rows = variant.rows()
+    widgets = count_widgets(variant.view)
+
+    frame_times = []
+    for frame in range(frames):
+        # Прокрутка сверху вниз и обратно
+        position = frame / max(frames - 1, 1) * 2
+        variant.view.scroll_y = 1 - position if position <= 1 else position - 1
+        started = time.perf_counter()
+        EventLoop.idle()
+        frame_times.append(time.perf_counter() - started)
+
+    variant.clear()
+    EventLoop.idle()
+
+    # Память замеряется отдельным показом: tracemalloc замедляет выделения
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    variant.show(products)
+    EventLoop.idle()
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    variant.clear()
+    EventLoop.idle()
+    return {
+        "first_frame_ms": first_frame * 1000,
+        "rows": rows,
+        "widgets": widgets,
+        "memory_kb": memory / 1024,
+        "frame_ms": sum(frame_times) / len(frame_times) * 1000,
+        "frame_p95_ms": percentile(frame_times, 0.95) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Время кадра и память списка товаров")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="Число товаров в списке")
+    parser.add_argument("--frames", type=int, default=120, help="Кадров прокрутки на замер")
+    parser.add_argument("--no-legacy", action="store_true", help="Не замерять прежний способ")
+    args = parser.parse_args(argv)
+
+    configure_logging("ERROR")
+    EventLoop.ensure_window()
+    window = EventLoop.window
+    window.size = (480, 1400)
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = Database(os.path.join(directory, "recycleview.db"),
+                      password_hasher=passwords.PBKDF2Hasher(passwords.PBKDF2Hasher.min_iterations))
+        logic = AppLogic(db)
+        try:
+            logic.register_user("bench", "bench")
+            logic.login_user("bench", "bench")
+            screen = MainScreen(name="main", logic=logic, async_logic=None)
+            window.add_widget(screen)
+            EventLoop.idle()
+
+            variants = [("RecycleView", RecycleVariant(screen))]
+            if not args.no_legacy:
+                variants.append(("ProductItem", LegacyVariant(screen)))
+
+            print(f"{'способ':<13}{'товаров':>8}{'1-й кадр, мс':>14}{'строк':>7}{'виджетов':>10}"
+                  f"{'память, КБ':>12}{'кадр, мс':>10}{'p95, мс':>9}")
+            for size in args.sizes:
+                list_id = db.create_shopping_list(f"Список {size}")
+                db.add_products(list_id, [(f"Товар {index}", "Другое") for index in range(size)])
+                logic.set_current_list(list_id)
+                products = logic.get_current_list()
+
+                for label, variant in variants:
+                    if variant.view is not screen.products_view:
+                        # Прежний список занимает место RecycleView на экране
+                        variant.view.size = screen.products_view.size
+                        variant.view.pos = screen.products_view.pos
+                        window.add_widget(variant.view)
+                    result = measure(variant, products, args.frames)
+                    if variant.view is not screen.products_view:
+                        window.remove_widget(variant.view)
+                    print(f"{label:<13}{size:>8}{result['first_frame_ms']:>14.1f}{result['rows']:>7}"
+                          f"{result['widgets']:>10}{result['memory_kb']:>12.0f}"
+                          f"{result['frame_ms']:>10.2f}{result['frame_p95_ms']:>9.2f}")
+        finally:
+            db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Полнотекстовый поиск по истории покупок из 1M записей.
+
+История распределяется по нескольким спискам пользователя и одному чужому
+списку, в котором пользователь не состоит (его записи не должны попадать
+в результаты). Для каждого запроса замеряются первая страница и страница
+со смещением через Database.search (FTS5) и, для сравнения, прежний
+поиск LIKE '%...%' по тем же данным.
+
+    python bench_search.py --rows 1000000 --lists 4
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import passwords
+import statements
+from database import Database, SEARCH_PAGE_SIZE
+from log_config import configure_logging
+from suggestions import DATE_FORMAT
+
+PRODUCTS = [
+    ("Молоко", "Молочные"), ("Кефир", "Молочные"), ("Сыр", "Молочные"), ("Йогурт", "Молочные"),
+    ("Хлеб", "Хлеб"), ("Батон", "Хлеб"), ("Яблоки", "Фрукты"), ("Бананы", "Фрукты"),
+    ("Картофель", "Овощи"), ("Морковь", "Овощи"), ("Курица", "Мясо"), ("Фарш", "Мясо"),
+    ("Чай", "Напитки"), ("Кофе", "Напитки"), ("Сок", "Напитки"), ("Мыло", "Бытовая химия"),
+]
+VARIANTS = ["", " домашний", " фермерский", " 1 кг", " 0.5 л", " большой", " эконом", " био"]
+# Редкий товар: "когда мы в последний раз покупали батарейки"
+RARE_PRODUCT = ("Батарейки AA", "Другое")
+RARE_SHARE = 0.0005
+
+QUERIES = ["батарейки", "молоко", "мол", "сок 0.5", "фермерский сыр", "напитки", "нет такого"]
+
+
+def generate_history(rows, now, seed):
+    rng = random.Random(seed)
+    names = [(name + variant, category) for name, category in PRODUCTS for variant in VARIANTS]
+    start = now - timedelta(days=730)
+    for _ in range(rows):
+        product_name, category = RARE_PRODUCT if rng.random() < RARE_SHARE else rng.choice(names)
+        bought = start + timedelta(seconds=rng.uniform(0, 730 * 24 * 60 * 60))
+        yield {"product_name": product_name, "category": category, "bought_date": bought.strftime(DATE_FORMAT)}
+
+
+def fill(db, username, list_names, rows, now):
+    db.login_user(username, username)
+    for index, list_name in enumerate(list_names):
+        list_id = db.create_shopping_list(list_name)
+        db.add_products(list_id, [("Батарейки AAA", "Другое"), ("Молоко", "Молочные")])
+        db.import_records(generate_history(rows, now, seed=f"{username}{index}"), list_id)
+
+
+def timed(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - started) / repeat * 1000
+
+
+def like_search(db, text, offset):
+    conn = db.get_connection()
+    try:
+        pattern = f"%{text.strip()}%"
+        return statements.fetchall(conn, "search_like", (
+            db.current_user_id, pattern, pattern, db.current_user_id, pattern, pattern,
+            SEARCH_PAGE_SIZE + 1, offset
+        ))
+    finally:
+        db.release_connection(conn)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Полнотекстовый поиск по большой истории покупок")
+    parser.add_argument("--rows", type=int, default=1000000, help="Всего записей истории")
+    parser.add_argument("--lists", type=int, default=4, help="Списков пользователя")
+    parser.add_argument("--repeat", type=int, default=10, help="Повторов каждого запроса")
+    parser.add_argument("--no-like", action="store_true", help="Не замерять поиск через LIKE")
+    args = parser.parse_args(argv)
+
+    configure_logging("ERROR")
+    now = datetime.now().replace(microsecond=0)
+    with tempfile.TemporaryDirectory() as directory:
+        db = Database(os.path.join(directory, "search.db"),
+                      password_hasher=passwords.PBKDF2Hasher(passwords.PBKDF2Hasher.min_iterations))
+        try:
+            if not db.has_search_index:
+                print("SQLite собран без FTS5: Database.search работает через LIKE")
+            db.register_user("bench", "bench")
+            db.register_user("other", "other")
+
+            # Чужой список получает ту же долю записей, что и один список пользователя
+            per_list = args.rows // (args.lists + 1)
+            started = time.perf_counter()
+            fill(db, "other", ["Чужой список"], per_list, now)
+            fill(db, "bench", [f"Список {index + 1}" for index in range(args.lists)], per_list, now)
+            print(f"Импорт {per_list * (args.lists + 1)} записей с индексом поиска: "
+                  f"{time.perf_counter() - started:.1f} с")
+
+            print(f"{'запрос':<18}{'строк':>6}{'ещё':>5}{'FTS, мс':>10}{'стр. 3, мс':>12}{'LIKE, мс':>10}")
+            for text in QUERIES:
+                (rows, next_offset), first = timed(lambda: db.search(text), args.repeat)
+                _, third = timed(lambda: db.search(text, offset=2 * SEARCH_PAGE_SIZE), args.repeat)
+                if any(list_name == "Чужой список" for _, _, list_name, *_ in rows):
+                    print(f"Ошибка: '{text}' нашел записи чужого списка", file=sys.stderr)
+                    return 1
+                like = ""
+                if not args.no_like:
+                    _, elapsed = timed(lambda: like_search(db, text, 0), max(args.repeat // 5, 1))
+                    like = f"{elapsed:.1f}"
+                print(f"{text:<18}{len(rows):>6}{'да' if next_offset else 'нет':>5}{first:>10.2f}"
+                      f"{third:>12.2f}{like:>10}")
+
+            rows, _ = db.search("батарейки")
+            if rows:
+                source, _, list_name, product_name, _, bought_date = rows[0]
+                print(f"\nБатарейки: {product_name}, {list_name}, {bought_date or 'в списке'} ({source})")
+        finally:
+            db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Время холодного запуска консольного интерфейса и графического приложения.
+
+Каждый вариант запускается отдельным процессом --runs раз:
+- пустой интерпретатор (нижняя граница);
+- python -m shopping_cli ... list на заранее подготовленной базе;
+- импорт main (Kivy, окно и ui_layouts) без запуска приложения;
+- с --gui-frame: main.py до первого кадра на экране (нужен дисплей).
+
+База создается во временном каталоге с минимальной стоимостью хеша,
+чтобы калибровка и вход не влияли на замер.
+
+    python bench_startup.py --runs 10 --gui-frame
+"""
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import passwords
+from database import Database, PASSWORD_HASHER_SETTING
+from log_config import configure_logging
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+FIRST_FRAME_MESSAGE = "Первый кадр"
+
+
+def prepare_database(path):
+    hasher = passwords.PBKDF2Hasher(passwords.PBKDF2Hasher.min_iterations)
+    db = Database(path, password_hasher=hasher)
+    try:
+        db.set_setting(PASSWORD_HASHER_SETTING, passwords.hasher_config(hasher))
+        db.register_user("bench", "bench")
+        db.login_user("bench", "bench")
+        list_id = db.create_shopping_list("Бенчмарк")
+        db.add_products(list_id, [(f"Товар {index}", "Другое") for index in range(20)])
+        return list_id
+    finally:
+        db.close()
+
+
+def run_process(command, cwd, env):
+    started = time.perf_counter()
+    subprocess.run(command, cwd=cwd, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def run_until_first_frame(cwd, env, timeout=60):
+    """Запускает main.py и останавливает его, как только выведен первый кадр"""
+    env = dict(env, SHOPPING_LOG_LEVEL="INFO")
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "main.py")], cwd=cwd, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        for line in process.stderr:
+            if FIRST_FRAME_MESSAGE in line:
+                return time.perf_counter() - started
+            if time.perf_counter() - started > timeout:
+                break
+        return None
+    finally:
+        process.kill()
+        process.wait()
+
+
+def summary(times):
+    times = sorted(times)
+    return times[len(times) // 2] * 1000, times[0] * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Холодный запуск CLI и графического приложения")
+    parser.add_argument("--runs", type=int, default=10, help="Запусков каждого варианта")
+    parser.add_argument("--gui-frame", action="store_true", help="Замерять main.py до первого кадра")
+    args = parser.parse_args(argv)
+
+    configure_logging("ERROR")
+    has_kivy = importlib.util.find_spec("kivy") is not None
+
+    with tempfile.TemporaryDirectory() as directory:
+        # main.py открывает shopping_list.db в текущем каталоге
+        db_path = os.path.join(directory, "shopping_list.db")
+        list_id = prepare_database(db_path)
+        env = dict(os.environ, PYTHONPATH=REPO_DIR, KIVY_NO_ARGS="1")
+
+        variants = [
+            ("python -c pass", [sys.executable, "-c", "pass"]),
+            ("shopping_cli list", [sys.executable, "-m", "shopping_cli", "--db", db_path,
+                                   "-u", "bench", "-p", "bench", "-l", str(list_id), "list"]),
+            ("shopping_cli без Kivy", [sys.executable, "-c",
+                                       "import sys, shopping_cli; sys.exit('kivy' in sys.modules)"]),
+        ]
+        if has_kivy:
+            variants.append(("import main (GUI)", [sys.executable, "-c", "import main"]))
+        else:
+            print("Kivy не установлен: графическое приложение не замеряется")
+
+        print(f"{'вариант':<24}{'медиана, мс':>13}{'мин, мс':>10}")
+        for label, command in variants:
+            times = [run_process(command, directory, env) for _ in range(args.runs)]
+            median, best = summary(times)
+            print(f"{label:<24}{median:>13.0f}{best:>10.0f}")
+
+        if args.gui_frame and has_kivy:
+            times = [run_until_first_frame(directory, env) for _ in range(args.runs)]
+            times = [value for value in times if value is not None]
+            if times:
+                median, best = summary(times)
+                print(f"{'main.py до 1-го кадра':<24}{median:>13.0f}{best:>10.0f}")
+            else:
+                print("main.py не вывел первый кадр")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
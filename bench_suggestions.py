@@ -0,0 +1,129 @@
+"""Умные предложения на синтетической истории из 1M покупок.
+
+История одного списка генерируется за два года: часть товаров покупается
+весь период, часть ("бывшие любимые") покупалась часто, но давно
+перестала. Затем замеряются:
+- полный пересчет product_stats из истории (rebuild_product_stats);
+- покупка одного товара с инкрементальным обновлением статистики;
+- AppLogic.get_smart_suggestions для разных K;
+- прежний подсчет GROUP BY по всей истории списка.
+
+    python bench_suggestions.py --rows 1000000 --products 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import passwords
+from app_logic import AppLogic
+from database import Database
+from log_config import configure_logging
+from suggestions import DATE_FORMAT
+
+HISTORY_DAYS = 730
+# Доля товаров, которые перестали покупать в первые полгода
+STOPPED_SHARE = 0.1
+
+LEGACY_SUGGESTIONS = """
+    SELECT p.name, COUNT(*) AS purchase_count
+    FROM purchase_history ph
+    JOIN products p ON p.id = ph.product_id
+    WHERE ph.list_id = ?
+    GROUP BY ph.product_id
+    ORDER BY purchase_count DESC
+    LIMIT ?"""
+
+
+def generate_history(rows, products, now, seed=0):
+    """Возвращает записи для import_records: товары с окнами покупок и весами"""
+    rng = random.Random(seed)
+    start = now - timedelta(days=HISTORY_DAYS)
+    windows = []
+    weights = []
+    for index in range(products):
+        if rng.random() < STOPPED_SHARE:
+            # Покупался часто, но только в первые полгода
+            windows.append((f"Товар {index}", 0, 180))
+            weights.append(rng.uniform(5, 10))
+        else:
+            windows.append((f"Товар {index}", 0, HISTORY_DAYS))
+            weights.append(rng.paretovariate(1.2))
+
+    picks = rng.choices(windows, weights=weights, k=rows)
+    for product_name, first_day, last_day in picks:
+        bought = start + timedelta(seconds=rng.uniform(first_day, last_day) * 24 * 60 * 60)
+        yield {"product_name": product_name, "category": "Другое", "bought_by": "bench",
+               "bought_date": bought.strftime(DATE_FORMAT)}
+
+
+def timed(func, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - started) / repeat * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Умные предложения на большой истории покупок")
+    parser.add_argument("--rows", type=int, default=1000000, help="Число записей истории")
+    parser.add_argument("--products", type=int, default=500, help="Число различных товаров")
+    parser.add_argument("--purchases", type=int, default=200, help="Число инкрементальных покупок")
+    parser.add_argument("--repeat", type=int, default=20, help="Повторов каждого запроса")
+    args = parser.parse_args(argv)
+
+    configure_logging("ERROR")
+    now = datetime.now().replace(microsecond=0)
+    with tempfile.TemporaryDirectory() as directory:
+        db = Database(os.path.join(directory, "suggestions.db"),
+                      password_hasher=passwords.PBKDF2Hasher(passwords.PBKDF2Hasher.min_iterations))
+        logic = AppLogic(db)
+        try:
+            logic.register_user("bench", "bench")
+            logic.login_user("bench", "bench")
+            list_id = db.create_shopping_list("Бенчмарк")
+            logic.set_current_list(list_id)
+
+            counts, elapsed = timed(lambda: db.import_records(generate_history(args.rows, args.products, now),
+                                                              list_id))
+            print(f"Импорт истории: {counts['history']} записей за {elapsed / 1000:.1f} с")
+
+            _, elapsed = timed(lambda: db.rebuild_product_stats(list_id))
+            print(f"Полный пересчет product_stats: {elapsed:.0f} мс")
+
+            def buy():
+                product_id = db.add_product(list_id, f"Товар {random.randrange(args.products)}", "Другое")
+                db.toggle_bought_status(product_id)
+
+            _, elapsed = timed(buy, args.purchases)
+            print(f"Покупка с обновлением статистики: {elapsed:.3f} мс")
+
+            print()
+            print(f"{'запрос':<28}{'K':>4}{'мс':>10}")
+            for k in (5, 20, 100):
+                _, elapsed = timed(lambda: logic.get_smart_suggestions(k=k), args.repeat)
+                print(f"{'get_smart_suggestions':<28}{k:>4}{elapsed:>10.2f}")
+
+            conn = db.get_connection()
+            try:
+                legacy, elapsed = timed(lambda: conn.execute(LEGACY_SUGGESTIONS, (list_id, 5)).fetchall(),
+                                        max(args.repeat // 4, 1))
+            finally:
+                db.release_connection(conn)
+            print(f"{'GROUP BY по истории':<28}{5:>4}{elapsed:>10.2f}")
+
+            print()
+            print("Пора купить:", ", ".join(
+                f"{name} ({count}{', пора' if is_due else ''})" for name, count, is_due in logic.get_smart_suggestions()
+            ))
+            print("По числу покупок:", ", ".join(f"{name} ({count})" for name, count in legacy))
+        finally:
+            db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш результатов запросов.
+
+    Ключи - кортежи вида (область, id, тип данных), например
+    ("list", 5, "members"). invalidate удаляет все записи области.
+    Загрузка, начатая до инвалидации, не попадает в кэш, чтобы не
+    сохранить устаревшие данные.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            generation = self._generation
+
+        value = loader()
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def invalidate(self, scope, scope_id):
+        with self._lock:
+            self._generation += 1
+            stale = [key for key in self._entries if key[0] == scope and key[1] == scope_id]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,179 @@
+"""Предсказание категории товара по названию.
+
+Наивный байесовский классификатор по словам и символьным триграммам
+названия: триграммы узнают "йогурт" в "йогуртовый" и переживают опечатки.
+Модель - таблицы частот признаков по категориям. Обучающий пример - пара
+(товар, категория) из истории покупок; пример добавляется увеличением
+счетчиков, без переобучения, и таблицы хранятся в базе (см.
+Database.fill_category_model). Покупки с категорией "Другое" в обучение
+не попадают: это категория по умолчанию, а не выбор пользователя.
+
+Предсказание учитывает только признаки, встречавшиеся при обучении, и
+занимает десятки микросекунд.
+
+Оценка точности и скорости на истории из базы:
+    python category_predictor.py --db shopping_list.db
+"""
+import argparse
+import math
+import random
+import sqlite3
+import sys
+import time
+
+from autocomplete import normalize
+import statements
+
+DEFAULT_CATEGORY = 'Другое'
+NGRAM_SIZE = 3
+# Сглаживание Лапласа для признаков, не встречавшихся в категории
+SMOOTHING = 0.1
+# Ниже этой вероятности категория не предлагается
+MIN_PROBABILITY = 0.7
+
+
+def features(product_name):
+    """Признаки названия: слова и триграммы символов с границами слов"""
+    text = normalize(product_name)
+    if not text:
+        return set()
+    padded = f" {text} "
+    result = {"w:" + word for word in text.split()}
+    result.update(padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1))
+    return result
+
+
+class CategoryPredictor:
+    """Частоты признаков по категориям с инкрементальным обучением"""
+
+    def __init__(self, feature_rows=(), example_rows=()):
+        # признак -> {категория: число примеров с этим признаком}
+        self.feature_counts = {}
+        # категория -> сумма счетчиков ее признаков
+        self.feature_totals = {}
+        # категория -> число примеров
+        self.examples = {}
+
+        for feature, category, count in feature_rows:
+            self.feature_counts.setdefault(feature, {})[category] = count
+            self.feature_totals[category] = self.feature_totals.get(category, 0) + count
+        for category, count in example_rows:
+            self.examples[category] = count
+
+    def __len__(self):
+        return sum(self.examples.values())
+
+    def add(self, product_name, category):
+        """Учитывает пример (товар, категория); возвращает его признаки"""
+        product_features = features(product_name)
+        if category == DEFAULT_CATEGORY or not product_features:
+            return set()
+
+        for feature in product_features:
+            counts = self.feature_counts.setdefault(feature, {})
+            counts[category] = counts.get(category, 0) + 1
+        self.feature_totals[category] = self.feature_totals.get(category, 0) + len(product_features)
+        self.examples[category] = self.examples.get(category, 0) + 1
+        return product_features
+
+    def predict(self, product_name, min_probability=MIN_PROBABILITY):
+        """Возвращает (категория, вероятность) или None, если уверенности мало"""
+        known = [self.feature_counts[feature] for feature in features(product_name)
+                 if feature in self.feature_counts]
+        if not known:
+            return None
+
+        total_examples = len(self)
+        vocabulary = len(self.feature_counts)
+        log_smoothing = math.log(SMOOTHING)
+
+        # Отсутствующий в категории признак дает log(SMOOTHING); для
+        # встречавшихся добавляется поправка, поэтому перебираются только
+        # ненулевые счетчики
+        likelihoods = {}
+        for category in self.examples:
+            normalizer = math.log(self.feature_totals[category] + SMOOTHING * vocabulary)
+            likelihoods[category] = len(known) * (log_smoothing - normalizer)
+        for counts in known:
+            for category, count in counts.items():
+                likelihoods[category] += math.log(count + SMOOTHING) - log_smoothing
+
+        # Триграммы одного слова сильно зависимы, и простая сумма делает
+        # модель самоуверенной на незнакомых товарах; деление на корень из
+        # числа признаков возвращает вероятностям разумный масштаб
+        scale = math.sqrt(len(known))
+        scores = {
+            category: math.log(self.examples[category] / total_examples) + likelihood / scale
+            for category, likelihood in likelihoods.items()
+        }
+
+        best = max(scores, key=scores.get)
+        best_score = scores[best]
+        probability = 1 / sum(math.exp(score - best_score) for score in scores.values())
+        if probability < min_probability:
+            return None
+        return best, probability
+
+
+def evaluate(pairs, folds=5, seed=0):
+    """Точность и среднее время предсказания при перекрестной проверке.
+
+    pairs - пары (товар, категория). Возвращает словарь с долями верных,
+    неверных и пропущенных (без уверенного ответа) предсказаний и временем
+    одного предсказания в микросекундах.
+    """
+    pairs = [pair for pair in pairs if pair[1] != DEFAULT_CATEGORY]
+    random.Random(seed).shuffle(pairs)
+
+    correct = wrong = skipped = 0
+    elapsed = 0.0
+    for fold in range(folds):
+        predictor = CategoryPredictor()
+        test = pairs[fold::folds]
+        for index, (product_name, category) in enumerate(pairs):
+            if index % folds != fold:
+                predictor.add(product_name, category)
+
+        started = time.perf_counter()
+        predictions = [predictor.predict(product_name) for product_name, _ in test]
+        elapsed += time.perf_counter() - started
+
+        for prediction, (_, category) in zip(predictions, test):
+            if prediction is None:
+                skipped += 1
+            elif prediction[0] == category:
+                correct += 1
+            else:
+                wrong += 1
+
+    total = max(len(pairs), 1)
+    return {
+        "examples": len(pairs),
+        "correct": correct / total,
+        "wrong": wrong / total,
+        "skipped": skipped / total,
+        "predict_us": elapsed / total * 1e6,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Оценка предсказания категорий на истории покупок")
+    parser.add_argument("--db", default="shopping_list.db", help="Файл базы данных")
+    parser.add_argument("--folds", type=int, default=5, help="Число частей перекрестной проверки")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        pairs = [row[2:] for row in statements.fetchall(conn, "get_category_pairs")]
+    finally:
+        conn.close()
+
+    result = evaluate(pairs, args.folds)
+    print(f"Примеров: {result['examples']}")
+    print(f"Верно: {result['correct']:.1%}, неверно: {result['wrong']:.1%}, без ответа: {result['skipped']:.1%}")
+    print(f"Время предсказания: {result['predict_us']:.1f} мкс")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
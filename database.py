@@ -1,23 +1,570 @@
+import os
 import sqlite3
+import threading
 from datetime import datetime
-import hashlib
 import uuid
 
+from log_config import get_logger
+from sync_protocol import SyncError
+import category_predictor
+import passwords
+import statements
+import suggestions
+
+logger = get_logger(__name__)
+
+
+# Профили PRAGMA. cache_size в отрицательных значениях задается в КиБ,
+# mmap_size - в байтах, busy_timeout - в миллисекундах.
+PRAGMA_PROFILES = {
+    # Максимальная надежность: fsync на каждом коммите
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 10000,
+    },
+    # WAL + NORMAL: коммит без fsync, база не повреждается при сбое питания
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -8000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # Без fsync: последние транзакции могут потеряться при сбое питания
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -32000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 2000,
+    },
+}
+
+DEFAULT_PRAGMA_PROFILE = "balanced"
+
+# Миграции схемы: (версия, описание, шаги). Шаг - SQL-строка или функция,
+# принимающая курсор. Новые миграции добавляются только в конец списка.
+MIGRATIONS = [
+    (1, "Индексы для горячих запросов", [
+        # get_shopping_list, clear_shopping_list: некупленные товары списка по порядку
+        """CREATE INDEX IF NOT EXISTS idx_items_list_active
+           ON shopping_items (list_id, sort_order) WHERE bought_by IS NULL""",
+        # delete_shopping_list: удаление всех товаров списка
+        "CREATE INDEX IF NOT EXISTS idx_items_list ON shopping_items (list_id)",
+        # get_purchase_history, get_last_purchased_product
+        "CREATE INDEX IF NOT EXISTS idx_history_list_date ON purchase_history (list_id, bought_date DESC)",
+        # get_smart_suggestions: GROUP BY по покрывающему индексу
+        "CREATE INDEX IF NOT EXISTS idx_history_list_product ON purchase_history (list_id, product_name)",
+        # get_user_shopping_lists: списки пользователя
+        "CREATE INDEX IF NOT EXISTS idx_members_user ON list_members (user_id, list_id)",
+    ]),
+    (2, "Нормализация кодов приглашения", [
+        # Коды хранятся в верхнем регистре, чтобы поиск шел по UNIQUE-индексу
+        "UPDATE shopping_lists SET share_code = UPPER(TRIM(share_code)) WHERE share_code != UPPER(TRIM(share_code))",
+    ]),
+    (3, "Счетчик sort_order в списках", [
+        # next_sort_order - значение sort_order для следующего добавленного товара
+        "ALTER TABLE shopping_lists ADD COLUMN next_sort_order INTEGER NOT NULL DEFAULT 1024",
+        """UPDATE shopping_lists SET next_sort_order = 1024 + COALESCE(
+               (SELECT MAX(sort_order) FROM shopping_items WHERE list_id = shopping_lists.id), 0)""",
+    ]),
+    (4, "Агрегат частоты покупок для предложений", [
+        """CREATE TABLE IF NOT EXISTS product_stats (
+               list_id INTEGER NOT NULL,
+               product_name TEXT NOT NULL,
+               purchase_count INTEGER NOT NULL DEFAULT 0,
+               last_bought TIMESTAMP,
+               PRIMARY KEY (list_id, product_name),
+               FOREIGN KEY (list_id) REFERENCES shopping_lists (id)
+           )""",
+        # get_smart_suggestions: top-K по индексу без сортировки
+        "CREATE INDEX IF NOT EXISTS idx_stats_list_count ON product_stats (list_id, purchase_count DESC)",
+        """INSERT OR REPLACE INTO product_stats (list_id, product_name, purchase_count, last_bought)
+           SELECT list_id, product_name, COUNT(*), MAX(bought_date)
+           FROM purchase_history GROUP BY list_id, product_name""",
+    ]),
+    (5, "Регулярность покупок для предложений", [
+        "ALTER TABLE product_stats ADD COLUMN first_bought TIMESTAMP",
+        "ALTER TABLE product_stats ADD COLUMN decay_score REAL NOT NULL DEFAULT 0",
+        # Статистика заполняется миграцией 9 после перехода на справочник товаров
+    ]),
+    (6, "Индекс для постраничной истории покупок", [
+        # Ключ (bought_date, id) однозначно задает позицию страницы; индекс
+        # обходится в обратном порядке и для ORDER BY bought_date DESC
+        "CREATE INDEX IF NOT EXISTS idx_history_list_date_id ON purchase_history (list_id, bought_date, id)",
+        "DROP INDEX IF EXISTS idx_history_list_date",
+    ]),
+    (7, "Таблица настроек приложения", [
+        """CREATE TABLE IF NOT EXISTS settings (
+               key TEXT PRIMARY KEY,
+               value TEXT NOT NULL
+           )""",
+    ]),
+    (8, "Полнотекстовый поиск по товарам и истории", [
+        # Триггеры и заполнение индекса - в миграции 9
+        lambda cursor: Database.create_search_index(cursor),
+    ]),
+    (9, "Справочник товаров и категорий", [
+        # Названия товаров и категорий хранятся один раз, строки списков и
+        # истории ссылаются на них по id. Таблицы пересоздаются с теми же id,
+        # поэтому rowid индекса поиска остаются прежними.
+        "DROP TRIGGER IF EXISTS search_items_insert",
+        "DROP TRIGGER IF EXISTS search_items_update",
+        "DROP TRIGGER IF EXISTS search_items_delete",
+        "DROP TRIGGER IF EXISTS search_history_insert",
+        "DROP TRIGGER IF EXISTS search_history_delete",
+        """CREATE TABLE IF NOT EXISTS products (
+               id INTEGER PRIMARY KEY,
+               name TEXT UNIQUE NOT NULL
+           )""",
+        """CREATE TABLE IF NOT EXISTS categories (
+               id INTEGER PRIMARY KEY,
+               name TEXT UNIQUE NOT NULL
+           )""",
+        """INSERT OR IGNORE INTO products (name)
+           SELECT product_name FROM shopping_items UNION SELECT product_name FROM purchase_history""",
+        """INSERT OR IGNORE INTO categories (name)
+           SELECT COALESCE(category, 'Другое') FROM shopping_items
+           UNION SELECT COALESCE(category, 'Другое') FROM purchase_history""",
+        """CREATE TABLE shopping_items_new (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               list_id INTEGER NOT NULL,
+               product_id INTEGER NOT NULL,
+               category_id INTEGER NOT NULL,
+               sort_order INTEGER DEFAULT 0,
+               created_by INTEGER NOT NULL,
+               bought_by INTEGER,
+               created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               bought_date TIMESTAMP,
+               FOREIGN KEY (list_id) REFERENCES shopping_lists (id),
+               FOREIGN KEY (product_id) REFERENCES products (id),
+               FOREIGN KEY (category_id) REFERENCES categories (id),
+               FOREIGN KEY (created_by) REFERENCES users (id),
+               FOREIGN KEY (bought_by) REFERENCES users (id)
+           )""",
+        """INSERT INTO shopping_items_new
+               (id, list_id, product_id, category_id, sort_order, created_by, bought_by, created_date, bought_date)
+           SELECT si.id, si.list_id, p.id, c.id, si.sort_order, si.created_by, si.bought_by,
+                  si.created_date, si.bought_date
+           FROM shopping_items si
+           JOIN products p ON p.name = si.product_name
+           JOIN categories c ON c.name = COALESCE(si.category, 'Другое')""",
+        "DROP TABLE shopping_items",
+        "ALTER TABLE shopping_items_new RENAME TO shopping_items",
+        """CREATE TABLE purchase_history_new (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               list_id INTEGER NOT NULL,
+               product_id INTEGER NOT NULL,
+               category_id INTEGER NOT NULL,
+               bought_by INTEGER,
+               bought_date TIMESTAMP,
+               FOREIGN KEY (list_id) REFERENCES shopping_lists (id),
+               FOREIGN KEY (product_id) REFERENCES products (id),
+               FOREIGN KEY (category_id) REFERENCES categories (id),
+               FOREIGN KEY (bought_by) REFERENCES users (id)
+           )""",
+        """INSERT INTO purchase_history_new (id, list_id, product_id, category_id, bought_by, bought_date)
+           SELECT ph.id, ph.list_id, p.id, c.id, ph.bought_by, ph.bought_date
+           FROM purchase_history ph
+           JOIN products p ON p.name = ph.product_name
+           JOIN categories c ON c.name = COALESCE(ph.category, 'Другое')""",
+        "DROP TABLE purchase_history",
+        "ALTER TABLE purchase_history_new RENAME TO purchase_history",
+        # Индексы удалены вместе со старыми таблицами
+        """CREATE INDEX IF NOT EXISTS idx_items_list_active
+           ON shopping_items (list_id, sort_order) WHERE bought_by IS NULL""",
+        "CREATE INDEX IF NOT EXISTS idx_items_list ON shopping_items (list_id)",
+        "CREATE INDEX IF NOT EXISTS idx_history_list_date_id ON purchase_history (list_id, bought_date, id)",
+        # Группировка истории по товару: покрывающий индекс из целых чисел
+        "CREATE INDEX IF NOT EXISTS idx_history_list_product ON purchase_history (list_id, product_id)",
+        "DROP TABLE product_stats",
+        """CREATE TABLE product_stats (
+               list_id INTEGER NOT NULL,
+               product_id INTEGER NOT NULL,
+               purchase_count INTEGER NOT NULL DEFAULT 0,
+               first_bought TIMESTAMP,
+               last_bought TIMESTAMP,
+               decay_score REAL NOT NULL DEFAULT 0,
+               PRIMARY KEY (list_id, product_id),
+               FOREIGN KEY (list_id) REFERENCES shopping_lists (id),
+               FOREIGN KEY (product_id) REFERENCES products (id)
+           )""",
+        "CREATE INDEX IF NOT EXISTS idx_stats_list_count ON product_stats (list_id, purchase_count DESC)",
+        lambda cursor: Database.fill_product_stats(cursor),
+        lambda cursor: Database.fill_search_index(cursor),
+    ]),
+    (10, "Модель предсказания категорий", [
+        # Пары (товар, категория), уже учтенные в частотах признаков
+        """CREATE TABLE IF NOT EXISTS category_examples (
+               product_id INTEGER NOT NULL,
+               category_id INTEGER NOT NULL,
+               PRIMARY KEY (product_id, category_id)
+           ) WITHOUT ROWID""",
+        # Число примеров категории, у которых есть признак (слово или триграмма)
+        """CREATE TABLE IF NOT EXISTS category_features (
+               feature TEXT NOT NULL,
+               category_id INTEGER NOT NULL,
+               count INTEGER NOT NULL DEFAULT 0,
+               PRIMARY KEY (feature, category_id)
+           ) WITHOUT ROWID""",
+        lambda cursor: Database.fill_category_model(cursor),
+    ]),
+    (11, "Синхронизация совместных списков", [
+        # uid - идентификатор товара, общий для всех устройств участников
+        "ALTER TABLE shopping_items ADD COLUMN uid TEXT",
+        "UPDATE shopping_items SET uid = lower(hex(randomblob(16))) WHERE uid IS NULL",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_items_uid ON shopping_items (uid)",
+        # NULL - список не синхронизируется, иначе номер последнего изменения с сервера
+        "ALTER TABLE shopping_lists ADD COLUMN sync_seq INTEGER",
+        # Товары синхронизируемых списков, измененные после последней отправки
+        """CREATE TABLE IF NOT EXISTS sync_outbox (
+               id INTEGER PRIMARY KEY,
+               list_id INTEGER NOT NULL,
+               uid TEXT NOT NULL
+           )""",
+        "CREATE INDEX IF NOT EXISTS idx_outbox_list ON sync_outbox (list_id)",
+        # Изменения товаров синхронизируемого списка ставятся в очередь отправки
+        """CREATE TRIGGER IF NOT EXISTS sync_items_insert AFTER INSERT ON shopping_items
+           WHEN (SELECT sync_seq FROM shopping_lists WHERE id = new.list_id) IS NOT NULL BEGIN
+               INSERT INTO sync_outbox (list_id, uid) VALUES (new.list_id, new.uid);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS sync_items_update
+           AFTER UPDATE OF product_id, category_id, sort_order, bought_by ON shopping_items
+           WHEN (SELECT sync_seq FROM shopping_lists WHERE id = new.list_id) IS NOT NULL BEGIN
+               INSERT INTO sync_outbox (list_id, uid) VALUES (new.list_id, new.uid);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS sync_items_delete AFTER DELETE ON shopping_items
+           WHEN (SELECT sync_seq FROM shopping_lists WHERE id = old.list_id) IS NOT NULL BEGIN
+               INSERT INTO sync_outbox (list_id, uid) VALUES (old.list_id, old.uid);
+           END""",
+    ]),
+    (12, "Удаление индекса прежних предложений", [
+        # Предложения ранжируются в suggestions.py по всем строкам списка
+        # (первичный ключ product_stats), сортировка по числу покупок не нужна
+        "DROP INDEX IF EXISTS idx_stats_list_count",
+    ]),
+]
+
+# Индекс поиска FTS5. В отличие от таблиц списков он хранит названия
+# товаров и категорий текстом: по ним идет полнотекстовый поиск.
+SEARCH_INDEX_TABLE = """CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+           product_name, category, list_id UNINDEXED, bought_date UNINDEXED,
+           tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+       )"""
+
+# Триггер истории отдельно: массовый импорт снимает его и индексирует
+# новые записи одним INSERT ... SELECT
+SEARCH_HISTORY_TRIGGER = """CREATE TRIGGER IF NOT EXISTS search_history_insert AFTER INSERT ON purchase_history BEGIN
+           INSERT INTO search_index (rowid, product_name, category, list_id, bought_date)
+           SELECT new.id * 2 + 1, p.name, c.name, new.list_id, new.bought_date
+           FROM products p, categories c WHERE p.id = new.product_id AND c.id = new.category_id;
+       END"""
+
+# Триггеры, поддерживающие индекс поиска в актуальном состоянии.
+# rowid = id*2 для некупленных товаров и id*2+1 для истории, поэтому
+# триггеры удаляют строки индекса по rowid, без сканирования.
+SEARCH_INDEX_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS search_items_insert AFTER INSERT ON shopping_items
+       WHEN new.bought_by IS NULL BEGIN
+           INSERT INTO search_index (rowid, product_name, category, list_id, bought_date)
+           SELECT new.id * 2, p.name, c.name, new.list_id, NULL
+           FROM products p, categories c WHERE p.id = new.product_id AND c.id = new.category_id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS search_items_update AFTER UPDATE OF product_id, category_id, bought_by
+       ON shopping_items BEGIN
+           DELETE FROM search_index WHERE rowid = old.id * 2;
+           INSERT INTO search_index (rowid, product_name, category, list_id, bought_date)
+           SELECT new.id * 2, p.name, c.name, new.list_id, NULL
+           FROM products p, categories c
+           WHERE p.id = new.product_id AND c.id = new.category_id AND new.bought_by IS NULL;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS search_items_delete AFTER DELETE ON shopping_items BEGIN
+           DELETE FROM search_index WHERE rowid = old.id * 2;
+       END""",
+    SEARCH_HISTORY_TRIGGER,
+    """CREATE TRIGGER IF NOT EXISTS search_history_delete AFTER DELETE ON purchase_history BEGIN
+           DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+       END""",
+]
+
+# Полное перестроение содержимого индекса поиска
+SEARCH_INDEX_FILL = [
+    "DELETE FROM search_index",
+    """INSERT INTO search_index (rowid, product_name, category, list_id, bought_date)
+       SELECT si.id * 2, p.name, c.name, si.list_id, NULL
+       FROM shopping_items si
+       JOIN products p ON p.id = si.product_id
+       JOIN categories c ON c.id = si.category_id
+       WHERE si.bought_by IS NULL""",
+    """INSERT INTO search_index (rowid, product_name, category, list_id, bought_date)
+       SELECT ph.id * 2 + 1, p.name, c.name, ph.list_id, ph.bought_date
+       FROM purchase_history ph
+       JOIN products p ON p.id = ph.product_id
+       JOIN categories c ON c.id = ph.category_id""",
+    # Слияние сегментов после массовой вставки уменьшает размер индекса
+    "INSERT INTO search_index (search_index) VALUES ('optimize')",
+]
+
+SEARCH_PAGE_SIZE = 20
+# Сколько совпадений в списках пользователя еще ранжируется по релевантности;
+# запросы с большим числом совпадений выдаются без ранжирования (см. search)
+SEARCH_RANK_LIMIT = 5000
+
+# Ключ настроек с алгоритмом и стоимостью хеширования паролей
+PASSWORD_HASHER_SETTING = "password_hasher"
+
+HISTORY_PAGE_SIZE = 50
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 10000
+
+# Шаг между соседними sort_order: при перестановке товар получает значение
+# между соседями, и остальные строки списка не переписываются
+SORT_ORDER_GAP = 1024
+
+SHARE_CODE_LENGTH = 8
+SHARE_CODE_ATTEMPTS = 10
+
+# Адрес сервера синхронизации ("host:port"), если он не передан в Database
+SYNC_SERVER_ENV = "SHOPPING_SYNC_SERVER"
+
+# Горячие запросы из statements.STATEMENTS с примерами параметров;
+# они не должны откатываться к полному сканированию таблиц
+# (проверяется tests/test_query_plans.py)
+HOT_QUERIES = {
+    "get_shopping_list": (1,),
+    "get_purchase_history": (1,),
+    "purchase_history_page": (1, "2024-01-01 00:00:00", 1, 50),
+    "get_last_purchased_product": (1,),
+    "find_list_by_code": ("ABCD1234",),
+    "get_user_shopping_lists": (1,),
+    # Товары и участники: каждое действие в интерфейсе
+    "find_user_credentials": ("user",),
+    "find_member_list_by_code": ("ABCD1234", 1),
+    "is_member": (1, 1),
+    "get_list_members": (1,),
+    "get_item": (1,),
+    "get_item_list": (1,),
+    "get_item_status": (1,),
+    "get_items_from_order": (1, 1024),
+    "get_active_item_ids": (1,),
+    "get_move_neighbours": (1, 1, 0),
+    "count_active_items": (1,),
+    # Поиск: MATCH по индексу FTS5
+    "search_fts": (1, "молоко*", 20, 0),
+    "search_fts_recent": (1, "молоко*", 20, 0),
+    "count_search_hits": (1, "молоко*", 5000),
+    "index_history_since": (1,),
+    # Справочник товаров и статистика покупок
+    "find_product_id": ("Молоко",),
+    "find_category_id": ("Молочные",),
+    "get_product_names": (1, 1),
+    "get_product_stats": (1,),
+    "get_product_stats_row": (1, 1),
+    # Обучение модели категорий при каждой покупке
+    "insert_category_example": (1, 1),
+    "add_category_feature": ("w:молоко", 1, 1),
+    # Синхронизация списков
+    "get_sync_state": (1,),
+    "get_outbox_uids": (1, 100),
+    "get_sync_item": ("uid",),
+    "find_item_by_uid": ("uid",),
+}
+
+
+class ConnectionPool:
+    """Пул долгоживущих соединений SQLite с учетом потоков.
+
+    Поток, уже держащий соединение, при повторном запросе получает то же самое
+    соединение, поэтому вложенные вызовы методов Database не блокируют пул.
+    Перед выдачей простаивающее соединение проверяется запросом SELECT 1.
+    """
+
+    def __init__(self, db_name, size=4, timeout=10.0, on_connect=None,
+                 cached_statements=statements.STATEMENT_CACHE_SIZE):
+        self.db_name = db_name
+        self.size = size
+        self.timeout = timeout
+        # Размер кэша подготовленных выражений каждого соединения
+        self.cached_statements = cached_statements
+        self.on_connect = on_connect
+        self._idle = []
+        self._created = 0
+        self._owners = {}
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        if self.on_connect:
+            self.on_connect(conn)
+        return conn
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        self._created -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def acquire(self):
+        thread_id = threading.get_ident()
+
+        with self._condition:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Пул соединений закрыт")
+
+            # Повторный запрос из того же потока
+            owned = self._owners.get(thread_id)
+            if owned:
+                owned[1] += 1
+                return owned[0]
+
+            while True:
+                while self._idle:
+                    conn = self._idle.pop()
+                    if self._is_healthy(conn):
+                        self._owners[thread_id] = [conn, 1]
+                        return conn
+                    self._discard(conn)
+
+                if self._created < self.size:
+                    self._created += 1
+                    break
+
+                if not self._condition.wait(self.timeout):
+                    raise sqlite3.OperationalError("Нет свободных соединений в пуле")
+
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._condition:
+                self._created -= 1
+                self._condition.notify()
+            raise
+
+        with self._condition:
+            self._owners[thread_id] = [conn, 1]
+        return conn
+
+    def release(self, conn):
+        thread_id = threading.get_ident()
+
+        with self._condition:
+            owned = self._owners.get(thread_id)
+            if not owned or owned[0] is not conn:
+                return
+
+            owned[1] -= 1
+            if owned[1] > 0:
+                return
+
+            del self._owners[thread_id]
+
+            # Незавершенная транзакция (например, после ошибки) откатывается
+            if conn.in_transaction:
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    self._discard(conn)
+                    self._condition.notify()
+                    return
+
+            if self._closed:
+                self._discard(conn)
+            else:
+                self._idle.append(conn)
+            self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._condition.notify_all()
+
+
+class SyncRequest:
+    """Изменения списка, собранные для отправки на сервер (Database.start_sync).
+
+    pushed_max - последняя запись очереди отправки, вошедшая в changes.
+    """
+
+    def __init__(self, list_id, share_code, list_name, since, pushed_max, changes):
+        self.list_id = list_id
+        self.share_code = share_code
+        self.list_name = list_name
+        self.since = since
+        self.pushed_max = pushed_max
+        self.changes = changes
+
 
 class Database:
-    def __init__(self):
-        self.db_name = "shopping_list.db"
+    def __init__(self, db_name="shopping_list.db", pool_size=4, pragma_profile=DEFAULT_PRAGMA_PROFILE,
+                 pragmas=None, password_hasher=None, sync_server=None, calibrate_password=True):
+        self.db_name = db_name
         self.current_user_id = None
         self.current_username = None
+
+        if pragma_profile not in PRAGMA_PROFILES:
+            raise ValueError(f"Неизвестный профиль PRAGMA: {pragma_profile}")
+        # Отдельные значения из pragmas переопределяют выбранный профиль
+        self.pragmas = dict(PRAGMA_PROFILES[pragma_profile])
+        self.pragmas.update(pragmas or {})
+
+        self.pool = ConnectionPool(self.db_name, size=pool_size, on_connect=self.apply_pragmas)
         self.init_database()
+        # Без FTS5 в сборке SQLite поиск выполняется через LIKE
+        self.has_search_index = self.check_search_index()
+        # Если хешер не задан явно, берется сохраненный в settings (или калибруется).
+        # С calibrate_password=False первая калибровка откладывается до
+        # ensure_password_hasher, а до нее действует стоимость по умолчанию
+        self.password_hasher = password_hasher or self.load_password_hasher(calibrate_password)
+        # Модель категорий загружается из базы при первом предсказании
+        self.category_predictor = None
+        self.category_lock = threading.Lock()
+        # Без адреса сервера совместные списки остаются локальными
+        sync_server = sync_server or os.environ.get(SYNC_SERVER_ENV)
+        self.sync_client = None
+        if sync_server:
+            # Клиент импортируется только при заданном сервере: запуск без него быстрее
+            from sync_client import SyncClient
+            self.sync_client = SyncClient.from_address(sync_server)
+
+    def apply_pragmas(self, conn):
+        """Применяет профиль PRAGMA к новому соединению"""
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
 
     def get_connection(self):
         try:
-            return sqlite3.connect(self.db_name)
+            return self.pool.acquire()
         except Exception as e:
-            print(f"Ошибка БД: {e}")
+            logger.error("Ошибка БД: %s", e)
             return None
 
+    def release_connection(self, conn):
+        self.pool.release(conn)
+
+    def close(self):
+        """Закрывает все соединения пула и соединение с сервером синхронизации"""
+        if self.sync_client:
+            self.sync_client.close()
+        self.pool.close()
+
     def init_database(self):
         conn = self.get_connection()
         if not conn: return False
@@ -59,7 +606,8 @@ class Database:
                 )
             ''')
 
-            # Таблица товаров
+            # Таблица товаров. Здесь и в истории покупок - исходная схема с
+            # названиями текстом; миграция 9 переводит их на справочник товаров
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS shopping_items (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -91,17 +639,244 @@ class Database:
                 )
             ''')
 
+            # Таблица версий схемы
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT,
+                    applied_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
             conn.commit()
-            print("База данных инициализирована")
+            self.apply_migrations(conn)
+            logger.info("База данных инициализирована")
             return True
         except Exception as e:
-            print(f"Ошибка инициализации БД: {e}")
+            logger.error("Ошибка инициализации БД: %s", e)
             return False
         finally:
-            conn.close()
+            self.release_connection(conn)
+
+    def get_schema_version(self, conn):
+        result = statements.fetchone(conn, "get_schema_version")
+        return result[0] or 0
+
+    def apply_migrations(self, conn):
+        """Применяет по порядку все миграции новее текущей версии схемы.
+
+        Каждая миграция выполняется в отдельной транзакции вместе с записью
+        в schema_version, поэтому при ошибке схема остается на прежней версии.
+        """
+        current_version = self.get_schema_version(conn)
+
+        for version, description, steps in MIGRATIONS:
+            if version <= current_version:
+                continue
+
+            cursor = conn.cursor()
+            try:
+                # sqlite3 не открывает транзакцию перед DDL, а миграция
+                # должна откатываться целиком
+                if not conn.in_transaction:
+                    cursor.execute("BEGIN")
+                for step in steps:
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        cursor.execute(step)
+                statements.execute(cursor, "insert_schema_version", (version, description))
+                conn.commit()
+                logger.info("Применена миграция %s: %s", version, description)
+            except Exception:
+                conn.rollback()
+                raise
+
+    def find_full_scans(self):
+        """Возвращает горячие запросы, план которых содержит полное сканирование таблицы.
+
+        Результат - словарь {имя запроса: [строки плана со SCAN]}; пустой словарь
+        означает, что все горячие запросы используют индексы. SCAN виртуальной
+        таблицы FTS5 с MATCH - это поиск по ее индексу, а SCAN (subquery-N) -
+        обход уже отобранных подзапросом строк; ни то, ни другое не считается.
+        """
+        conn = self.get_connection()
+        if not conn: return None
+
+        try:
+            scans = {}
+            for name, params in HOT_QUERIES.items():
+                sql = statements.statement_sql(name)
+                plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+                details = [row[-1] for row in plan]
+                full_scans = [
+                    d for d in details
+                    if d.startswith("SCAN") and "VIRTUAL TABLE INDEX" not in d and not d.startswith("SCAN (subquery")
+                ]
+                if full_scans:
+                    scans[name] = full_scans
+            return scans
+        finally:
+            self.release_connection(conn)
+
+    @staticmethod
+    def create_search_index(cursor):
+        """Создает таблицу полнотекстового поиска, если SQLite собран с FTS5"""
+        try:
+            cursor.execute(SEARCH_INDEX_TABLE)
+        except sqlite3.OperationalError as e:
+            logger.warning("FTS5 недоступен, поиск будет работать через LIKE: %s", e)
+            return False
+        return True
+
+    @staticmethod
+    def fill_search_index(cursor):
+        """Создает триггеры индекса поиска и заново заполняет его, если индекс есть"""
+        if statements.fetchone(cursor, "has_search_index") is None:
+            return False
+        for step in SEARCH_INDEX_TRIGGERS + SEARCH_INDEX_FILL:
+            cursor.execute(step)
+        return True
+
+    def check_search_index(self):
+        conn = self.get_connection()
+        if not conn: return False
+
+        try:
+            return statements.fetchone(conn, "has_search_index") is not None
+        except Exception as e:
+            logger.error("Ошибка проверки индекса поиска: %s", e)
+            return False
+        finally:
+            self.release_connection(conn)
+
+    @staticmethod
+    def fts_query(text):
+        """Превращает ввод пользователя в запрос FTS5: все слова как префиксы"""
+        words = [word.replace('"', '""') for word in text.split()]
+        return " ".join(f'"{word}"*' for word in words)
+
+    def search(self, text, offset=0, limit=SEARCH_PAGE_SIZE):
+        """Ищет товары и покупки во всех списках, где состоит пользователь.
+
+        Возвращает (строки, next_offset): строки - кортежи (источник, list_id,
+        название списка, товар, категория, дата покупки), где источник -
+        'item' для товара в списке или 'history' для покупки. Результаты
+        упорядочены по релевантности, при равной - сначала текущие товары,
+        затем более свежие покупки. Если совпадений в списках пользователя
+        больше SEARCH_RANK_LIMIT, ранжирование всех строк слишком дорого, и
+        результаты идут по убыванию id: новые товары раньше старых и новые
+        покупки раньше старых, но товары и покупки перемешаны. next_offset
+        равен None на последней странице.
+        """
+        if not self.is_logged_in() or not text.strip():
+            return [], None
+
+        conn = self.get_connection()
+        if not conn: return [], None
+
+        try:
+            # Запрашиваем на одну строку больше, чтобы узнать о следующей странице
+            if self.has_search_index:
+                query = self.fts_query(text)
+                hits = statements.fetchone(
+                    conn, "count_search_hits", (self.current_user_id, query, SEARCH_RANK_LIMIT + 1)
+                )[0]
+                name = "search_fts" if hits <= SEARCH_RANK_LIMIT else "search_fts_recent"
+                rows = statements.fetchall(conn, name, (self.current_user_id, query, limit + 1, offset))
+            else:
+                pattern = f"%{text.strip()}%"
+                rows = statements.fetchall(conn, "search_like", (
+                    self.current_user_id, pattern, pattern,
+                    self.current_user_id, pattern, pattern,
+                    limit + 1, offset
+                ))
+
+            next_offset = offset + limit if len(rows) > limit else None
+            logger.debug("Поиск '%s': %s результатов", text, len(rows[:limit]))
+            return rows[:limit], next_offset
+        except Exception as e:
+            logger.error("Ошибка поиска: %s", e)
+            return [], None
+        finally:
+            self.release_connection(conn)
+
+    @staticmethod
+    def get_statement_stats(limit=None):
+        """Число выполнений и суммарное время (мс) по именованным запросам.
+
+        Без limit возвращает словарь {имя: (число, мс)}, с limit - список
+        самых затратных запросов [(имя, число, мс), ...].
+        """
+        if limit is None:
+            return statements.STATEMENT_STATS.snapshot()
+        return statements.STATEMENT_STATS.top(limit)
+
+    @staticmethod
+    def reset_statement_stats():
+        statements.STATEMENT_STATS.reset()
+
+    def get_setting(self, key, default=None):
+        conn = self.get_connection()
+        if not conn: return default
+
+        try:
+            row = statements.fetchone(conn, "get_setting", (key,))
+            return row[0] if row else default
+        except Exception as e:
+            logger.error("Ошибка чтения настройки %s: %s", key, e)
+            return default
+        finally:
+            self.release_connection(conn)
+
+    def set_setting(self, key, value):
+        conn = self.get_connection()
+        if not conn: return False
+
+        try:
+            statements.execute(conn, "set_setting", (key, value))
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error("Ошибка сохранения настройки %s: %s", key, e)
+            return False
+        finally:
+            self.release_connection(conn)
+
+    def load_password_hasher(self, calibrate=True):
+        """Возвращает хешер паролей из настроек; при первом запуске калибрует его.
+
+        С calibrate=False вместо калибровки возвращается хешер со стоимостью
+        по умолчанию (без сохранения).
+        """
+        config = self.get_setting(PASSWORD_HASHER_SETTING)
+        if config:
+            try:
+                return passwords.load_hasher(config)
+            except ValueError as e:
+                logger.warning("Некорректная настройка хеширования: %s", e)
+        if not calibrate:
+            return passwords.PBKDF2Hasher()
+        return self.calibrate_password_hasher()
+
+    def ensure_password_hasher(self):
+        """Калибрует хеширование, если настройка еще не сохранена (отложенный первый запуск)"""
+        self.password_hasher = self.load_password_hasher()
+        return self.password_hasher
+
+    def calibrate_password_hasher(self, target_ms=passwords.DEFAULT_TARGET_MS, hasher_class=passwords.PBKDF2Hasher):
+        """Подбирает стоимость хеширования под target_ms на этом устройстве и сохраняет ее.
+
+        Пароли существующих пользователей пересчитываются при их следующем входе.
+        """
+        hasher = passwords.calibrate(target_ms, hasher_class)
+        self.set_setting(PASSWORD_HASHER_SETTING, passwords.hasher_config(hasher))
+        self.password_hasher = hasher
+        logger.info("Хеширование паролей: %s", passwords.hasher_config(hasher))
+        return hasher
 
     def hash_password(self, password):
-        return hashlib.sha256(password.encode()).hexdigest()
+        return self.password_hasher.hash(password)
 
     def register_user(self, username, password):
         conn = self.get_connection()
@@ -111,21 +886,18 @@ class Database:
             cursor = conn.cursor()
             password_hash = self.hash_password(password)
 
-            cursor.execute(
-                "INSERT INTO users (username, password_hash) VALUES (?, ?)",
-                (username, password_hash)
-            )
+            statements.execute(cursor, "insert_user", (username, password_hash))
             conn.commit()
-            print(f"Пользователь {username} зарегистрирован")
+            logger.info("Пользователь %s зарегистрирован", username)
             return True
         except sqlite3.IntegrityError:
-            print("Пользователь уже существует")
+            logger.warning("Пользователь уже существует")
             return False
         except Exception as e:
-            print(f"Ошибка регистрации: {e}")
+            logger.error("Ошибка регистрации: %s", e)
             return False
         finally:
-            conn.close()
+            self.release_connection(conn)
 
     def login_user(self, username, password):
         conn = self.get_connection()
@@ -133,30 +905,31 @@ class Database:
 
         try:
             cursor = conn.cursor()
-            password_hash = self.hash_password(password)
-
-            cursor.execute(
-                "SELECT id, username FROM users WHERE username = ? AND password_hash = ?",
-                (username, password_hash)
-            )
-            result = cursor.fetchone()
-
-            if result:
+            result = statements.fetchone(cursor, "find_user_credentials", (username,))
+
+            if result is None:
+                # Хешируем впустую, чтобы время ответа не выдавало несуществующих пользователей
+                self.hash_password(password)
+            elif passwords.verify_password(password, result[2]):
+                if passwords.needs_rehash(result[2], self.password_hasher):
+                    statements.execute(cursor, "update_password_hash", (self.hash_password(password), result[0]))
+                    conn.commit()
+                    logger.info("Хеш пароля пользователя %s обновлен", username)
                 self.current_user_id = result[0]
                 self.current_username = result[1]
-                print(f"Пользователь {username} вошел в систему")
+                logger.info("Пользователь %s вошел в систему", username)
                 return True
-            else:
-                print("Неверные учетные данные")
-                return False
+
+            logger.warning("Неверные учетные данные")
+            return False
         except Exception as e:
-            print(f"Ошибка входа: {e}")
+            logger.error("Ошибка входа: %s", e)
             return False
         finally:
-            conn.close()
+            self.release_connection(conn)
 
     def logout_user(self):
-        print(f"Пользователь {self.current_username} вышел из системы")
+        logger.info("Пользователь %s вышел из системы", self.current_username)
         self.current_user_id = None
         self.current_username = None
 
@@ -169,6 +942,18 @@ class Database:
     def is_logged_in(self):
         return self.current_user_id is not None
 
+    @staticmethod
+    def normalize_share_code(share_code):
+        return share_code.strip().upper()
+
+    def generate_share_code(self, cursor):
+        """Генерирует код приглашения, которого еще нет в базе"""
+        for _ in range(SHARE_CODE_ATTEMPTS):
+            share_code = uuid.uuid4().hex[:SHARE_CODE_LENGTH].upper()
+            if not statements.fetchone(cursor, "share_code_exists", (share_code,)):
+                return share_code
+        raise sqlite3.IntegrityError("Не удалось сгенерировать уникальный код списка")
+
     def create_shopping_list(self, list_name):
         if not self.is_logged_in():
             return None
@@ -178,27 +963,21 @@ class Database:
 
         try:
             cursor = conn.cursor()
-            share_code = str(uuid.uuid4())[:8].upper()
+            share_code = self.generate_share_code(cursor)
 
-            cursor.execute(
-                "INSERT INTO shopping_lists (name, owner_id, share_code) VALUES (?, ?, ?)",
-                (list_name, self.current_user_id, share_code)
-            )
+            statements.execute(cursor, "insert_list", (list_name, self.current_user_id, share_code))
             list_id = cursor.lastrowid
 
-            cursor.execute(
-                "INSERT INTO list_members (list_id, user_id) VALUES (?, ?)",
-                (list_id, self.current_user_id)
-            )
+            statements.execute(cursor, "insert_member", (list_id, self.current_user_id))
 
             conn.commit()
-            print(f"Создан список '{list_name}' с кодом {share_code}")
+            logger.info("Создан список '%s' с кодом %s", list_name, share_code)
             return list_id
         except Exception as e:
-            print(f"Ошибка создания списка: {e}")
+            logger.error("Ошибка создания списка: %s", e)
             return None
         finally:
-            conn.close()
+            self.release_connection(conn)
 
     def join_shopping_list(self, share_code):
         if not self.is_logged_in():
@@ -210,39 +989,45 @@ class Database:
         try:
             cursor = conn.cursor()
 
-            # Находим список по коду (без учета регистра)
-            cursor.execute("SELECT id FROM shopping_lists WHERE UPPER(share_code) = ?", (share_code.upper(),))
-            result = cursor.fetchone()
+            # Коды хранятся нормализованными, поэтому поиск идет по UNIQUE-индексу
+            share_code = self.normalize_share_code(share_code)
+            result = statements.fetchone(cursor, "find_list_by_code", (share_code,))
+
+            if not result and self.sync_client:
+                # Список создан на другом устройстве: заводим локальную копию,
+                # товары придут при синхронизации
+                try:
+                    list_name = self.sync_client.list_info(share_code)
+                except SyncError as e:
+                    logger.warning("Список %s не найден на сервере: %s", share_code, e)
+                    return False
+                statements.execute(
+                    cursor, "insert_synced_list", (list_name or share_code, self.current_user_id, share_code)
+                )
+                result = (cursor.lastrowid,)
 
             if not result:
-                print("Список с таким кодом не найден")
+                logger.warning("Список с таким кодом не найден")
                 return False
 
             list_id = result[0]
 
             # Проверяем, не является ли пользователь уже участником
-            cursor.execute(
-                "SELECT 1 FROM list_members WHERE list_id = ? AND user_id = ?",
-                (list_id, self.current_user_id)
-            )
-            if cursor.fetchone():
-                print("Вы уже участник этого списка")
+            if statements.fetchone(cursor, "is_member", (list_id, self.current_user_id)):
+                logger.warning("Вы уже участник этого списка")
                 return False
 
             # Добавляем пользователя как участника
-            cursor.execute(
-                "INSERT INTO list_members (list_id, user_id) VALUES (?, ?)",
-                (list_id, self.current_user_id)
-            )
+            statements.execute(cursor, "insert_member", (list_id, self.current_user_id))
 
             conn.commit()
-            print(f"Пользователь присоединился к списку {list_id}")
+            logger.info("Пользователь присоединился к списку %s", list_id)
             return True
         except Exception as e:
-            print(f"Ошибка присоединения к списку: {e}")
+            logger.error("Ошибка присоединения к списку: %s", e)
             return False
         finally:
-            conn.close()
+            self.release_connection(conn)
 
     def get_user_shopping_lists(self):
         if not self.is_logged_in():
@@ -253,23 +1038,14 @@ class Database:
 
         try:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT sl.id, sl.name, sl.owner_id, u.username, sl.share_code
-                FROM shopping_lists sl
-                JOIN list_members lm ON sl.id = lm.list_id
-                JOIN users u ON sl.owner_id = u.id
-                WHERE lm.user_id = ?
-                ORDER BY sl.created_date DESC
-            ''', (self.current_user_id,))
-
-            lists = cursor.fetchall()
-            print(f"Найдено {len(lists)} списков для пользователя")
+            lists = statements.fetchall(cursor, "get_user_shopping_lists", (self.current_user_id,))
+            logger.debug("Найдено %s списков для пользователя", len(lists))
             return lists
         except Exception as e:
-            print(f"Ошибка получения списков: {e}")
+            logger.error("Ошибка получения списков: %s", e)
             return []
         finally:
-            conn.close()
+            self.release_connection(conn)
 
     def get_list_info(self, list_id):
         conn = self.get_connection()
@@ -277,19 +1053,12 @@ class Database:
 
         try:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT sl.id, sl.name, sl.owner_id, u.username, sl.share_code
-                FROM shopping_lists sl
-                JOIN users u ON sl.owner_id = u.id
-                WHERE sl.id = ?
-            ''', (list_id,))
-
-            return cursor.fetchone()
+            return statements.fetchone(cursor, "get_list_info", (list_id,))
         except Exception as e:
-            print(f"Ошибка получения информации о списке: {e}")
+            logger.error("Ошибка получения информации о списке: %s", e)
             return None
         finally:
-            conn.close()
+            self.release_connection(conn)
 
     def delete_shopping_list(self, list_id):
         if not self.is_logged_in():
@@ -302,27 +1071,25 @@ class Database:
             cursor = conn.cursor()
 
             # Проверяем, является ли пользователь владельцем
-            cursor.execute("SELECT owner_id FROM shopping_lists WHERE id = ?", (list_id,))
-            result = cursor.fetchone()
+            result = statements.fetchone(cursor, "get_list_owner", (list_id,))
 
             if not result or result[0] != self.current_user_id:
-                print("Только владелец может удалить список")
+                logger.warning("Только владелец может удалить список")
                 return False
 
             # Удаляем все связанные данные
-            cursor.execute("DELETE FROM shopping_items WHERE list_id = ?", (list_id,))
-            cursor.execute("DELETE FROM purchase_history WHERE list_id = ?", (list_id,))
-            cursor.execute("DELETE FROM list_members WHERE list_id = ?", (list_id,))
-            cursor.execute("DELETE FROM shopping_lists WHERE id = ?", (list_id,))
+            for name in ("delete_list_items", "delete_list_outbox", "delete_list_history", "delete_list_stats",
+                         "delete_list_members", "delete_list"):
+                statements.execute(cursor, name, (list_id,))
 
             conn.commit()
-            print(f"Список {list_id} удален")
+            logger.info("Список %s удален", list_id)
             return True
         except Exception as e:
-            print(f"Ошибка удаления списка: {e}")
+            logger.error("Ошибка удаления списка: %s", e)
             return False
         finally:
-            conn.close()
+            self.release_connection(conn)
 
     def get_list_members(self, list_id):
         conn = self.get_connection()
@@ -330,25 +1097,115 @@ class Database:
 
         try:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT u.username 
-                FROM list_members lm
-                JOIN users u ON lm.user_id = u.id
-                WHERE lm.list_id = ?
-            ''', (list_id,))
-
-            members = [row[0] for row in cursor.fetchall()]
-            print(f"Найдено {len(members)} участников списка {list_id}")
+            members = [row[0] for row in statements.fetchall(cursor, "get_list_members", (list_id,))]
+            logger.debug("Найдено %s участников списка %s", len(members), list_id)
             return members
         except Exception as e:
-            print(f"Ошибка получения участников: {e}")
+            logger.error("Ошибка получения участников: %s", e)
             return []
         finally:
-            conn.close()
+            self.release_connection(conn)
+
+    @staticmethod
+    def catalog_id(cursor, kind, name):
+        """Возвращает id названия в справочнике товаров или категорий, добавляя его при отсутствии.
+
+        kind - "product" или "category". Вызывается в транзакции вызывающего.
+        """
+        row = statements.fetchone(cursor, f"find_{kind}_id", (name,))
+        if row:
+            return row[0]
+        statements.execute(cursor, f"insert_{kind}", (name,))
+        return cursor.lastrowid
+
+    def allocate_sort_orders(self, cursor, list_id, count):
+        """Резервирует count значений sort_order в конце списка, возвращает первое.
+
+        Счетчик увеличивается UPDATE-ом в текущей транзакции, поэтому
+        параллельные добавления не получат одинаковый порядок.
+        """
+        statements.execute(cursor, "bump_sort_counter", (count * SORT_ORDER_GAP, list_id))
+        if cursor.rowcount == 0:
+            raise sqlite3.IntegrityError(f"Список {list_id} не найден")
+
+        return statements.fetchone(cursor, "get_sort_counter", (list_id,))[0] - count * SORT_ORDER_GAP
+
+    def renumber_list(self, cursor, list_id):
+        """Заново раскладывает некупленные товары списка с шагом SORT_ORDER_GAP"""
+        product_ids = [row[0] for row in statements.fetchall(cursor, "get_active_item_ids", (list_id,))]
+        statements.executemany(
+            cursor, "set_sort_order",
+            [((index + 1) * SORT_ORDER_GAP, product_id) for index, product_id in enumerate(product_ids)]
+        )
+        statements.execute(cursor, "raise_sort_counter", ((len(product_ids) + 1) * SORT_ORDER_GAP, list_id))
+        return len(product_ids)
+
+    def move_product(self, product_id, new_index):
+        """Перемещает некупленный товар на позицию new_index в списке.
+
+        Товар получает sort_order посередине между новыми соседями, остальные
+        строки не меняются. Только если между соседями не осталось места,
+        список перенумеровывается целиком. Возвращает число измененных строк
+        (0 при ошибке).
+        """
+        if not self.is_logged_in():
+            return 0
+
+        conn = self.get_connection()
+        if not conn: return 0
+
+        try:
+            cursor = conn.cursor()
+            result = statements.fetchone(cursor, "find_active_item_list", (product_id,))
+            if not result:
+                logger.warning("Товар не найден")
+                return 0
+
+            list_id = result[0]
+            new_index = max(new_index, 0)
+            changed = 1
+
+            for attempt in range(2):
+                # Соседи на новой позиции, без учета самого перемещаемого товара
+                neighbours = statements.fetchall(
+                    cursor, "get_move_neighbours", (list_id, product_id, max(new_index - 1, 0))
+                )
+                orders = [row[0] for row in neighbours]
+
+                if new_index == 0:
+                    prev_order, next_order = None, (orders[0] if orders else None)
+                else:
+                    prev_order = orders[0] if orders else None
+                    next_order = orders[1] if len(orders) > 1 else None
+
+                if next_order is None:
+                    # В конец списка: берем значение из счетчика
+                    sort_order = self.allocate_sort_orders(cursor, list_id, 1)
+                    break
+                if prev_order is None:
+                    sort_order = next_order - SORT_ORDER_GAP
+                    break
+                if next_order - prev_order > 1:
+                    sort_order = (prev_order + next_order) // 2
+                    break
+
+                # Между соседями нет свободного значения
+                changed = self.renumber_list(cursor, list_id)
+
+            statements.execute(cursor, "set_sort_order", (sort_order, product_id))
+            conn.commit()
+            logger.info("Товар %s перемещен на позицию %s", product_id, new_index)
+            return changed
+        except Exception as e:
+            logger.error("Ошибка перемещения товара: %s", e)
+            return 0
+        finally:
+            self.release_connection(conn)
 
     def add_product(self, list_id, product_name, category='Другое'):
+        """Добавляет товар в список и возвращает его id (False при ошибке)"""
         if not self.is_logged_in():
-            print("Пользователь не авторизован")
+            logger.warning("Пользователь не авторизован")
             return False
 
         conn = self.get_connection()
@@ -356,25 +1213,70 @@ class Database:
 
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT MAX(sort_order) FROM shopping_items WHERE list_id = ?", (list_id,))
-            max_order = cursor.fetchone()[0] or 0
+            sort_order = self.allocate_sort_orders(cursor, list_id, 1)
+            product_ref = self.catalog_id(cursor, "product", product_name)
+            category_ref = self.catalog_id(cursor, "category", category or 'Другое')
 
-            cursor.execute(
-                "INSERT INTO shopping_items (list_id, product_name, category, sort_order, created_by) VALUES (?, ?, ?, ?, ?)",
-                (list_id, product_name, category, max_order + 1, self.current_user_id)
+            statements.execute(
+                cursor, "insert_item",
+                (list_id, product_ref, category_ref, sort_order, self.current_user_id, uuid.uuid4().hex)
             )
+            product_id = cursor.lastrowid
             conn.commit()
-            print(f"Добавлен товар '{product_name}' в список {list_id}")
-            return True
+            logger.info("Добавлен товар '%s' в список %s", product_name, list_id)
+            return product_id
         except Exception as e:
-            print(f"Ошибка добавления товара: {e}")
+            logger.error("Ошибка добавления товара: %s", e)
             return False
         finally:
-            conn.close()
+            self.release_connection(conn)
+
+    def add_products(self, list_id, items):
+        """Добавляет несколько товаров одной транзакцией.
+
+        items - последовательность пар (название, категория). Товары получают
+        подряд идущие sort_order в порядке items. Возвращает добавленные
+        строки в формате get_shopping_list (пустой список при ошибке).
+        """
+        if not self.is_logged_in():
+            logger.warning("Пользователь не авторизован")
+            return []
+
+        items = list(items)
+        if not items:
+            return []
+
+        conn = self.get_connection()
+        if not conn: return []
+
+        try:
+            cursor = conn.cursor()
+            first_order = self.allocate_sort_orders(cursor, list_id, len(items))
+
+            statements.executemany(
+                cursor, "insert_item",
+                [
+                    (list_id, self.catalog_id(cursor, "product", product_name),
+                     self.catalog_id(cursor, "category", category or 'Другое'),
+                     first_order + offset * SORT_ORDER_GAP, self.current_user_id, uuid.uuid4().hex)
+                    for offset, (product_name, category) in enumerate(items)
+                ]
+            )
+
+            products = statements.fetchall(cursor, "get_items_from_order", (list_id, first_order))
+
+            conn.commit()
+            logger.info("Добавлено %s товаров в список %s", len(products), list_id)
+            return products
+        except Exception as e:
+            logger.error("Ошибка добавления товаров: %s", e)
+            return []
+        finally:
+            self.release_connection(conn)
 
     def get_shopping_list(self, list_id):
         if not self.is_logged_in():
-            print("Пользователь не авторизован")
+            logger.warning("Пользователь не авторизован")
             return []
 
         conn = self.get_connection()
@@ -382,24 +1284,46 @@ class Database:
 
         try:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, product_name, category, sort_order, created_by, bought_by
-                FROM shopping_items 
-                WHERE list_id = ? AND bought_by IS NULL
-                ORDER BY sort_order
-            ''', (list_id,))
-            products = cursor.fetchall()
-            print(f"Найдено {len(products)} товаров в списке {list_id}")
+            products = statements.fetchall(cursor, "get_shopping_list", (list_id,))
+            logger.debug("Найдено %s товаров в списке %s", len(products), list_id)
             return products
         except Exception as e:
-            print(f"Ошибка получения списка товаров: {e}")
+            logger.error("Ошибка получения списка товаров: %s", e)
             return []
         finally:
-            conn.close()
+            self.release_connection(conn)
+
+    def get_item(self, product_id):
+        """Возвращает товар в том же формате, что и get_shopping_list"""
+        conn = self.get_connection()
+        if not conn: return None
+
+        try:
+            cursor = conn.cursor()
+            return statements.fetchone(cursor, "get_item", (product_id,))
+        except Exception as e:
+            logger.error("Ошибка получения товара: %s", e)
+            return None
+        finally:
+            self.release_connection(conn)
+
+    def get_item_list_id(self, product_id):
+        """Возвращает id списка, которому принадлежит товар, или None"""
+        conn = self.get_connection()
+        if not conn: return None
+
+        try:
+            row = statements.fetchone(conn, "get_item_list", (product_id,))
+            return row[0] if row else None
+        except Exception as e:
+            logger.error("Ошибка получения списка товара: %s", e)
+            return None
+        finally:
+            self.release_connection(conn)
 
     def toggle_bought_status(self, product_id):
         if not self.is_logged_in():
-            print("Пользователь не авторизован")
+            logger.warning("Пользователь не авторизован")
             return False
 
         conn = self.get_connection()
@@ -409,48 +1333,60 @@ class Database:
             cursor = conn.cursor()
 
             # Получаем текущий статус товара
-            cursor.execute("SELECT list_id, product_name, category, bought_by FROM shopping_items WHERE id = ?",
-                           (product_id,))
-            product = cursor.fetchone()
+            product = statements.fetchone(cursor, "get_item_status", (product_id,))
 
             if not product:
-                print("Товар не найден")
+                logger.warning("Товар не найден")
                 return False
 
-            list_id, product_name, category, current_bought_by = product
+            list_id, product_ref, category_ref, current_bought_by, product_name, category = product
+            learned = False
 
             # Получаем текущее время в правильном формате
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
             if current_bought_by is None:
                 # Отмечаем как купленный с явным указанием времени
-                cursor.execute(
-                    "UPDATE shopping_items SET bought_by = ?, bought_date = ? WHERE id = ?",
-                    (self.current_user_id, current_time, product_id)
-                )
-
-                # Добавляем в историю покупок с явным указанием времени
-                cursor.execute(
-                    "INSERT INTO purchase_history (list_id, product_name, category, bought_by, bought_date) VALUES (?, ?, ?, ?, ?)",
-                    (list_id, product_name, category, self.current_user_id, current_time)
+                statements.execute(cursor, "mark_bought", (self.current_user_id, current_time, product_id))
+                learned = self.record_purchase(
+                    cursor, list_id, product_ref, category_ref, self.current_user_id, current_time,
+                    product_name, category
                 )
-                print(f"Товар '{product_name}' отмечен как купленный")
+                logger.info("Товар '%s' отмечен как купленный", product_name)
             else:
                 # Отменяем покупку
-                cursor.execute(
-                    "UPDATE shopping_items SET bought_by = NULL, bought_date = NULL WHERE id = ?",
-                    (product_id,)
-                )
-                print(f"Статус покупки товара '{product_name}' отменен")
+                statements.execute(cursor, "unmark_bought", (product_id,))
+                logger.info("Статус покупки товара '%s' отменен", product_name)
 
             conn.commit()
+            # Загруженная модель дополняется только после успешного коммита
+            if learned:
+                self.update_category_predictor([(product_name, category)])
             return True
 
         except Exception as e:
-            print(f"Ошибка переключения статуса покупки: {e}")
+            logger.error("Ошибка переключения статуса покупки: %s", e)
             return False
         finally:
-            conn.close()
+            self.release_connection(conn)
+
+    def record_purchase(self, cursor, list_id, product_ref, category_ref, bought_by, bought_date,
+                        product_name, category):
+        """Записывает покупку в историю, статистику и модель категорий.
+
+        Выполняется в транзакции вызывающего; возвращает True, если пара
+        (товар, категория) новая для модели (см. update_category_predictor).
+        """
+        statements.execute(cursor, "insert_history", (list_id, product_ref, category_ref, bought_by, bought_date))
+        self.update_product_stats(cursor, list_id, product_ref, bought_date)
+        return self.learn_category(cursor, product_ref, category_ref, product_name, category)
+
+    def update_category_predictor(self, examples):
+        """Дополняет загруженную модель категорий парами (товар, категория) после коммита"""
+        with self.category_lock:
+            if self.category_predictor is not None:
+                for product_name, category in examples:
+                    self.category_predictor.add(product_name, category)
 
     def delete_product(self, product_id):
         if not self.is_logged_in():
@@ -461,15 +1397,15 @@ class Database:
 
         try:
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM shopping_items WHERE id = ?", (product_id,))
+            statements.execute(cursor, "delete_item", (product_id,))
             conn.commit()
-            print(f"Товар {product_id} удален")
+            logger.info("Товар %s удален", product_id)
             return True
         except Exception as e:
-            print(f"Ошибка удаления товара: {e}")
+            logger.error("Ошибка удаления товара: %s", e)
             return False
         finally:
-            conn.close()
+            self.release_connection(conn)
 
     def clear_shopping_list(self, list_id):
         if not self.is_logged_in():
@@ -480,17 +1416,16 @@ class Database:
 
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM shopping_items WHERE list_id = ? AND bought_by IS NULL", (list_id,))
-            count = cursor.fetchone()[0]
-            cursor.execute("DELETE FROM shopping_items WHERE list_id = ? AND bought_by IS NULL", (list_id,))
+            count = statements.fetchone(cursor, "count_active_items", (list_id,))[0]
+            statements.execute(cursor, "delete_active_items", (list_id,))
             conn.commit()
-            print(f"Список {list_id} очищен, удалено {count} товаров")
+            logger.info("Список %s очищен, удалено %s товаров", list_id, count)
             return count
         except Exception as e:
-            print(f"Ошибка очистки списка: {e}")
+            logger.error("Ошибка очистки списка: %s", e)
             return 0
         finally:
-            conn.close()
+            self.release_connection(conn)
 
     def get_purchase_history(self, list_id):
         if not self.is_logged_in():
@@ -501,23 +1436,291 @@ class Database:
 
         try:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT ph.product_name, ph.category, u.username, ph.bought_date
-                FROM purchase_history ph
-                LEFT JOIN users u ON ph.bought_by = u.id
-                WHERE ph.list_id = ?
-                ORDER BY ph.bought_date DESC
-            ''', (list_id,))
-            history = cursor.fetchall()
-            print(f"Найдено {len(history)} записей в истории покупок")
+            history = statements.fetchall(cursor, "get_purchase_history", (list_id,))
+            logger.debug("Найдено %s записей в истории покупок", len(history))
             return history
         except Exception as e:
-            print(f"Ошибка получения истории: {e}")
+            logger.error("Ошибка получения истории: %s", e)
             return []
         finally:
-            conn.close()
+            self.release_connection(conn)
+
+    def iter_purchase_history(self, list_id, date_from=None, date_to=None, batch_size=EXPORT_BATCH_SIZE):
+        """Построчно отдает историю покупок списка от старых записей к новым.
+
+        Строки читаются пачками по batch_size через fetchmany, поэтому память
+        не зависит от размера истории. date_from и date_to - границы
+        bought_date включительно в формате 'ГГГГ-ММ-ДД ЧЧ:ММ:СС'.
+        Соединение удерживается, пока генератор не исчерпан или не закрыт.
+        Ошибка чтения пробрасывается вызывающему, чтобы прерванный экспорт
+        не выглядел завершенным.
+        """
+        if not self.is_logged_in():
+            return
+
+        conn = self.get_connection()
+        if not conn:
+            raise sqlite3.OperationalError("Нет соединения с базой данных")
 
-    def get_smart_suggestions(self, list_id):
+        try:
+            filters = ""
+            params = [list_id]
+            if date_from:
+                filters += " AND ph.bought_date >= ?"
+                params.append(date_from)
+            if date_to:
+                filters += " AND ph.bought_date <= ?"
+                params.append(date_to)
+
+            cursor = conn.cursor()
+            statements.execute(cursor, "iter_purchase_history", params, filters)
+
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        except Exception as e:
+            logger.error("Ошибка чтения истории для экспорта: %s", e)
+            raise
+        finally:
+            self.release_connection(conn)
+
+    def import_records(self, records, list_id, batch_size=IMPORT_BATCH_SIZE):
+        """Массово загружает товары и историю покупок одной транзакцией.
+
+        records - итерируемое словарей с ключами product_name, category,
+        bought_by (имя пользователя), bought_date и необязательным share_code.
+        Записи с bought_date попадают в purchase_history, без нее - в
+        shopping_items некупленными товарами. Список берется по share_code,
+        а если его нет - list_id; допускаются только списки текущего
+        пользователя, записи для чужих списков считаются пропущенными. Записи вставляются пачками по batch_size через
+        executemany, id пользователей, списков, товаров и категорий
+        запоминаются после первого поиска. Возвращает словарь счетчиков items/history/skipped или None
+        при ошибке (тогда ничего не сохраняется).
+        """
+        if not self.is_logged_in():
+            logger.warning("Пользователь не авторизован")
+            return None
+
+        conn = self.get_connection()
+        if not conn: return None
+
+        counts = {"items": 0, "history": 0, "skipped": 0}
+        user_ids = {}
+        list_ids = {}
+        catalog_ids = {"product": {}, "category": {}}
+        history_lists = set()
+        history_batch = []
+        items_batch = {}
+
+        def find_user(cursor, username):
+            if username not in user_ids:
+                row = statements.fetchone(cursor, "find_user_id", (username,))
+                user_ids[username] = row[0] if row else None
+            return user_ids[username]
+
+        def find_catalog_id(cursor, kind, name):
+            known = catalog_ids[kind]
+            if name not in known:
+                known[name] = self.catalog_id(cursor, kind, name)
+            return known[name]
+
+        def find_list(cursor, share_code):
+            if share_code not in list_ids:
+                row = statements.fetchone(
+                    cursor, "find_member_list_by_code", (self.normalize_share_code(share_code), self.current_user_id)
+                )
+                list_ids[share_code] = row[0] if row else None
+            return list_ids[share_code]
+
+        def flush(cursor):
+            statements.executemany(cursor, "insert_history", history_batch)
+            counts["history"] += len(history_batch)
+            history_batch.clear()
+
+            for target_list, items in items_batch.items():
+                first_order = self.allocate_sort_orders(cursor, target_list, len(items))
+                statements.executemany(
+                    cursor, "insert_item",
+                    [
+                        (target_list, product_ref, category_ref, first_order + offset * SORT_ORDER_GAP, created_by,
+                         uuid.uuid4().hex)
+                        for offset, (product_ref, category_ref, created_by) in enumerate(items)
+                    ]
+                )
+                counts["items"] += len(items)
+            items_batch.clear()
+
+        try:
+            cursor = conn.cursor()
+            # DDL ниже должен попасть в ту же транзакцию, что и вставки
+            if not conn.in_transaction:
+                cursor.execute("BEGIN")
+            if list_id is not None and not statements.fetchone(cursor, "is_member", (list_id, self.current_user_id)):
+                # Записи без share_code не попадают в чужой список
+                logger.warning("Список %s не найден среди списков пользователя", list_id)
+                list_id = None
+            if self.has_search_index:
+                # Построчный триггер FTS втрое замедляет импорт истории
+                last_history_id = statements.fetchone(cursor, "get_max_history_id")[0] or 0
+                cursor.execute("DROP TRIGGER IF EXISTS search_history_insert")
+
+            pending = 0
+            for record in records:
+                product_name = (record.get("product_name") or "").strip()
+                share_code = record.get("share_code")
+                target_list = find_list(cursor, share_code) if share_code else list_id
+                if not product_name or target_list is None:
+                    counts["skipped"] += 1
+                    continue
+
+                product_ref = find_catalog_id(cursor, "product", product_name)
+                category_ref = find_catalog_id(cursor, "category", record.get("category") or 'Другое')
+                username = record.get("bought_by")
+                user_id = find_user(cursor, username) if username else None
+                bought_date = record.get("bought_date")
+
+                if bought_date:
+                    history_batch.append((target_list, product_ref, category_ref, user_id, bought_date))
+                    history_lists.add(target_list)
+                else:
+                    items_batch.setdefault(target_list, []).append(
+                        (product_ref, category_ref, user_id or self.current_user_id)
+                    )
+
+                pending += 1
+                if pending >= batch_size:
+                    flush(cursor)
+                    pending = 0
+            flush(cursor)
+
+            if self.has_search_index:
+                statements.execute(cursor, "index_history_since", (last_history_id,))
+                cursor.execute(SEARCH_HISTORY_TRIGGER)
+
+            for target_list in history_lists:
+                self.fill_product_stats(cursor, target_list)
+            if history_lists:
+                self.fill_category_model(cursor)
+
+            conn.commit()
+            if history_lists:
+                # Модель перечитается из базы при следующем предсказании
+                with self.category_lock:
+                    self.category_predictor = None
+            logger.info("Импортировано товаров: %s, записей истории: %s, пропущено: %s",
+                        counts["items"], counts["history"], counts["skipped"])
+            return counts
+        except Exception as e:
+            logger.error("Ошибка импорта: %s", e)
+            return None
+        finally:
+            self.release_connection(conn)
+
+    def get_purchase_history_page(self, list_id, cursor=None, limit=HISTORY_PAGE_SIZE):
+        """Возвращает страницу истории покупок, начиная с самых новых.
+
+        cursor - значение next_cursor предыдущей страницы (None для первой).
+        Поиск идет по ключу (bought_date, id), поэтому стоимость страницы
+        не зависит от ее номера. Возвращает (строки, next_cursor); строки
+        имеют тот же формат, что и в get_purchase_history, а next_cursor
+        равен None на последней странице.
+        """
+        if not self.is_logged_in():
+            return [], None
+
+        conn = self.get_connection()
+        if not conn: return [], None
+
+        try:
+            # Запрашиваем на одну строку больше, чтобы узнать о следующей странице
+            if cursor is None:
+                rows = statements.fetchall(conn, "purchase_history_first_page", (list_id, limit + 1))
+            else:
+                rows = statements.fetchall(conn, "purchase_history_page", (list_id, cursor[0], cursor[1], limit + 1))
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last_id, *_, last_date = rows[-1]
+                next_cursor = (last_date, last_id)
+
+            logger.debug("Загружена страница истории: %s записей", len(rows))
+            return [row[1:] for row in rows], next_cursor
+        except Exception as e:
+            logger.error("Ошибка получения истории: %s", e)
+            return [], None
+        finally:
+            self.release_connection(conn)
+
+    @staticmethod
+    def write_product_stats(cursor, rows):
+        """Сохраняет статистику: rows - пары ((list_id, product_id), stats)"""
+        statements.executemany(cursor, "write_product_stats", [
+            (list_id, product_id, stats["count"], stats["first_bought"], stats["last_bought"],
+             stats["decay_score"])
+            for (list_id, product_id), stats in rows
+        ])
+
+    def update_product_stats(self, cursor, list_id, product_id, bought_date):
+        """Учитывает покупку в агрегате product_stats (в транзакции вызывающего)"""
+        row = statements.fetchone(cursor, "get_product_stats_row", (list_id, product_id))
+
+        stats = None
+        if row and row[2]:
+            stats = {"count": row[0], "first_bought": row[1] or row[2], "last_bought": row[2],
+                     "decay_score": row[3]}
+        stats = suggestions.add_purchase(stats, bought_date)
+        self.write_product_stats(cursor, [((list_id, product_id), stats)])
+
+    @staticmethod
+    def fill_product_stats(cursor, list_id=None, batch_size=1000):
+        """Пересчитывает product_stats из purchase_history.
+
+        История читается порциями, в памяти держится только статистика
+        по различным товарам.
+        """
+        if list_id is None:
+            statements.execute(cursor, "delete_all_stats")
+            filters, params = "", ()
+        else:
+            statements.execute(cursor, "delete_list_stats", (list_id,))
+            filters, params = "AND list_id = ?", (list_id,)
+
+        statements.execute(cursor, "get_history_dates", params, filters)
+
+        stats_by_product = {}
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row_list_id, product_id, bought_date in rows:
+                key = (row_list_id, product_id)
+                stats_by_product[key] = suggestions.add_purchase(stats_by_product.get(key), bought_date)
+
+        Database.write_product_stats(cursor, stats_by_product.items())
+        return len(stats_by_product)
+
+    def rebuild_product_stats(self, list_id=None):
+        """Пересчитывает product_stats из purchase_history для списка или для всех списков"""
+        conn = self.get_connection()
+        if not conn: return False
+
+        try:
+            cursor = conn.cursor()
+            count = self.fill_product_stats(cursor, list_id)
+            conn.commit()
+            logger.info("Статистика покупок пересчитана (%s товаров)", count)
+            return True
+        except Exception as e:
+            logger.error("Ошибка пересчета статистики покупок: %s", e)
+            return False
+        finally:
+            self.release_connection(conn)
+
+    def get_product_stats(self, list_id):
+        """Возвращает статистику товаров списка для ранжирования предложений"""
         if not self.is_logged_in():
             return []
 
@@ -526,25 +1729,100 @@ class Database:
 
         try:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT product_name, COUNT(*) as count 
-                FROM purchase_history 
-                WHERE list_id = ?
-                GROUP BY product_name 
-                ORDER BY count DESC 
-                LIMIT 5
-            ''', (list_id,))
-            suggestions = cursor.fetchall()
-            print(f"Найдено {len(suggestions)} предложений")
-            return suggestions
-        except Exception as e:
-            print(f"Ошибка получения предложений: {e}")
+            return statements.fetchall(cursor, "get_product_stats", (list_id,))
+        except Exception as e:
+            logger.error("Ошибка получения статистики покупок: %s", e)
             return []
         finally:
-            conn.close()
+            self.release_connection(conn)
+
+    def get_product_names(self, list_id):
+        """Возвращает различные названия товаров списка: из истории и из текущих товаров"""
+        if not self.is_logged_in():
+            return []
+
+        conn = self.get_connection()
+        if not conn: return []
+
+        try:
+            rows = statements.fetchall(conn, "get_product_names", (list_id, list_id))
+            return [row[0] for row in rows]
+        except Exception as e:
+            logger.error("Ошибка получения названий товаров: %s", e)
+            return []
+        finally:
+            self.release_connection(conn)
+
+    @staticmethod
+    def learn_category(cursor, product_id, category_id, product_name, category):
+        """Учитывает пару (товар, категория) в модели категорий, если ее там еще нет.
+
+        Выполняется в транзакции вызывающего; возвращает True, если пара новая.
+        """
+        if category == category_predictor.DEFAULT_CATEGORY:
+            return False
+        statements.execute(cursor, "insert_category_example", (product_id, category_id))
+        if cursor.rowcount != 1:
+            return False
+        statements.executemany(cursor, "add_category_feature", [
+            (feature, category_id, 1) for feature in category_predictor.features(product_name)
+        ])
+        return True
+
+    @staticmethod
+    def fill_category_model(cursor):
+        """Пересчитывает частоты признаков категорий по всей истории покупок"""
+        statements.execute(cursor, "delete_category_examples")
+        statements.execute(cursor, "delete_category_features")
+
+        examples = []
+        feature_counts = {}
+        for product_id, category_id, product_name, category in statements.fetchall(cursor, "get_category_pairs"):
+            if category == category_predictor.DEFAULT_CATEGORY:
+                continue
+            examples.append((product_id, category_id))
+            for feature in category_predictor.features(product_name):
+                key = (feature, category_id)
+                feature_counts[key] = feature_counts.get(key, 0) + 1
+
+        statements.executemany(cursor, "insert_category_example", examples)
+        statements.executemany(cursor, "add_category_feature", [
+            (feature, category_id, count) for (feature, category_id), count in feature_counts.items()
+        ])
+        return len(examples)
+
+    def get_category_predictor(self):
+        """Возвращает модель категорий, при первом вызове загружая ее из базы"""
+        with self.category_lock:
+            if self.category_predictor is not None:
+                return self.category_predictor
+
+            conn = self.get_connection()
+            if not conn: return category_predictor.CategoryPredictor()
+
+            try:
+                self.category_predictor = category_predictor.CategoryPredictor(
+                    statements.fetchall(conn, "get_category_features"),
+                    statements.fetchall(conn, "get_category_example_counts")
+                )
+                logger.debug("Модель категорий загружена: %s примеров", len(self.category_predictor))
+                return self.category_predictor
+            except Exception as e:
+                logger.error("Ошибка загрузки модели категорий: %s", e)
+                return category_predictor.CategoryPredictor()
+            finally:
+                self.release_connection(conn)
+
+    def predict_category(self, product_name):
+        """Возвращает вероятную категорию товара или None"""
+        predictor = self.get_category_predictor()
+        with self.category_lock:
+            prediction = predictor.predict(product_name)
+        return prediction[0] if prediction else None
 
     def add_suggestion_to_list(self, list_id, product_name):
-        return self.add_product(list_id, product_name)
+        category = self.predict_category(product_name) or category_predictor.DEFAULT_CATEGORY
+        return self.add_product(list_id, product_name, category)
 
     def get_last_purchased_product(self, list_id):
         if not self.is_logged_in():
@@ -555,22 +1833,15 @@ class Database:
 
         try:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT product_name 
-                FROM purchase_history 
-                WHERE list_id = ? 
-                ORDER BY bought_date DESC 
-                LIMIT 1
-            ''', (list_id,))
-            result = cursor.fetchone()
+            result = statements.fetchone(cursor, "get_last_purchased_product", (list_id,))
             if result:
                 return result[0]
             return None
         except Exception as e:
-            print(f"Ошибка получения последнего товара: {e}")
+            logger.error("Ошибка получения последнего товара: %s", e)
             return None
         finally:
-            conn.close()
+            self.release_connection(conn)
 
     def leave_shopping_list(self, list_id):
         if not self.is_logged_in():
@@ -583,39 +1854,231 @@ class Database:
             cursor = conn.cursor()
 
             # Удаляем пользователя из участников
-            cursor.execute(
-                "DELETE FROM list_members WHERE list_id = ? AND user_id = ?",
-                (list_id, self.current_user_id)
-            )
+            statements.execute(cursor, "remove_member", (list_id, self.current_user_id))
 
             # Если пользователь был владельцем, передаем владение другому участнику
-            cursor.execute("SELECT owner_id FROM shopping_lists WHERE id = ?", (list_id,))
-            owner_id = cursor.fetchone()[0]
+            owner_id = statements.fetchone(cursor, "get_list_owner", (list_id,))[0]
 
             if owner_id == self.current_user_id:
                 # Находим другого участника
-                cursor.execute(
-                    "SELECT user_id FROM list_members WHERE list_id = ? AND user_id != ? LIMIT 1",
-                    (list_id, self.current_user_id)
-                )
-                new_owner = cursor.fetchone()
+                new_owner = statements.fetchone(cursor, "find_other_member", (list_id, self.current_user_id))
 
                 if new_owner:
-                    cursor.execute(
-                        "UPDATE shopping_lists SET owner_id = ? WHERE id = ?",
-                        (new_owner[0], list_id)
-                    )
-                    print(f"Владелец списка {list_id} изменен на {new_owner[0]}")
+                    statements.execute(cursor, "set_list_owner", (new_owner[0], list_id))
+                    logger.info("Владелец списка %s изменен на %s", list_id, new_owner[0])
                 else:
                     # Если участников больше нет, удаляем список
-                    cursor.execute("DELETE FROM shopping_lists WHERE id = ?", (list_id,))
-                    print(f"Список {list_id} удален (нет участников)")
+                    statements.execute(cursor, "delete_list", (list_id,))
+                    logger.info("Список %s удален (нет участников)", list_id)
 
             conn.commit()
-            print(f"Пользователь покинул список {list_id}")
+            logger.info("Пользователь покинул список %s", list_id)
             return True
         except Exception as e:
-            print(f"Ошибка выхода из списка: {e}")
+            logger.error("Ошибка выхода из списка: %s", e)
             return False
         finally:
-            conn.close()
+            self.release_connection(conn)
+
+    @staticmethod
+    def sync_change(cursor, uid):
+        """Текущее состояние товара в формате протокола синхронизации (см. sync_server)"""
+        row = statements.fetchone(cursor, "get_sync_item", (uid,))
+        if not row:
+            return {"u": uid, "x": 1}
+
+        product_name, category, sort_order, bought_by, bought_date = row
+        change = {"u": uid, "n": product_name, "c": category, "o": sort_order}
+        if bought_date:
+            change["d"] = bought_date
+            if bought_by:
+                change["b"] = bought_by
+        return change
+
+    def start_sync(self, list_id):
+        """Первый шаг синхронизации: собирает изменения для отправки.
+
+        Возвращает SyncRequest или None, если синхронизация выключена или
+        список не найден. Запрос к серверу (exchange_sync) не обращается к
+        базе и может выполняться в другом потоке.
+        """
+        if not self.sync_client or not self.is_logged_in():
+            return None
+
+        conn = self.get_connection()
+        if not conn: return None
+
+        try:
+            cursor = conn.cursor()
+            state = statements.fetchone(cursor, "get_sync_state", (list_id,))
+            if not state:
+                logger.warning("Список %s не найден", list_id)
+                return None
+
+            share_code, list_name, since = state
+            if since is None:
+                # С этого момента изменения товаров списка попадают в очередь
+                statements.execute(cursor, "set_sync_seq", (0, list_id))
+                statements.execute(cursor, "enqueue_list_items", (list_id,))
+                since = 0
+
+            pushed_max = statements.fetchone(cursor, "get_outbox_max_id", (list_id,))[0] or 0
+            changes = [
+                self.sync_change(cursor, uid)
+                for (uid,) in statements.fetchall(cursor, "get_outbox_uids", (list_id, pushed_max))
+            ]
+            # Пока идет запрос к серверу, база не заблокирована
+            conn.commit()
+            return SyncRequest(list_id, share_code, list_name, since, pushed_max, changes)
+        except Exception as e:
+            logger.error("Ошибка синхронизации списка: %s", e)
+            return None
+        finally:
+            self.release_connection(conn)
+
+    def exchange_sync(self, request, wait=0):
+        """Второй шаг: запрос к серверу; возвращает (seq, изменения) или None"""
+        try:
+            return self.sync_client.sync(request.share_code, request.since, request.changes,
+                                         request.list_name, wait)
+        except SyncError:
+            return None
+
+    def finish_sync(self, request, response):
+        """Последний шаг: применяет ответ сервера.
+
+        Возвращает число примененных изменений или None, если запрос не
+        удался или список за это время удален либо пользователь из него вышел.
+        """
+        if response is None or not self.is_logged_in():
+            return None
+        seq, remote_changes = response
+        list_id = request.list_id
+        if not remote_changes and not request.changes and seq == request.since:
+            # Ни отправленных, ни полученных изменений: база не меняется
+            return 0
+
+        conn = self.get_connection()
+        if not conn: return None
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            state = statements.fetchone(cursor, "get_sync_state", (list_id,))
+            if (not state or state[0] != request.share_code
+                    or not statements.fetchone(cursor, "is_member", (list_id, self.current_user_id))):
+                conn.rollback()
+                logger.info("Список %s удален или покинут во время синхронизации", list_id)
+                return None
+
+            statements.execute(cursor, "delete_outbox_upto", (list_id, request.pushed_max))
+            # Товары, измененные здесь во время запроса: их состояние новее
+            # полученного и уйдет на сервер при следующей синхронизации
+            local_max = statements.fetchone(cursor, "get_outbox_max_id", (list_id,))[0] or 0
+            pending = {uid for (uid,) in statements.fetchall(cursor, "get_outbox_uids", (list_id, local_max))}
+
+            applied, examples = self.apply_remote_changes(cursor, list_id, remote_changes, pending)
+            # Примененные чужие изменения обратно не отправляются
+            statements.execute(cursor, "delete_outbox_after", (list_id, local_max))
+            statements.execute(cursor, "set_sync_seq", (seq, list_id))
+
+            conn.commit()
+            if examples:
+                self.update_category_predictor(examples)
+            logger.debug("Список %s синхронизирован: отправлено %s, получено %s",
+                         list_id, len(request.changes), applied)
+            return applied
+        except Exception as e:
+            conn.rollback()
+            logger.error("Ошибка синхронизации списка: %s", e)
+            return None
+        finally:
+            self.release_connection(conn)
+
+    def sync_list(self, list_id, wait=0):
+        """Обменивается изменениями списка с сервером синхронизации.
+
+        Отправляет товары, измененные на этом устройстве после прошлой
+        синхронизации (при первой - весь список), и применяет изменения
+        других участников. wait - сколько секунд сервер может ждать чужих
+        изменений, если их нет. Возвращает число примененных изменений или
+        None, если синхронизация выключена или не удалась.
+        """
+        request = self.start_sync(list_id)
+        if request is None:
+            return None
+        return self.finish_sync(request, self.exchange_sync(request, wait))
+
+    def apply_remote_changes(self, cursor, list_id, changes, pending=()):
+        """Применяет к списку изменения других участников.
+
+        Выполняется в транзакции вызывающего. Товары из pending изменены
+        локально и не перезаписываются, но чужая покупка применяется и к
+        ним: правка или удаление без нее покупку не отменяют (так же
+        сливает изменения сервер). Покупка, сделанная на другом
+        устройстве, записывается в историю и статистику этого устройства;
+        покупатель, которого здесь нет среди пользователей, остается в
+        истории пустым. Возвращает (число примененных изменений, новые пары
+        (товар, категория) для модели категорий).
+        """
+        applied = 0
+        examples = []
+        user_ids = {}
+        max_order = 0
+
+        for change in changes:
+            uid = change["u"]
+            item = statements.fetchone(cursor, "find_item_by_uid", (uid,))
+            if item and item[1] != list_id:
+                continue
+            local_newer = uid in pending
+            if local_newer and (not change.get("d") or (item and item[5] is not None)):
+                continue
+
+            if change.get("x"):
+                if item:
+                    statements.execute(cursor, "delete_item", (item[0],))
+                    applied += 1
+                continue
+
+            product_name = change["n"]
+            category = change.get("c") or category_predictor.DEFAULT_CATEGORY
+            product_ref = self.catalog_id(cursor, "product", product_name)
+            category_ref = self.catalog_id(cursor, "category", category)
+            sort_order = change.get("o", 0)
+            bought_date = change.get("d")
+
+            if item is None:
+                statements.execute(
+                    cursor, "insert_item",
+                    (list_id, product_ref, category_ref, sort_order, self.current_user_id, uid)
+                )
+                item_id = cursor.lastrowid
+                was_bought = False
+            else:
+                item_id, _, old_product, old_category, old_order, old_bought_by = item
+                if not local_newer and (old_product, old_category, old_order) != (product_ref, category_ref, sort_order):
+                    statements.execute(cursor, "update_synced_item", (product_ref, category_ref, sort_order, item_id))
+                was_bought = old_bought_by is not None
+
+            if bought_date and not was_bought:
+                username = change.get("b")
+                if username not in user_ids:
+                    row = statements.fetchone(cursor, "find_user_id", (username,)) if username else None
+                    user_ids[username] = row[0] if row else None
+                buyer_id = user_ids[username]
+
+                statements.execute(cursor, "mark_bought", (buyer_id or self.current_user_id, bought_date, item_id))
+                if self.record_purchase(cursor, list_id, product_ref, category_ref, buyer_id, bought_date,
+                                        product_name, category):
+                    examples.append((product_name, category))
+            elif not bought_date and was_bought:
+                statements.execute(cursor, "unmark_bought", (item_id,))
+
+            max_order = max(max_order, sort_order)
+            applied += 1
+
+        if max_order:
+            # Новые локальные товары встают после полученных
+            statements.execute(cursor, "raise_sort_counter", (max_order + SORT_ORDER_GAP, list_id))
+        return applied, examples
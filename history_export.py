@@ -0,0 +1,178 @@
+"""Потоковый экспорт истории покупок в CSV или JSON Lines.
+
+Строки истории проходят цепочку генераторов (БД -> форматирование -> файл)
+по одной, поэтому память не растет с размером истории.
+
+Запуск из командной строки:
+    python history_export.py -u USER -l LIST_ID history.csv
+    python history_export.py -u USER -c SHARECODE --format jsonl --gzip \
+        --from 2024-01-01 --to 2024-12-31 history.jsonl.gz
+"""
+import argparse
+import csv
+import getpass
+import gzip
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+from database import Database
+from log_config import configure_logging, get_logger
+
+logger = get_logger(__name__)
+
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_FIELDS = ("product_name", "category", "bought_by", "bought_date")
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def date_bound(value, end_of_day=False):
+    """Переводит 'ГГГГ-ММ-ДД' или 'ГГГГ-ММ-ДД ЧЧ:ММ:СС' в границу для bought_date.
+
+    Дата без времени означает начало дня, а для правой границы (end_of_day) -
+    его конец, чтобы диапазон включал весь последний день.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.strptime(value, DATE_FORMAT)
+    except ValueError:
+        parsed = datetime.strptime(value, '%Y-%m-%d')
+        if end_of_day:
+            parsed = parsed.replace(hour=23, minute=59, second=59)
+    return parsed.strftime(DATE_FORMAT)
+
+
+class _LineBuffer:
+    """Минимальный файловый объект для csv.writer: хранит последнюю строку"""
+
+    def __init__(self):
+        self.value = ""
+
+    def write(self, text):
+        self.value += text
+
+    def pop(self):
+        value, self.value = self.value, ""
+        return value
+
+
+def csv_lines(rows):
+    """Отдает строки CSV с заголовком"""
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.pop()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.pop()
+
+
+def jsonl_lines(rows):
+    """Отдает по одному JSON-объекту на строку"""
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + "\n"
+
+
+FORMATTERS = {
+    "csv": csv_lines,
+    "jsonl": jsonl_lines,
+}
+
+
+def open_output(path, compress=False):
+    """Открывает файл для записи текста; compress или суффикс .gz включают gzip"""
+    if compress or path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def export_rows(rows, path, fmt="csv", compress=False):
+    """Записывает строки истории в файл, возвращает число записей.
+
+    Если чтение или запись прерваны ошибкой, недописанный файл удаляется,
+    а ошибка пробрасывается дальше.
+    """
+    if fmt not in FORMATTERS:
+        raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    try:
+        with open_output(path, compress) as output:
+            output.writelines(FORMATTERS[fmt](counted(rows)))
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    logger.info("Экспортировано %s записей истории в %s", count, path)
+    return count
+
+
+def find_user_list(db, list_id=None, share_code=None):
+    """Возвращает id списка пользователя по id или коду доступа, иначе None"""
+    user_lists = db.get_user_shopping_lists()
+    if share_code:
+        share_code = db.normalize_share_code(share_code)
+        return next((row[0] for row in user_lists if row[4] == share_code), None)
+    return next((row[0] for row in user_lists if row[0] == list_id), None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Экспорт истории покупок в CSV или JSON Lines")
+    parser.add_argument("output", help="Файл для записи (суффикс .gz включает сжатие)")
+    parser.add_argument("-u", "--user", required=True, help="Имя пользователя")
+    parser.add_argument("-p", "--password", help="Пароль (если не указан, будет запрошен)")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("-l", "--list-id", type=int, help="ID списка покупок")
+    target.add_argument("-c", "--code", help="Код доступа к списку")
+    parser.add_argument("-f", "--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--from", dest="date_from", help="Начало периода (ГГГГ-ММ-ДД)")
+    parser.add_argument("--to", dest="date_to", help="Конец периода включительно (ГГГГ-ММ-ДД)")
+    parser.add_argument("--gzip", action="store_true", help="Сжать файл gzip")
+    parser.add_argument("--db", default="shopping_list.db", help="Файл базы данных")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+
+    try:
+        date_from = date_bound(args.date_from)
+        date_to = date_bound(args.date_to, end_of_day=True)
+    except ValueError:
+        print("Дата должна быть в формате ГГГГ-ММ-ДД", file=sys.stderr)
+        return 2
+
+    db = Database(args.db)
+    try:
+        password = args.password if args.password is not None else getpass.getpass("Пароль: ")
+        if not db.login_user(args.user, password):
+            print("Неверное имя пользователя или пароль", file=sys.stderr)
+            return 1
+
+        list_id = find_user_list(db, args.list_id, args.code)
+        if list_id is None:
+            print("Список не найден среди списков пользователя", file=sys.stderr)
+            return 1
+
+        rows = db.iter_purchase_history(list_id, date_from, date_to)
+        try:
+            count = export_rows(rows, args.output, args.format, args.gzip)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Ошибка экспорта: {e}", file=sys.stderr)
+            return 1
+        print(f"Экспортировано записей: {count}")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Массовый импорт товаров и истории покупок из CSV или JSON Lines.
+
+Формат совпадает с history_export: поля product_name, category, bought_by,
+bought_date и необязательное share_code. Записи с датой покупки попадают
+в историю, без даты - в список некупленными товарами.
+
+Запуск из командной строки:
+    python history_import.py -u USER -l LIST_ID history.csv
+    python history_import.py -u USER -c SHARECODE --fast history.jsonl.gz
+"""
+import argparse
+import csv
+import getpass
+import gzip
+import json
+import sys
+import time
+
+from database import Database, IMPORT_BATCH_SIZE
+from history_export import EXPORT_FORMATS, find_user_list
+from log_config import configure_logging
+
+
+def open_input(path):
+    """Открывает файл для чтения текста; суффикс .gz включает распаковку"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    return "jsonl" if name.endswith((".jsonl", ".json")) else "csv"
+
+
+def read_records(path, fmt=None):
+    """Построчно отдает записи файла в виде словарей"""
+    fmt = fmt or detect_format(path)
+    with open_input(path) as source:
+        if fmt == "csv":
+            for record in csv.DictReader(source):
+                yield normalize_record(record)
+        else:
+            for line in source:
+                if line.strip():
+                    yield normalize_record(json.loads(line))
+
+
+def normalize_record(record):
+    # Дата без времени считается началом дня
+    bought_date = record.get("bought_date")
+    if bought_date and len(bought_date) == 10:
+        record["bought_date"] = bought_date + " 00:00:00"
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Импорт товаров и истории покупок из CSV или JSON Lines")
+    parser.add_argument("input", help="Файл для загрузки (суффикс .gz - сжатый файл)")
+    parser.add_argument("-u", "--user", required=True, help="Имя пользователя")
+    parser.add_argument("-p", "--password", help="Пароль (если не указан, будет запрошен)")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("-l", "--list-id", type=int, help="ID списка для записей без share_code")
+    target.add_argument("-c", "--code", help="Код списка для записей без share_code")
+    parser.add_argument("-f", "--format", choices=EXPORT_FORMATS, help="Формат (по умолчанию по расширению)")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="Записей в одном executemany")
+    parser.add_argument("--fast", action="store_true", help="Профиль PRAGMA fast на время импорта")
+    parser.add_argument("--db", default="shopping_list.db", help="Файл базы данных")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+
+    db = Database(args.db, pragma_profile="fast" if args.fast else "balanced")
+    try:
+        password = args.password if args.password is not None else getpass.getpass("Пароль: ")
+        if not db.login_user(args.user, password):
+            print("Неверное имя пользователя или пароль", file=sys.stderr)
+            return 1
+
+        list_id = find_user_list(db, args.list_id, args.code)
+        if list_id is None:
+            print("Список не найден среди списков пользователя", file=sys.stderr)
+            return 1
+
+        started = time.perf_counter()
+        counts = db.import_records(read_records(args.input, args.format), list_id, args.batch_size)
+        elapsed = time.perf_counter() - started
+
+        if counts is None:
+            print("Ошибка импорта, данные не сохранены", file=sys.stderr)
+            return 1
+
+        total = counts["items"] + counts["history"]
+        print(f"Товаров: {counts['items']}, записей истории: {counts['history']}, пропущено: {counts['skipped']}")
+        print(f"Время: {elapsed:.2f} с, {total / elapsed if elapsed else total:.0f} строк/с")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+import logging
+import os
+from logging.handlers import RotatingFileHandler
+
+# Все модули приложения пишут в дочерние логгеры "shopping.<модуль>"
+APP_LOGGER = "shopping"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+DEFAULT_LEVEL = "WARNING"
+
+
+def get_logger(module_name):
+    return logging.getLogger(f"{APP_LOGGER}.{module_name}")
+
+
+def configure_logging(level=None, log_file=None, max_bytes=1024 * 1024, backup_count=3, console=True):
+    """Настраивает логирование приложения.
+
+    Уровень берется из аргумента или переменной окружения SHOPPING_LOG_LEVEL.
+    Если задан log_file (или SHOPPING_LOG_FILE), записи пишутся в файл
+    с ротацией по размеру max_bytes и backup_count архивными копиями.
+    """
+    level = level or os.environ.get("SHOPPING_LOG_LEVEL", DEFAULT_LEVEL)
+    log_file = log_file or os.environ.get("SHOPPING_LOG_FILE")
+
+    logger = logging.getLogger(APP_LOGGER)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    # Записи не дублируются в корневой логгер (его настраивает Kivy)
+    logger.propagate = False
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+
+    if log_file:
+        file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                           encoding="utf-8")
+        file_handler.setFormatter(formatter)
+        logger.addHandler(file_handler)
+
+    return logger
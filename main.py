@@ -1,11 +1,44 @@
+import logging
+import time
+
+# Отсчет времени запуска начинается до импорта Kivy
+START_TIME = time.perf_counter()
+
 from kivy.app import App
+from kivy.core.window import Window
 from ui_layouts import MainLayout
 from app_logic import AppLogic
+from database import Database
+from log_config import configure_logging, get_logger
+
+# Время запуска выводится и при уровне WARNING по умолчанию:
+# у логгера свой уровень, а обработчики берутся у логгера приложения
+logger = get_logger("startup")
+logger.setLevel(logging.INFO)
+
 
 class ShoppingApp(App):
     def build(self):
-        logic = AppLogic()
-        return MainLayout(logic)
+        build_started = time.perf_counter()
+        # Калибровка хеширования паролей при первом запуске занимает сотни
+        # миллисекунд: она идет в рабочем потоке, а не до первого кадра
+        logic = AppLogic(Database(calibrate_password=False))
+        layout = MainLayout(logic)
+        layout.async_logic.ensure_password_hasher()
+        self.build_time = time.perf_counter() - build_started
+        return layout
+
+    def on_start(self):
+        # on_flip приходит после вывода кадра на экран
+        Window.bind(on_flip=self.report_first_frame)
+
+    def report_first_frame(self, window):
+        Window.unbind(on_flip=self.report_first_frame)
+        logger.info(
+            "Первый кадр через %.0f мс после запуска (build: %.0f мс)",
+            (time.perf_counter() - START_TIME) * 1000, self.build_time * 1000
+        )
 
 if __name__ == '__main__':
+    configure_logging()
     ShoppingApp().run()
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""Хеширование паролей с солью и настраиваемой стоимостью.
+
+Хеш хранится строкой вида "алгоритм$параметры$соль$хеш", поэтому
+алгоритм и стоимость можно менять без миграции: старые хеши продолжают
+проверяться, а при входе пользователя пересчитываются с текущими
+настройками (см. needs_rehash). Хеши первых версий приложения -
+несоленый SHA-256 в hex - распознаются как алгоритм "sha256".
+"""
+import hashlib
+import hmac
+import math
+import os
+import time
+
+SALT_BYTES = 16
+DEFAULT_TARGET_MS = 100
+# Защита от деления на ноль, если таймер не заметил хеширования
+MIN_MEASURED_MS = 1e-3
+
+
+class PBKDF2Hasher:
+    """PBKDF2-HMAC-SHA256, стоимость - число итераций"""
+
+    algorithm = "pbkdf2_sha256"
+    default_iterations = 200000
+    min_iterations = 50000
+    max_iterations = 5000000
+
+    def __init__(self, iterations=None):
+        iterations = iterations or self.default_iterations
+        self.iterations = max(self.min_iterations, min(self.max_iterations, int(iterations)))
+
+    def hash(self, password, salt=None):
+        salt = salt or os.urandom(SALT_BYTES)
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, self.iterations)
+        return f"{self.algorithm}${self.iterations}${salt.hex()}${digest.hex()}"
+
+    @classmethod
+    def verify(cls, password, encoded):
+        _, iterations, salt, digest = encoded.split("$")
+        candidate = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations))
+        return hmac.compare_digest(candidate.hex(), digest)
+
+    def params(self):
+        return str(self.iterations)
+
+    def scaled(self, factor):
+        return type(self)(round(self.iterations * factor))
+
+
+class ScryptHasher:
+    """scrypt, стоимость - параметр n (степень двойки)"""
+
+    algorithm = "scrypt"
+    default_n = 2 ** 14
+    min_n = 2 ** 12
+    max_n = 2 ** 20
+    r = 8
+    p = 1
+
+    def __init__(self, n=None):
+        n = max(self.min_n, min(self.max_n, int(n or self.default_n)))
+        # n должен быть степенью двойки: берем ближайшую не большую
+        self.n = 1 << (n.bit_length() - 1)
+
+    @staticmethod
+    def _derive(password, salt, n, r, p):
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=32)
+
+    def hash(self, password, salt=None):
+        salt = salt or os.urandom(SALT_BYTES)
+        digest = self._derive(password, salt, self.n, self.r, self.p)
+        return f"{self.algorithm}${self.n},{self.r},{self.p}${salt.hex()}${digest.hex()}"
+
+    @classmethod
+    def verify(cls, password, encoded):
+        _, params, salt, digest = encoded.split("$")
+        n, r, p = (int(value) for value in params.split(","))
+        candidate = cls._derive(password, bytes.fromhex(salt), n, r, p)
+        return hmac.compare_digest(candidate.hex(), digest)
+
+    def params(self):
+        return f"{self.n},{self.r},{self.p}"
+
+    def scaled(self, factor):
+        # Ближайшая степень двойки в логарифмической шкале
+        return type(self)(1 << max(0, round(math.log2(self.n * factor))))
+
+
+class LegacySHA256Hasher:
+    """Несоленый SHA-256 из первых версий; только для проверки старых хешей"""
+
+    algorithm = "sha256"
+
+    @classmethod
+    def verify(cls, password, encoded):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), encoded)
+
+
+HASHERS = {
+    PBKDF2Hasher.algorithm: PBKDF2Hasher,
+    ScryptHasher.algorithm: ScryptHasher,
+    LegacySHA256Hasher.algorithm: LegacySHA256Hasher,
+}
+
+
+def identify(encoded):
+    """Возвращает название алгоритма, которым получен хеш"""
+    if "$" not in encoded:
+        return LegacySHA256Hasher.algorithm
+    return encoded.split("$", 1)[0]
+
+
+def verify_password(password, encoded):
+    """Проверяет пароль по сохраненному хешу любого известного алгоритма"""
+    hasher = HASHERS.get(identify(encoded))
+    if hasher is None:
+        return False
+    try:
+        return hasher.verify(password, encoded)
+    except ValueError:
+        return False
+
+
+def needs_rehash(encoded, hasher):
+    """True, если хеш получен другим алгоритмом или с другой стоимостью"""
+    parts = encoded.split("$")
+    return len(parts) != 4 or parts[0] != hasher.algorithm or parts[1] != hasher.params()
+
+
+def load_hasher(config):
+    """Создает хешер по строке настроек "алгоритм$параметры" (см. hasher_config)"""
+    algorithm, params = config.split("$", 1)
+    if algorithm not in (PBKDF2Hasher.algorithm, ScryptHasher.algorithm):
+        raise ValueError(f"Неизвестный алгоритм хеширования: {algorithm}")
+    return HASHERS[algorithm](int(params.split(",")[0]))
+
+
+def hasher_config(hasher):
+    return f"{hasher.algorithm}${hasher.params()}"
+
+
+def measure(hasher, password="calibration", rounds=3):
+    """Среднее время одного хеширования в миллисекундах"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        hasher.hash(password)
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+def calibrate(target_ms=DEFAULT_TARGET_MS, hasher_class=PBKDF2Hasher):
+    """Подбирает стоимость, при которой хеширование занимает около target_ms.
+
+    Время растет линейно со стоимостью: минимальная стоимость замеряется
+    и масштабируется до target_ms, затем результат замеряется еще раз и
+    уточняется (замер малой стоимости сильнее искажен шумом таймера).
+    Результат ограничен min/max значениями класса, чтобы медленное
+    устройство не получило слишком слабый хеш, а быстрое - слишком долгий вход.
+    """
+    hasher = hasher_class(1)
+    for _ in range(2):
+        elapsed = measure(hasher)
+        hasher = hasher.scaled(target_ms / max(elapsed, MIN_MEASURED_MS))
+    return hasher
@@ -0,0 +1,155 @@
+"""Консольный интерфейс списка покупок без графической оболочки.
+
+Работает поверх AppLogic и не импортирует Kivy, поэтому запускается
+заметно быстрее main.py и подходит для скриптов.
+
+Примеры:
+    python -m shopping_cli -u USER lists
+    python -m shopping_cli -u USER -l 1 add Молоко Хлеб --category Молочные
+    python -m shopping_cli -u USER -c SHARECODE list
+    python -m shopping_cli -u USER -l 1 toggle 42
+    python -m shopping_cli -u USER -l 1 history --limit 20
+    python -m shopping_cli -u USER -l 1 suggest -k 10
+    python -m shopping_cli -u USER --server HOST:8765 join SHARECODE
+    python -m shopping_cli -u USER --server HOST:8765 -l 1 sync --wait 30
+"""
+import argparse
+import getpass
+import sys
+
+import suggestions
+from app_logic import AppLogic
+from database import Database, HISTORY_PAGE_SIZE
+from history_export import find_user_list
+from log_config import configure_logging
+
+
+def show_lists(logic, args):
+    for list_id, list_name, owner_id, owner_name, share_code in logic.get_user_lists():
+        print(f"{list_id}\t{list_name}\tвладелец: {owner_name}\tкод: {share_code}")
+
+
+def show_items(logic, args):
+    products = logic.get_current_list()
+    if not products:
+        print("Список покупок пустой")
+    for product_id, product_name, category, *_ in products:
+        print(f"{product_id}\t{product_name}\t{category}")
+
+
+def add_items(logic, args):
+    if len(args.names) == 1:
+        message, changes = logic.add_item(args.names[0], args.category)
+    else:
+        message, changes = logic.add_items(args.names, args.category)
+    print(message)
+    return 0 if changes.inserted else 1
+
+
+def toggle_item(logic, args):
+    message, changes = logic.toggle_bought(args.product_id)
+    print(message)
+    return 1 if changes.is_empty() else 0
+
+
+def show_history(logic, args):
+    history, _ = logic.get_purchase_history_page(limit=args.limit)
+    if not history:
+        print("История покупок пуста")
+    for product_name, category, bought_by, bought_date in history:
+        print(f"{bought_date}\t{product_name}\t{category}\t{bought_by or 'Неизвестно'}")
+
+
+def show_suggestions(logic, args):
+    for product_name, count, is_due in logic.get_smart_suggestions(args.k):
+        due_text = "\tпора купить" if is_due else ""
+        print(f"{product_name}\t{count} раз{due_text}")
+
+
+def join_list(logic, args):
+    message = logic.join_shared_list(args.share_code)
+    print(message)
+    return 0 if logic.current_list_id else 1
+
+
+def sync_list(logic, args):
+    if not logic.sync_enabled():
+        print("Не задан сервер синхронизации (--server)", file=sys.stderr)
+        return 1
+    message, _ = logic.sync_current_list(args.wait)
+    print(message)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="shopping_cli", description="Список покупок из командной строки")
+    parser.add_argument("-u", "--user", required=True, help="Имя пользователя")
+    parser.add_argument("-p", "--password", help="Пароль (если не указан, будет запрошен)")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("-l", "--list-id", type=int, help="ID списка покупок")
+    target.add_argument("-c", "--code", help="Код доступа к списку")
+    parser.add_argument("--db", default="shopping_list.db", help="Файл базы данных")
+    parser.add_argument("--server", help="Сервер синхронизации host:port (по умолчанию из SHOPPING_SYNC_SERVER)")
+
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("lists", help="Списки пользователя").set_defaults(handler=show_lists, needs_list=False)
+
+    commands.add_parser("list", help="Некупленные товары списка").set_defaults(handler=show_items, needs_list=True)
+
+    add = commands.add_parser("add", help="Добавить товары")
+    add.add_argument("names", nargs="+", help="Названия товаров")
+    add.add_argument("--category", help="Категория (по умолчанию определяется по названию)")
+    add.set_defaults(handler=add_items, needs_list=True)
+
+    toggle = commands.add_parser("toggle", help="Отметить товар купленным или вернуть в список")
+    toggle.add_argument("product_id", type=int)
+    toggle.set_defaults(handler=toggle_item, needs_list=True)
+
+    history = commands.add_parser("history", help="Последние покупки")
+    history.add_argument("--limit", type=int, default=HISTORY_PAGE_SIZE)
+    history.set_defaults(handler=show_history, needs_list=True)
+
+    suggest = commands.add_parser("suggest", help="Умные предложения")
+    suggest.add_argument("-k", type=int, default=suggestions.DEFAULT_SUGGESTIONS_COUNT)
+    suggest.set_defaults(handler=show_suggestions, needs_list=True)
+
+    join = commands.add_parser("join", help="Присоединиться к списку по коду")
+    join.add_argument("share_code")
+    join.set_defaults(handler=join_list, needs_list=False)
+
+    sync = commands.add_parser("sync", help="Синхронизировать список с сервером")
+    sync.add_argument("--wait", type=float, default=0, help="Сколько секунд ждать изменений других участников")
+    sync.set_defaults(handler=sync_list, needs_list=True)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.needs_list and args.list_id is None and not args.code:
+        parser.error("для этой команды нужен -l/--list-id или -c/--code")
+
+    configure_logging()
+
+    logic = AppLogic(Database(args.db, sync_server=args.server))
+    try:
+        password = args.password if args.password is not None else getpass.getpass("Пароль: ")
+        if not logic.login_user(args.user, password):
+            print("Неверное имя пользователя или пароль", file=sys.stderr)
+            return 1
+
+        if args.needs_list:
+            list_id = find_user_list(logic.db, args.list_id, args.code)
+            if list_id is None:
+                print("Список не найден среди списков пользователя", file=sys.stderr)
+                return 1
+            logic.set_current_list(list_id)
+
+        return args.handler(logic, args) or 0
+    finally:
+        logic.db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,367 @@
+"""Именованные SQL-запросы приложения и статистика их выполнения.
+
+Все запросы Database берутся из STATEMENTS по имени. Тексты запросов
+постоянны, поэтому кэш подготовленных выражений sqlite3 (cached_statements)
+на долгоживущих соединениях пула компилирует каждый запрос один раз.
+Немногие запросы с необязательными условиями содержат подстановку
+{filters}; каждый ее вариант кэшируется как отдельный запрос.
+
+Схема (CREATE TABLE и миграции) сюда не входит: она выполняется
+один раз при запуске.
+"""
+import threading
+import time
+
+STATEMENTS = {
+    # Служебные таблицы
+    "get_schema_version": "SELECT MAX(version) FROM schema_version",
+    "insert_schema_version": "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+    "get_setting": "SELECT value FROM settings WHERE key = ?",
+    "set_setting": "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+
+    # Пользователи
+    "insert_user": "INSERT INTO users (username, password_hash) VALUES (?, ?)",
+    "find_user_credentials": "SELECT id, username, password_hash FROM users WHERE username = ?",
+    "update_password_hash": "UPDATE users SET password_hash = ? WHERE id = ?",
+    "find_user_id": "SELECT id FROM users WHERE username = ?",
+
+    # Списки и участники
+    "share_code_exists": "SELECT 1 FROM shopping_lists WHERE share_code = ?",
+    "insert_list": "INSERT INTO shopping_lists (name, owner_id, share_code) VALUES (?, ?, ?)",
+    "insert_member": "INSERT INTO list_members (list_id, user_id) VALUES (?, ?)",
+    "find_list_by_code": "SELECT id FROM shopping_lists WHERE share_code = ?",
+    "find_member_list_by_code": """
+        SELECT sl.id FROM shopping_lists sl
+        JOIN list_members lm ON sl.id = lm.list_id
+        WHERE sl.share_code = ? AND lm.user_id = ?""",
+    "is_member": "SELECT 1 FROM list_members WHERE list_id = ? AND user_id = ?",
+    "get_user_shopping_lists": """
+        SELECT sl.id, sl.name, sl.owner_id, u.username, sl.share_code
+        FROM shopping_lists sl
+        JOIN list_members lm ON sl.id = lm.list_id
+        JOIN users u ON sl.owner_id = u.id
+        WHERE lm.user_id = ?
+        ORDER BY sl.created_date DESC""",
+    "get_list_info": """
+        SELECT sl.id, sl.name, sl.owner_id, u.username, sl.share_code
+        FROM shopping_lists sl
+        JOIN users u ON sl.owner_id = u.id
+        WHERE sl.id = ?""",
+    "get_list_owner": "SELECT owner_id FROM shopping_lists WHERE id = ?",
+    "set_list_owner": "UPDATE shopping_lists SET owner_id = ? WHERE id = ?",
+    "get_list_members": """
+        SELECT u.username
+        FROM list_members lm
+        JOIN users u ON lm.user_id = u.id
+        WHERE lm.list_id = ?""",
+    "find_other_member": "SELECT user_id FROM list_members WHERE list_id = ? AND user_id != ? LIMIT 1",
+    "remove_member": "DELETE FROM list_members WHERE list_id = ? AND user_id = ?",
+    "delete_list_items": "DELETE FROM shopping_items WHERE list_id = ?",
+    "delete_list_history": "DELETE FROM purchase_history WHERE list_id = ?",
+    "delete_list_stats": "DELETE FROM product_stats WHERE list_id = ?",
+    "delete_list_members": "DELETE FROM list_members WHERE list_id = ?",
+    "delete_list": "DELETE FROM shopping_lists WHERE id = ?",
+    "delete_list_outbox": "DELETE FROM sync_outbox WHERE list_id = ?",
+
+    # Справочник товаров и категорий: строки товаров и истории хранят их id
+    "insert_product": "INSERT OR IGNORE INTO products (name) VALUES (?)",
+    "find_product_id": "SELECT id FROM products WHERE name = ?",
+    "insert_category": "INSERT OR IGNORE INTO categories (name) VALUES (?)",
+    "find_category_id": "SELECT id FROM categories WHERE name = ?",
+
+    # Порядок товаров
+    "bump_sort_counter": "UPDATE shopping_lists SET next_sort_order = next_sort_order + ? WHERE id = ?",
+    "get_sort_counter": "SELECT next_sort_order FROM shopping_lists WHERE id = ?",
+    "raise_sort_counter": "UPDATE shopping_lists SET next_sort_order = MAX(next_sort_order, ?) WHERE id = ?",
+    "get_active_item_ids": "SELECT id FROM shopping_items WHERE list_id = ? AND bought_by IS NULL ORDER BY sort_order",
+    "set_sort_order": "UPDATE shopping_items SET sort_order = ? WHERE id = ?",
+    "find_active_item_list": "SELECT list_id FROM shopping_items WHERE id = ? AND bought_by IS NULL",
+    "get_move_neighbours": """
+        SELECT sort_order FROM shopping_items
+        WHERE list_id = ? AND bought_by IS NULL AND id != ?
+        ORDER BY sort_order
+        LIMIT 2 OFFSET ?""",
+
+    # Товары
+    "insert_item": """
+        INSERT INTO shopping_items (list_id, product_id, category_id, sort_order, created_by, uid)
+        VALUES (?, ?, ?, ?, ?, ?)""",
+    "get_items_from_order": """
+        SELECT si.id, p.name, c.name, si.sort_order, si.created_by, si.bought_by
+        FROM shopping_items si
+        JOIN products p ON p.id = si.product_id
+        JOIN categories c ON c.id = si.category_id
+        WHERE si.list_id = ? AND si.bought_by IS NULL AND si.sort_order >= ?
+        ORDER BY si.sort_order""",
+    "get_shopping_list": """
+        SELECT si.id, p.name, c.name, si.sort_order, si.created_by, si.bought_by
+        FROM shopping_items si
+        JOIN products p ON p.id = si.product_id
+        JOIN categories c ON c.id = si.category_id
+        WHERE si.list_id = ? AND si.bought_by IS NULL
+        ORDER BY si.sort_order""",
+    "get_item": """
+        SELECT si.id, p.name, c.name, si.sort_order, si.created_by, si.bought_by
+        FROM shopping_items si
+        JOIN products p ON p.id = si.product_id
+        JOIN categories c ON c.id = si.category_id
+        WHERE si.id = ?""",
+    "get_item_list": "SELECT list_id FROM shopping_items WHERE id = ?",
+    "get_item_status": """
+        SELECT si.list_id, si.product_id, si.category_id, si.bought_by, p.name, c.name
+        FROM shopping_items si
+        JOIN products p ON p.id = si.product_id
+        JOIN categories c ON c.id = si.category_id
+        WHERE si.id = ?""",
+    "mark_bought": "UPDATE shopping_items SET bought_by = ?, bought_date = ? WHERE id = ?",
+    "unmark_bought": "UPDATE shopping_items SET bought_by = NULL, bought_date = NULL WHERE id = ?",
+    "delete_item": "DELETE FROM shopping_items WHERE id = ?",
+    "count_active_items": "SELECT COUNT(*) FROM shopping_items WHERE list_id = ? AND bought_by IS NULL",
+    "delete_active_items": "DELETE FROM shopping_items WHERE list_id = ? AND bought_by IS NULL",
+
+    # История покупок
+    "insert_history": """
+        INSERT INTO purchase_history (list_id, product_id, category_id, bought_by, bought_date)
+        VALUES (?, ?, ?, ?, ?)""",
+    "get_purchase_history": """
+        SELECT p.name, c.name, u.username, ph.bought_date
+        FROM purchase_history ph
+        JOIN products p ON p.id = ph.product_id
+        JOIN categories c ON c.id = ph.category_id
+        LEFT JOIN users u ON ph.bought_by = u.id
+        WHERE ph.list_id = ?
+        ORDER BY ph.bought_date DESC""",
+    "iter_purchase_history": """
+        SELECT p.name, c.name, u.username, ph.bought_date
+        FROM purchase_history ph
+        JOIN products p ON p.id = ph.product_id
+        JOIN categories c ON c.id = ph.category_id
+        LEFT JOIN users u ON ph.bought_by = u.id
+        WHERE ph.list_id = ? {filters}
+        ORDER BY ph.bought_date, ph.id""",
+    "purchase_history_first_page": """
+        SELECT ph.id, p.name, c.name, u.username, ph.bought_date
+        FROM purchase_history ph
+        JOIN products p ON p.id = ph.product_id
+        JOIN categories c ON c.id = ph.category_id
+        LEFT JOIN users u ON ph.bought_by = u.id
+        WHERE ph.list_id = ?
+        ORDER BY ph.bought_date DESC, ph.id DESC
+        LIMIT ?""",
+    "purchase_history_page": """
+        SELECT ph.id, p.name, c.name, u.username, ph.bought_date
+        FROM purchase_history ph
+        JOIN products p ON p.id = ph.product_id
+        JOIN categories c ON c.id = ph.category_id
+        LEFT JOIN users u ON ph.bought_by = u.id
+        WHERE ph.list_id = ? AND (ph.bought_date, ph.id) < (?, ?)
+        ORDER BY ph.bought_date DESC, ph.id DESC
+        LIMIT ?""",
+    "get_last_purchased_product": """
+        SELECT p.name
+        FROM purchase_history ph
+        JOIN products p ON p.id = ph.product_id
+        WHERE ph.list_id = ?
+        ORDER BY ph.bought_date DESC
+        LIMIT 1""",
+
+    # Поиск по всем спискам пользователя. rowid в search_index: id*2 для
+    # товаров списка и id*2+1 для записей истории
+    "has_search_index": "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'",
+    "get_max_history_id": "SELECT MAX(id) FROM purchase_history",
+    "index_history_since": """
+        INSERT INTO search_index (rowid, product_name, category, list_id, bought_date)
+        SELECT ph.id * 2 + 1, p.name, c.name, ph.list_id, ph.bought_date
+        FROM purchase_history ph
+        JOIN products p ON p.id = ph.product_id
+        JOIN categories c ON c.id = ph.category_id
+        WHERE ph.id > ?""",
+    "search_fts": """
+        SELECT CASE s.rowid % 2 WHEN 0 THEN 'item' ELSE 'history' END,
+               s.list_id, sl.name, s.product_name, s.category, s.bought_date
+        FROM search_index s
+        JOIN list_members lm ON lm.list_id = s.list_id AND lm.user_id = ?
+        JOIN shopping_lists sl ON sl.id = s.list_id
+        WHERE search_index MATCH ?
+        ORDER BY bm25(search_index), s.bought_date IS NOT NULL, s.bought_date DESC
+        LIMIT ? OFFSET ?""",
+    # Для широких запросов: обход индекса по убыванию rowid без сортировки.
+    # rowid товара - id*2, покупки - id*2+1: внутри каждого вида новые идут
+    # раньше старых, но товары и покупки перемешаны по величине id
+    "search_fts_recent": """
+        SELECT CASE s.rowid % 2 WHEN 0 THEN 'item' ELSE 'history' END,
+               s.list_id, sl.name, s.product_name, s.category, s.bought_date
+        FROM search_index s
+        JOIN list_members lm ON lm.list_id = s.list_id AND lm.user_id = ?
+        JOIN shopping_lists sl ON sl.id = s.list_id
+        WHERE search_index MATCH ?
+        ORDER BY s.rowid DESC
+        LIMIT ? OFFSET ?""",
+    "count_search_hits": """
+        SELECT COUNT(*) FROM (
+            SELECT 1 FROM search_index s
+            JOIN list_members lm ON lm.list_id = s.list_id AND lm.user_id = ?
+            WHERE search_index MATCH ?
+            LIMIT ?)""",
+    "search_like": """
+        SELECT source, list_id, list_name, product_name, category, bought_date FROM (
+            SELECT 'item' AS source, si.list_id, sl.name AS list_name, p.name AS product_name,
+                   c.name AS category, NULL AS bought_date
+            FROM shopping_items si
+            JOIN list_members lm ON lm.list_id = si.list_id AND lm.user_id = ?
+            JOIN shopping_lists sl ON sl.id = si.list_id
+            JOIN products p ON p.id = si.product_id
+            JOIN categories c ON c.id = si.category_id
+            WHERE si.bought_by IS NULL AND (p.name LIKE ? OR c.name LIKE ?)
+            UNION ALL
+            SELECT 'history', ph.list_id, sl.name, p.name, c.name, ph.bought_date
+            FROM purchase_history ph
+            JOIN list_members lm ON lm.list_id = ph.list_id AND lm.user_id = ?
+            JOIN shopping_lists sl ON sl.id = ph.list_id
+            JOIN products p ON p.id = ph.product_id
+            JOIN categories c ON c.id = ph.category_id
+            WHERE p.name LIKE ? OR c.name LIKE ?
+        )
+        ORDER BY bought_date IS NOT NULL, bought_date DESC
+        LIMIT ? OFFSET ?""",
+
+    # Статистика покупок
+    "write_product_stats": """
+        INSERT OR REPLACE INTO product_stats
+            (list_id, product_id, purchase_count, first_bought, last_bought, decay_score)
+        VALUES (?, ?, ?, ?, ?, ?)""",
+    "get_product_stats_row": """
+        SELECT purchase_count, first_bought, last_bought, decay_score
+        FROM product_stats WHERE list_id = ? AND product_id = ?""",
+    "delete_all_stats": "DELETE FROM product_stats",
+    "get_history_dates": """
+        SELECT list_id, product_id, bought_date FROM purchase_history
+        WHERE bought_date IS NOT NULL {filters}""",
+    "get_product_names": """
+        SELECT name FROM products WHERE id IN (
+            SELECT product_id FROM product_stats WHERE list_id = ?
+            UNION
+            SELECT product_id FROM shopping_items WHERE list_id = ?
+        )""",
+    # Модель предсказания категорий (category_predictor)
+    "get_category_pairs": """
+        SELECT ph.product_id, ph.category_id, p.name, c.name
+        FROM (SELECT DISTINCT product_id, category_id FROM purchase_history) ph
+        JOIN products p ON p.id = ph.product_id
+        JOIN categories c ON c.id = ph.category_id""",
+    "insert_category_example": "INSERT OR IGNORE INTO category_examples (product_id, category_id) VALUES (?, ?)",
+    "add_category_feature": """
+        INSERT INTO category_features (feature, category_id, count) VALUES (?, ?, ?)
+        ON CONFLICT (feature, category_id) DO UPDATE SET count = count + excluded.count""",
+    "delete_category_examples": "DELETE FROM category_examples",
+    "delete_category_features": "DELETE FROM category_features",
+    "get_category_features": """
+        SELECT cf.feature, c.name, cf.count
+        FROM category_features cf
+        JOIN categories c ON c.id = cf.category_id""",
+    "get_category_example_counts": """
+        SELECT c.name, COUNT(*)
+        FROM category_examples ce
+        JOIN categories c ON c.id = ce.category_id
+        GROUP BY ce.category_id""",
+    "get_product_stats": """
+        SELECT p.name, ps.purchase_count, ps.first_bought, ps.last_bought, ps.decay_score
+        FROM product_stats ps
+        JOIN products p ON p.id = ps.product_id
+        WHERE ps.list_id = ?""",
+
+    # Синхронизация совместных списков (sync_client). sync_seq - номер
+    # последнего полученного с сервера изменения, NULL - список не синхронизируется
+    "get_sync_state": "SELECT share_code, name, sync_seq FROM shopping_lists WHERE id = ?",
+    "set_sync_seq": "UPDATE shopping_lists SET sync_seq = ? WHERE id = ?",
+    "insert_synced_list": "INSERT INTO shopping_lists (name, owner_id, share_code, sync_seq) VALUES (?, ?, ?, 0)",
+    "enqueue_list_items": "INSERT INTO sync_outbox (list_id, uid) SELECT list_id, uid FROM shopping_items WHERE list_id = ?",
+    "get_outbox_max_id": "SELECT MAX(id) FROM sync_outbox WHERE list_id = ?",
+    "get_outbox_uids": "SELECT DISTINCT uid FROM sync_outbox WHERE list_id = ? AND id <= ?",
+    "delete_outbox_upto": "DELETE FROM sync_outbox WHERE list_id = ? AND id <= ?",
+    "delete_outbox_after": "DELETE FROM sync_outbox WHERE list_id = ? AND id > ?",
+    "get_sync_item": """
+        SELECT p.name, c.name, si.sort_order, u.username, si.bought_date
+        FROM shopping_items si
+        JOIN products p ON p.id = si.product_id
+        JOIN categories c ON c.id = si.category_id
+        LEFT JOIN users u ON u.id = si.bought_by
+        WHERE si.uid = ?""",
+    "find_item_by_uid": "SELECT id, list_id, product_id, category_id, sort_order, bought_by FROM shopping_items WHERE uid = ?",
+    "update_synced_item": "UPDATE shopping_items SET product_id = ?, category_id = ?, sort_order = ? WHERE id = ?",
+}
+
+# Запас кэша под варианты запросов с подстановкой {filters}
+STATEMENT_CACHE_SIZE = len(STATEMENTS) + 16
+
+
+class StatementStats:
+    """Потокобезопасные счетчики выполнений и суммарного времени по именам запросов"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            entry = self._stats.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def snapshot(self):
+        """Возвращает {имя: (число выполнений, суммарное время в мс)}"""
+        with self._lock:
+            return {name: (count, total * 1000) for name, (count, total) in self._stats.items()}
+
+    def top(self, limit=10):
+        """Запросы с наибольшим суммарным временем: [(имя, число, мс), ...]"""
+        rows = [(name, count, total_ms) for name, (count, total_ms) in self.snapshot().items()]
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+STATEMENT_STATS = StatementStats()
+
+
+def statement_sql(name, filters=""):
+    sql = STATEMENTS[name]
+    return sql.format(filters=filters) if "{filters}" in sql else sql
+
+
+def execute(cursor, name, params=(), filters=""):
+    """Выполняет именованный запрос; время учитывается до получения курсора"""
+    started = time.perf_counter()
+    try:
+        return cursor.execute(statement_sql(name, filters), params)
+    finally:
+        STATEMENT_STATS.record(name, time.perf_counter() - started)
+
+
+def executemany(cursor, name, rows):
+    started = time.perf_counter()
+    try:
+        return cursor.executemany(statement_sql(name), rows)
+    finally:
+        STATEMENT_STATS.record(name, time.perf_counter() - started)
+
+
+def fetchone(cursor, name, params=(), filters=""):
+    """Выполняет запрос и возвращает первую строку; время включает выборку"""
+    started = time.perf_counter()
+    try:
+        return cursor.execute(statement_sql(name, filters), params).fetchone()
+    finally:
+        STATEMENT_STATS.record(name, time.perf_counter() - started)
+
+
+def fetchall(cursor, name, params=(), filters=""):
+    """Выполняет запрос и возвращает все строки; время включает выборку"""
+    started = time.perf_counter()
+    try:
+        return cursor.execute(statement_sql(name, filters), params).fetchall()
+    finally:
+        STATEMENT_STATS.record(name, time.perf_counter() - started)
@@ -0,0 +1,99 @@
+"""Ранжирование умных предложений по частоте и регулярности покупок.
+
+Для каждого товара списка хранится компактная статистика (product_stats):
+число покупок, первая и последняя покупка и затухающий счет decay_score.
+Счет увеличивается на 1 при каждой покупке и уменьшается вдвое за каждые
+HALF_LIFE_DAYS, поэтому давние покупки почти не влияют на рейтинг.
+Статистика обновляется по одной покупке, без повторного чтения истории.
+"""
+import heapq
+from datetime import datetime
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+HALF_LIFE_DAYS = 30
+DEFAULT_SUGGESTIONS_COUNT = 5
+# Насколько сильно просроченный по обычному интервалу товар поднимается в рейтинге
+MAX_URGENCY = 3.0
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def parse_date(value):
+    # fromisoformat разбирает DATE_FORMAT на порядок быстрее strptime,
+    # что заметно при пересчете статистики по всей истории
+    return datetime.fromisoformat(value).timestamp()
+
+
+def decay_factor(seconds, half_life_days=HALF_LIFE_DAYS):
+    return 0.5 ** (seconds / (half_life_days * SECONDS_PER_DAY))
+
+
+def add_purchase(stats, bought_date):
+    """Возвращает статистику товара с учетом еще одной покупки.
+
+    stats - словарь с ключами count, first_bought, last_bought, decay_score
+    или None для первой покупки. Порядок покупок не важен: это позволяет
+    пересчитывать статистику из истории в любом порядке строк.
+    """
+    if stats is None:
+        return {
+            "count": 1,
+            "first_bought": bought_date,
+            "last_bought": bought_date,
+            "decay_score": 1.0,
+        }
+
+    bought_at = parse_date(bought_date)
+    last_at = parse_date(stats["last_bought"])
+
+    if bought_at >= last_at:
+        # Старый счет затухает до момента новой покупки
+        decay_score = stats["decay_score"] * decay_factor(bought_at - last_at) + 1
+        last_bought = bought_date
+    else:
+        decay_score = stats["decay_score"] + decay_factor(last_at - bought_at)
+        last_bought = stats["last_bought"]
+
+    return {
+        "count": stats["count"] + 1,
+        "first_bought": min(stats["first_bought"], bought_date),
+        "last_bought": last_bought,
+        "decay_score": decay_score,
+    }
+
+
+def mean_interval(count, first_bought, last_bought):
+    """Средний интервал между покупками в секундах (None, если покупка одна)"""
+    if count < 2:
+        return None
+    return (parse_date(last_bought) - parse_date(first_bought)) / (count - 1)
+
+
+def rank_products(stats_rows, now=None, k=DEFAULT_SUGGESTIONS_COUNT):
+    """Возвращает k лучших предложений как (название, число покупок, пора_купить).
+
+    stats_rows - строки (product_name, count, first_bought, last_bought, decay_score).
+    Рейтинг - текущий затухающий счет, усиленный тем, насколько товар
+    просрочен относительно обычного интервала между покупками.
+    """
+    now = now if now is not None else datetime.now().timestamp()
+    ranked = []
+
+    for product_name, count, first_bought, last_bought, decay_score in stats_rows:
+        if not last_bought:
+            continue
+
+        since_last = max(now - parse_date(last_bought), 0)
+        score = decay_score * decay_factor(since_last)
+
+        interval = mean_interval(count, first_bought, last_bought)
+        is_due = False
+        if interval:
+            due_ratio = since_last / interval
+            is_due = due_ratio >= 1
+            score *= 1 + min(due_ratio, MAX_URGENCY)
+
+        ranked.append((score, product_name, count, is_due))
+
+    best = heapq.nlargest(k, ranked, key=lambda item: item[0])
+    return [(product_name, count, is_due) for score, product_name, count, is_due in best]
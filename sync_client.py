@@ -0,0 +1,101 @@
+"""Клиент сервера синхронизации (протокол описан в sync_server.py).
+
+Блокирующий: Database вызывает его из потока синхронизации AsyncAppLogic
+или из CLI. Соединение одно на клиента и переоткрывается при обрыве.
+"""
+import json
+import socket
+import threading
+
+from log_config import get_logger
+from sync_protocol import DEFAULT_PORT, SyncError, encode
+
+logger = get_logger(__name__)
+
+DEFAULT_TIMEOUT = 10
+
+
+class SyncClient:
+    def __init__(self, host, port=DEFAULT_PORT, timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock = None
+        self.stream = None
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_address(cls, address, timeout=DEFAULT_TIMEOUT):
+        """Клиент по строке "host:port" или "host" (порт по умолчанию)"""
+        host, _, port = address.rpartition(":")
+        if not host:
+            return cls(address, DEFAULT_PORT, timeout)
+        return cls(host, int(port), timeout)
+
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port), self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stream = self.sock.makefile("rb")
+
+    def close(self):
+        with self.lock:
+            self.disconnect()
+
+    def disconnect(self):
+        if self.stream:
+            self.stream.close()
+        if self.sock:
+            self.sock.close()
+        self.sock = self.stream = None
+
+    def exchange(self, message, timeout):
+        if self.sock is None:
+            self.connect()
+        self.sock.settimeout(timeout)
+        self.sock.sendall(encode(message))
+        # Запросы клиента последовательны, поэтому ответ - следующая строка
+        line = self.stream.readline()
+        if not line:
+            raise ConnectionError("Сервер закрыл соединение")
+        response = json.loads(line)
+        if response.get("i") != message["i"]:
+            raise ConnectionError("Ответ на чужой запрос")
+        return response
+
+    def request(self, message, wait=0):
+        with self.lock:
+            self.next_id += 1
+            message["i"] = self.next_id
+            timeout = self.timeout + wait
+            try:
+                try:
+                    response = self.exchange(message, timeout)
+                except ConnectionError:
+                    # Соединение могло устареть, пока клиент не работал: одна повторная попытка
+                    self.disconnect()
+                    response = self.exchange(message, timeout)
+            except (OSError, ValueError) as e:
+                self.disconnect()
+                logger.warning("Сервер синхронизации %s:%s недоступен: %s", self.host, self.port, e)
+                raise SyncError(f"Сервер синхронизации недоступен: {e}") from e
+
+        if "e" in response:
+            raise SyncError(response["e"])
+        return response
+
+    def sync(self, share_code, since=0, changes=(), name=None, wait=0):
+        """Отправляет изменения списка и получает чужие; возвращает (seq, изменения)"""
+        message = {"op": "sync", "l": share_code, "s": since}
+        if changes:
+            message["ch"] = list(changes)
+        if name:
+            message["n"] = name
+        if wait:
+            message["w"] = wait
+        response = self.request(message, wait)
+        return response["s"], response.get("ch", [])
+
+    def list_info(self, share_code):
+        """Название списка на сервере; SyncError, если списка нет"""
+        return self.request({"op": "info", "l": share_code}).get("n")
@@ -0,0 +1,164 @@
+"""Нагрузочная проверка сервера синхронизации.
+
+Сотни участников одного списка одновременно отправляют изменения и
+забирают чужие, каждый по своему соединению. Участники меняют товары из
+общего набора, поэтому изменения одного товара конфликтуют. В конце
+каждый участник забирает оставшиеся изменения, и его копия списка
+сравнивается с состоянием на сервере.
+
+Сервер по умолчанию запускается в том же процессе (клиенты делят с ним
+процессор, поэтому результат - нижняя оценка):
+    python sync_load_test.py --members 300 --rounds 20
+    python sync_load_test.py --server 127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from sync_protocol import encode
+from sync_server import SyncServer, MAX_MESSAGE_SIZE
+
+SHARE_CODE = "LOADTEST"
+CATEGORIES = ["Молочные", "Хлеб", "Овощи", "Фрукты", "Напитки"]
+
+
+class Member:
+    """Участник списка со своей копией: uid -> последнее известное изменение"""
+
+    def __init__(self, number, host, port):
+        self.number = number
+        self.host = host
+        self.port = port
+        self.items = {}
+        self.seq = 0
+        self.next_id = 0
+        self.latencies = []
+        self.sent_bytes = 0
+        self.received_bytes = 0
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, limit=MAX_MESSAGE_SIZE)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    async def sync(self, changes=()):
+        self.next_id += 1
+        message = {"i": self.next_id, "op": "sync", "l": SHARE_CODE, "s": self.seq}
+        if changes:
+            message["ch"] = list(changes)
+        data = encode(message)
+
+        started = time.perf_counter()
+        self.writer.write(data)
+        line = await self.reader.readline()
+        self.latencies.append(time.perf_counter() - started)
+        self.sent_bytes += len(data)
+        self.received_bytes += len(line)
+
+        response = json.loads(line)
+        if "e" in response:
+            raise RuntimeError(response["e"])
+        for change in changes:
+            self.items[change["u"]] = change
+        for change in response.get("ch", ()):
+            self.items[change["u"]] = change
+        self.seq = response["s"]
+
+    def make_change(self, rng, shared_items):
+        uid = rng.choice(shared_items) if rng.random() < 0.7 else f"m{self.number}-{self.next_id}"
+        if uid in self.items and rng.random() < 0.1:
+            return {"u": uid, "x": 1}
+        change = {"u": uid, "n": f"Товар {uid}", "c": rng.choice(CATEGORIES), "o": rng.randrange(1, 100000)}
+        if rng.random() < 0.3:
+            change["b"] = f"user{self.number}"
+            change["d"] = "2024-05-01 12:00:00"
+        return change
+
+    async def run(self, rounds, shared_items, seed):
+        rng = random.Random(seed)
+        await self.sync()
+        for _ in range(rounds):
+            await self.sync([self.make_change(rng, shared_items)])
+            # Пауза, как у приложения между действиями пользователя
+            await asyncio.sleep(rng.uniform(0, 0.01))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def run_load(members_count, rounds, shared_count, server_address=None, seed=0):
+    server = None
+    if server_address:
+        host, _, port = server_address.rpartition(":")
+        port = int(port)
+    else:
+        server = SyncServer()
+        host = "127.0.0.1"
+        port = await server.start(host, 0)
+
+    shared_items = [f"s{index}" for index in range(shared_count)]
+    members = [Member(number, host, port) for number in range(members_count)]
+    try:
+        await asyncio.gather(*(member.connect() for member in members))
+        # Список создается на сервере первой отправкой
+        await members[0].sync([{"u": shared_items[0], "n": "Молоко", "c": "Молочные", "o": 1024}])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(member.run(rounds, shared_items, seed + member.number) for member in members))
+        elapsed = time.perf_counter() - started
+
+        # Последняя синхронизация без изменений: копии должны совпасть
+        await asyncio.gather(*(member.sync() for member in members))
+        reference = members[0].items
+        if server:
+            reference = {uid: json.loads(data) for uid, (_, data) in server.lists[SHARE_CODE].items.items()}
+        converged = sum(member.items == reference for member in members)
+    finally:
+        await asyncio.gather(*(member.close() for member in members), return_exceptions=True)
+        if server:
+            await server.close()
+
+    latencies = [latency for member in members for latency in member.latencies]
+    requests = len(latencies)
+    return {
+        "members": members_count,
+        "requests": requests,
+        "elapsed": elapsed,
+        "rps": members_count * rounds / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "request_bytes": sum(member.sent_bytes for member in members) / requests,
+        "response_bytes": sum(member.received_bytes for member in members) / requests,
+        "items": len(reference),
+        "converged": converged,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочная проверка сервера синхронизации")
+    parser.add_argument("--members", type=int, default=300, help="Число участников списка")
+    parser.add_argument("--rounds", type=int, default=20, help="Изменений на участника")
+    parser.add_argument("--shared-items", type=int, default=200, help="Товаров, которые меняют все участники")
+    parser.add_argument("--server", help="host:port внешнего сервера (по умолчанию - в этом процессе)")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run_load(args.members, args.rounds, args.shared_items, args.server))
+    print(f"Участников: {result['members']}, запросов: {result['requests']}, "
+          f"время: {result['elapsed']:.2f} с, изменений в секунду: {result['rps']:.0f}")
+    print(f"Задержка: p50 {result['p50_ms']:.1f} мс, p95 {result['p95_ms']:.1f} мс, p99 {result['p99_ms']:.1f} мс")
+    print(f"Средний размер: запрос {result['request_bytes']:.0f} Б, ответ {result['response_bytes']:.0f} Б")
+    print(f"Товаров в списке: {result['items']}, копий совпало с сервером: "
+          f"{result['converged']} из {result['members']}")
+    return 0 if result["converged"] == result["members"] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,20 @@
+"""Общие для клиента и сервера синхронизации определения протокола (см. sync_server.py).
+
+Модуль не импортирует asyncio: его подключает Database при каждом запуске,
+даже без сервера синхронизации.
+"""
+import json
+
+DEFAULT_PORT = 8765
+
+
+class SyncError(Exception):
+    """Сервер синхронизации недоступен или отклонил запрос"""
+
+
+def dumps(message):
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode(message):
+    return (dumps(message) + "\n").encode()
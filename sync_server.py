@@ -0,0 +1,350 @@
+"""Сервер синхронизации совместных списков покупок.
+
+Устройства участников обмениваются через сервер изменениями товаров
+(клиент - sync_client.SyncClient, его использует Database). Список на
+сервере определяется кодом приглашения: кто знает код, тот участник.
+
+Протокол - JSON поверх TCP, по одному сообщению в строке. Запрос несет
+номер "i", ответ приходит с тем же номером, поэтому по одному соединению
+можно отправлять запросы, не дожидаясь ответов. Ключи сокращены, пустые
+поля не передаются:
+
+    {"i": 1, "op": "sync", "l": код, "n": название, "s": seq, "ch": [...], "w": сек}
+    -> {"i": 1, "s": seq, "ch": [...]}
+    {"i": 2, "op": "info", "l": код} -> {"i": 2, "n": название}
+    ошибка -> {"i": N, "e": текст}
+
+Изменение - последнее состояние товара: "u" - uid, "n" - название,
+"c" - категория, "o" - sort_order, "b" - кто купил, "d" - дата покупки,
+"x": 1 - товар удален. Сервер хранит по каждому товару только последнее
+состояние и номер изменения seq. Новое состояние заменяет хранимое, но
+покупку, сделанную после seq клиента, его некупленное состояние или
+удаление не отменяет: сохраняются "b" и "d", а слитое состояние
+возвращается и самому клиенту. sync применяет присланные изменения и
+возвращает товары других участников, изменившиеся после seq клиента;
+если таких нет и задан "w", ответ ждет их до w секунд (long polling).
+Все списки находятся в памяти, база сервера пишется пачками в фоне.
+Изменение кодируется в JSON один раз при получении, и ответы всем
+участникам собираются из готовых фрагментов.
+
+Запуск:
+    python sync_server.py --port 8765 --db sync_server.db
+"""
+import argparse
+import asyncio
+import json
+import sqlite3
+import sys
+import time
+
+from log_config import configure_logging, get_logger
+from sync_protocol import DEFAULT_PORT, dumps, encode
+
+logger = get_logger(__name__)
+
+MAX_MESSAGE_SIZE = 1024 * 1024
+MAX_WAIT = 30
+MAX_CODE_LENGTH = 32
+MAX_UID_LENGTH = 64
+FLUSH_INTERVAL = 0.2
+
+# Поля изменения товара, которые сервер принимает и хранит
+CHANGE_FIELDS = ("u", "n", "c", "o", "b", "d", "x")
+
+SERVER_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS sync_lists (
+           code TEXT PRIMARY KEY,
+           name TEXT,
+           seq INTEGER NOT NULL
+       )""",
+    """CREATE TABLE IF NOT EXISTS sync_items (
+           code TEXT NOT NULL,
+           uid TEXT NOT NULL,
+           seq INTEGER NOT NULL,
+           data TEXT NOT NULL,
+           PRIMARY KEY (code, uid)
+       ) WITHOUT ROWID""",
+]
+
+
+def encode_response(response, fragments=()):
+    """Кодирует ответ, добавляя в него "ch" из уже закодированных изменений"""
+    data = encode(response)
+    if not fragments:
+        return data
+    return data[:-2] + b',"ch":[' + b",".join(fragments) + b"]}\n"
+
+
+class SyncList:
+    """Список на сервере: последнее изменение каждого товара по uid"""
+
+    def __init__(self, name=None, seq=0):
+        self.name = name
+        self.seq = seq
+        # uid -> (seq, изменение в JSON); порядок словаря совпадает с порядком seq
+        self.items = {}
+        # Событие текущего "поколения": при изменениях срабатывает и заменяется новым
+        self.changed = asyncio.Event()
+
+    def merge(self, change, since):
+        """Состояние товара после изменения от клиента, видевшего список до seq since.
+
+        Покупку, которой клиент не видел, не отменяют ни его правка, ни
+        удаление: они сделаны над некупленным товаром.
+        """
+        if change.get("d"):
+            return change
+        stored = self.items.get(change["u"])
+        if stored is None or stored[0] <= since:
+            return change
+        stored_change = json.loads(stored[1])
+        if not stored_change.get("d"):
+            return change
+        if change.get("x"):
+            return stored_change
+        merged = dict(change, d=stored_change["d"])
+        if "b" in stored_change:
+            merged["b"] = stored_change["b"]
+        return merged
+
+    def apply(self, changes, since):
+        """Применяет изменения; возвращает uid товаров, чье состояние после
+        слияния отличается от присланного (его нужно вернуть отправителю)"""
+        merged_uids = set()
+        for change in changes:
+            merged = self.merge(change, since)
+            if merged is not change:
+                merged_uids.add(change["u"])
+                change = merged
+            self.seq += 1
+            self.items.pop(change["u"], None)
+            self.items[change["u"]] = (self.seq, dumps(change).encode())
+        self.changed.set()
+        self.changed = asyncio.Event()
+        return merged_uids
+
+    def changes_since(self, seq, exclude=()):
+        """Изменения в JSON новее seq, кроме товаров из exclude; обход с конца до первого старого"""
+        result = []
+        for uid, (item_seq, data) in reversed(self.items.items()):
+            if item_seq <= seq:
+                break
+            if uid not in exclude:
+                result.append(data)
+        result.reverse()
+        return result
+
+
+class SyncStore:
+    """База сервера: изменения копятся в памяти и записываются пачками"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        for step in SERVER_SCHEMA:
+            self.conn.execute(step)
+        self.conn.commit()
+        self.pending_lists = {}
+        self.pending_items = {}
+
+    def load(self):
+        lists = {code: SyncList(name, seq) for code, name, seq in
+                 self.conn.execute("SELECT code, name, seq FROM sync_lists")}
+        for code, uid, seq, data in self.conn.execute("SELECT code, uid, seq, data FROM sync_items ORDER BY seq"):
+            lists[code].items[uid] = (seq, data.encode())
+        return lists
+
+    def save(self, code, sync_list, changes):
+        self.pending_lists[code] = (code, sync_list.name, sync_list.seq)
+        for change in changes:
+            seq, data = sync_list.items[change["u"]]
+            self.pending_items[(code, change["u"])] = (code, change["u"], seq, data.decode())
+
+    def flush(self):
+        if not self.pending_lists and not self.pending_items:
+            return 0
+        count = len(self.pending_items)
+        self.conn.executemany("INSERT OR REPLACE INTO sync_lists (code, name, seq) VALUES (?, ?, ?)",
+                              list(self.pending_lists.values()))
+        self.conn.executemany("INSERT OR REPLACE INTO sync_items (code, uid, seq, data) VALUES (?, ?, ?, ?)",
+                              list(self.pending_items.values()))
+        self.conn.commit()
+        self.pending_lists.clear()
+        self.pending_items.clear()
+        return count
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+class SyncServer:
+    """asyncio-сервер синхронизации; db_path=None - без сохранения на диск"""
+
+    def __init__(self, db_path=None):
+        self.store = SyncStore(db_path) if db_path else None
+        self.lists = self.store.load() if self.store else {}
+        self.server = None
+        self.flush_task = None
+        self.requests = 0
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """Начинает принимать соединения; возвращает порт (port=0 - любой свободный)"""
+        self.server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_MESSAGE_SIZE)
+        if self.store:
+            self.flush_task = asyncio.create_task(self.flush_periodically())
+        port = self.server.sockets[0].getsockname()[1]
+        logger.info("Сервер синхронизации слушает %s:%s", host, port)
+        return port
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.flush_task:
+            self.flush_task.cancel()
+        if self.store:
+            self.store.close()
+
+    async def flush_periodically(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                self.store.flush()
+            except sqlite3.Error as e:
+                logger.error("Ошибка записи базы сервера: %s", e)
+
+    async def handle_connection(self, reader, writer):
+        # Запросы одного соединения обрабатываются параллельно: долгий
+        # long polling не задерживает остальные
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):
+                    break
+                if not line:
+                    break
+                task = asyncio.create_task(self.handle_line(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def handle_line(self, line, writer):
+        self.requests += 1
+        request_id = None
+        fragments = ()
+        try:
+            request = json.loads(line)
+            request_id = request.get("i")
+            response, fragments = await self.handle_request(request)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            response = {"e": f"Некорректный запрос: {e}"}
+        if request_id is not None:
+            response["i"] = request_id
+        try:
+            writer.write(encode_response(response, fragments))
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def handle_request(self, request):
+        """Возвращает (ответ, закодированные изменения для "ch")"""
+        code = request["l"]
+        if not isinstance(code, str) or not 0 < len(code) <= MAX_CODE_LENGTH:
+            raise ValueError("код списка")
+
+        if request.get("op") == "info":
+            sync_list = self.lists.get(code)
+            if sync_list is None:
+                return {"e": "Список не найден"}, ()
+            return ({"n": sync_list.name} if sync_list.name else {}), ()
+        if request.get("op") == "sync":
+            return await self.sync(code, request)
+        return {"e": "Неизвестная операция"}, ()
+
+    @staticmethod
+    def clean_change(change):
+        uid = change["u"]
+        if not isinstance(uid, str) or not 0 < len(uid) <= MAX_UID_LENGTH:
+            raise ValueError("uid товара")
+        if not change.get("x") and not isinstance(change.get("n"), str):
+            raise ValueError("название товара")
+        return {field: change[field] for field in CHANGE_FIELDS if change.get(field) is not None}
+
+    async def sync(self, code, request):
+        changes = [self.clean_change(change) for change in request.get("ch", ())]
+        name = request.get("n")
+
+        sync_list = self.lists.get(code)
+        if sync_list is None:
+            # Список появляется на сервере при первой отправке от участника
+            if not changes and not name:
+                return {"e": "Список не найден"}, ()
+            sync_list = self.lists[code] = SyncList(name)
+        elif name and not sync_list.name:
+            sync_list.name = name
+
+        since = int(request.get("s", 0))
+        if since > sync_list.seq:
+            # Клиент видел больше, чем есть на сервере (база сервера новая): отдаем все
+            since = 0
+
+        merged = set()
+        if changes:
+            merged = sync_list.apply(changes, since)
+            if self.store:
+                self.store.save(code, sync_list, changes)
+        elif name and self.store:
+            self.store.save(code, sync_list, ())
+
+        # Свои изменения клиент уже знает, кроме измененных слиянием
+        pushed = {change["u"] for change in changes} - merged
+        result = sync_list.changes_since(since, pushed)
+
+        wait = min(float(request.get("w", 0)), MAX_WAIT)
+        deadline = time.monotonic() + wait
+        while not result and wait > 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(sync_list.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+            result = sync_list.changes_since(since, pushed)
+
+        return {"s": sync_list.seq}, result
+
+
+async def serve(host, port, db_path):
+    server = SyncServer(db_path)
+    await server.start(host, port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сервер синхронизации совместных списков")
+    parser.add_argument("--host", default="0.0.0.0", help="Адрес для входящих соединений")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Порт")
+    parser.add_argument("--db", default="sync_server.db", help="Файл базы сервера")
+    args = parser.parse_args(argv)
+
+    configure_logging("INFO")
+    try:
+        asyncio.run(serve(args.host, args.port, args.db))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+# Модули приложения лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import passwords
+from app_logic import AppLogic
+from database import Database
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    """Фабрика баз в tmp_path; хеширование паролей не калибруется и минимально по стоимости"""
+    databases = []
+
+    def make(name="test.db", **kwargs):
+        kwargs.setdefault("password_hasher", passwords.PBKDF2Hasher(passwords.PBKDF2Hasher.min_iterations))
+        db = Database(str(tmp_path / name), **kwargs)
+        databases.append(db)
+        return db
+
+    yield make
+    for db in databases:
+        db.close()
+
+
+@pytest.fixture
+def db(make_db):
+    """База с пользователем "user", выполнившим вход"""
+    db = make_db()
+    db.register_user("user", "password")
+    db.login_user("user", "password")
+    return db
+
+
+@pytest.fixture
+def logic(db):
+    return AppLogic(db)
@@ -0,0 +1,28 @@
+"""Кэш AppLogic: изменение товара сбрасывает кэш его списка, а не текущего."""
+import pytest
+
+
+@pytest.fixture
+def item_in_other_list(logic):
+    current, _ = logic.create_shared_list("Текущий")
+    other, _ = logic.create_shared_list("Другой")
+    _, changes = logic.add_item("Молоко", "Молочные", list_id=other)
+    product_id = changes.inserted[0][0]
+    # Строки другого списка попадают в кэш, затем пользователь переключается
+    assert len(logic.get_current_list(list_id=other)) == 1
+    logic.set_current_list(current)
+    return other, product_id
+
+
+def test_toggle_invalidates_item_list(logic, item_in_other_list):
+    other, product_id = item_in_other_list
+    _, changes = logic.toggle_bought(product_id)
+    assert changes.list_id == other
+    assert logic.get_current_list(list_id=other) == []
+
+
+def test_delete_invalidates_item_list(logic, item_in_other_list):
+    other, product_id = item_in_other_list
+    _, changes = logic.delete_item(product_id)
+    assert changes.list_id == other
+    assert logic.get_current_list(list_id=other) == []
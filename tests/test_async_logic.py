@@ -0,0 +1,66 @@
+"""Фоновые вызовы AppLogic: операция выполняется над списком, выбранным при ее вызове."""
+import threading
+
+import pytest
+
+from async_logic import AsyncAppLogic
+
+
+def test_list_switch_while_queued(logic):
+    first, _ = logic.create_shared_list("Первый")
+    second, _ = logic.create_shared_list("Второй")
+    async_logic = AsyncAppLogic(logic)
+    try:
+        # Рабочий поток занят, пока пользователь переключает список
+        release = threading.Event()
+        async_logic.executor.submit(release.wait)
+
+        logic.set_current_list(first)
+        added = async_logic.add_item("Молоко", "Молочные")
+        logic.set_current_list(second)
+        release.set()
+        added.result(timeout=10)
+
+        assert [row[1] for row in logic.get_current_list(list_id=first)] == ["Молоко"]
+        assert logic.get_current_list(list_id=second) == []
+    finally:
+        async_logic.shutdown()
+
+
+def test_explicit_list_id_is_kept(logic):
+    first, _ = logic.create_shared_list("Первый")
+    second, _ = logic.create_shared_list("Второй")
+    async_logic = AsyncAppLogic(logic)
+    try:
+        logic.set_current_list(second)
+        async_logic.delete_shopping_list(first).result(timeout=10)
+        assert [row[0] for row in logic.get_user_lists()] == [second]
+    finally:
+        async_logic.shutdown()
+
+
+def test_sync_request_does_not_block_local_operations(logic):
+    first, _ = logic.create_shared_list("Первый")
+    logic.set_current_list(first)
+    async_logic = AsyncAppLogic(logic)
+    release = threading.Event()
+    try:
+        # Сетевой запрос ждет ответа сервера, подготовка и применение - в рабочем потоке
+        steps = []
+        logic.start_sync = lambda list_id: (steps.append(("start", list_id)) or "request", None)
+        logic.exchange_sync = lambda request, wait: release.wait(10) and ("response", threading.current_thread().name)
+        logic.finish_sync = lambda request, response: steps.append(
+            ("finish", response, threading.current_thread().name)) or ("ok", None)
+        synced = async_logic.sync_current_list()
+
+        logic.set_current_list(None)
+        async_logic.add_item("Молоко", "Молочные", list_id=first).result(timeout=10)
+        assert not synced.done()
+        release.set()
+        assert synced.result(timeout=10) == ("ok", None)
+        assert steps[0] == ("start", first)
+        _, (_, exchange_thread), finish_thread = steps[1]
+        assert exchange_thread.startswith("sync-worker") and finish_thread.startswith("db-worker")
+    finally:
+        release.set()
+        async_logic.shutdown()
@@ -0,0 +1,36 @@
+"""Потоковый экспорт истории: прерванная выгрузка не должна оставлять файл."""
+import sqlite3
+
+import pytest
+
+import history_export
+
+
+def test_failed_read_removes_partial_file(db, tmp_path, monkeypatch):
+    list_id = db.create_shopping_list("Список")
+    db.import_records(
+        ({"product_name": f"Товар {index}", "bought_date": "2024-01-01 10:00:00"} for index in range(10)),
+        list_id
+    )
+    connections = []
+    get_connection = db.get_connection
+    monkeypatch.setattr(db, "get_connection", lambda: connections.append(get_connection()) or connections[-1])
+
+    def interrupted(rows):
+        # Чтение обрывается после первой пачки строк
+        for index, row in enumerate(rows):
+            if index == 2:
+                connections[-1].interrupt()
+            yield row
+
+    path = tmp_path / "history.csv"
+    with pytest.raises(sqlite3.OperationalError):
+        history_export.export_rows(interrupted(db.iter_purchase_history(list_id, batch_size=2)), str(path))
+    assert not path.exists()
+
+
+def test_read_error_is_raised(db, monkeypatch):
+    list_id = db.create_shopping_list("Список")
+    monkeypatch.setattr(db, "get_connection", lambda: None)
+    with pytest.raises(sqlite3.OperationalError):
+        list(db.iter_purchase_history(list_id))
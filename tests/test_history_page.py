@@ -0,0 +1,25 @@
+"""Постраничная история: последняя страница не обещает следующую."""
+import pytest
+
+
+@pytest.mark.parametrize("purchases, pages", [(4, [2, 2]), (5, [2, 2, 1]), (0, [0])])
+def test_pages_end_without_empty_request(db, purchases, pages):
+    list_id = db.create_shopping_list("Список")
+    db.import_records(
+        ({"product_name": f"Товар {index}", "bought_date": f"2024-01-0{index + 1} 10:00:00"}
+         for index in range(purchases)),
+        list_id
+    )
+
+    sizes = []
+    names = []
+    rows, cursor = db.get_purchase_history_page(list_id, limit=2)
+    sizes.append(len(rows))
+    names += [row[0] for row in rows]
+    while cursor is not None:
+        rows, cursor = db.get_purchase_history_page(list_id, cursor, limit=2)
+        sizes.append(len(rows))
+        names += [row[0] for row in rows]
+
+    assert sizes == pages
+    assert names == [f"Товар {index}" for index in reversed(range(purchases))]
@@ -0,0 +1,24 @@
+"""Массовый импорт: записи попадают только в списки текущего пользователя."""
+
+RECORDS = [
+    {"product_name": "Молоко", "category": "Молочные"},
+    {"product_name": "Хлеб", "bought_date": "2024-01-01 10:00:00"},
+]
+
+
+def test_import_into_own_list(db):
+    list_id = db.create_shopping_list("Список")
+    assert db.import_records(RECORDS, list_id) == {"items": 1, "history": 1, "skipped": 0}
+    assert [row[1] for row in db.get_shopping_list(list_id)] == ["Молоко"]
+
+
+def test_import_into_foreign_list_by_id_is_skipped(db):
+    list_id = db.create_shopping_list("Список")
+
+    db.register_user("stranger", "password")
+    db.login_user("stranger", "password")
+    assert db.import_records(RECORDS, list_id) == {"items": 0, "history": 0, "skipped": 2}
+
+    db.login_user("user", "password")
+    assert db.get_shopping_list(list_id) == []
+    assert db.get_purchase_history(list_id) == []
@@ -0,0 +1,42 @@
+"""Калибровка стоимости хеширования под целевое время; проверяется на линейном таймере."""
+import pytest
+
+import passwords
+from passwords import PBKDF2Hasher, ScryptHasher
+
+
+def linear_timer(ms_per_unit, cost):
+    return lambda hasher, *args, **kwargs: cost(hasher) * ms_per_unit
+
+
+@pytest.mark.parametrize("ms_per_unit", [0.0005, 0.0013, 0.0019])
+def test_calibrate_scales_by_measured_ratio(monkeypatch, ms_per_unit):
+    # Время растет линейно с числом итераций: результат должен попасть в цель
+    monkeypatch.setattr(passwords, "measure", linear_timer(ms_per_unit, lambda hasher: hasher.iterations))
+    hasher = passwords.calibrate(100)
+    assert hasher.iterations * ms_per_unit == pytest.approx(100, rel=0.01)
+
+
+def test_calibrate_respects_bounds(monkeypatch):
+    monkeypatch.setattr(passwords, "measure", linear_timer(1.0, lambda hasher: hasher.iterations))
+    assert passwords.calibrate(100).iterations == PBKDF2Hasher.min_iterations
+    monkeypatch.setattr(passwords, "measure", linear_timer(1e-9, lambda hasher: hasher.iterations))
+    assert passwords.calibrate(100).iterations == PBKDF2Hasher.max_iterations
+
+
+def test_calibrate_scrypt_picks_nearest_power_of_two(monkeypatch):
+    # 100 мс ближе всего к n = 2 ** 15 (80 мс), а не к 2 ** 16 (160 мс)
+    monkeypatch.setattr(passwords, "measure", linear_timer(80 / 2 ** 15, lambda hasher: hasher.n))
+    assert passwords.calibrate(100, ScryptHasher).n == 2 ** 15
+
+
+def test_first_run_calibration_can_be_deferred(make_db, monkeypatch):
+    calibrated = []
+    monkeypatch.setattr(passwords, "calibrate", lambda target_ms, hasher_class: calibrated.append(1) or hasher_class(123456))
+    db = make_db(password_hasher=None, calibrate_password=False)
+    # До калибровки действует стоимость по умолчанию, и она не сохраняется
+    assert calibrated == []
+    assert db.password_hasher.iterations == PBKDF2Hasher.default_iterations
+    assert db.ensure_password_hasher().iterations == 123456
+    assert db.ensure_password_hasher().iterations == 123456
+    assert calibrated == [1]
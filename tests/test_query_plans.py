@@ -0,0 +1,35 @@
+"""EXPLAIN QUERY PLAN горячих запросов: ни один не должен сканировать таблицу целиком."""
+import pytest
+
+import database
+from database import HOT_QUERIES, MIGRATIONS
+
+
+@pytest.fixture
+def db(make_db):
+    # Планы запросов не зависят от пользователя: база без регистрации и входа
+    return make_db()
+
+
+def test_all_migrations_applied(db):
+    conn = db.get_connection()
+    try:
+        assert db.get_schema_version(conn) == MIGRATIONS[-1][0]
+    finally:
+        db.release_connection(conn)
+
+
+def test_hot_queries_use_indexes(db):
+    assert db.find_full_scans() == {}
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_index(db, monkeypatch, name):
+    monkeypatch.setattr(database, "HOT_QUERIES", {name: HOT_QUERIES[name]})
+    assert db.find_full_scans() == {}
+
+
+def test_full_scan_is_reported(db, monkeypatch):
+    # get_history_dates читает всю историю намеренно (пересчет статистики)
+    monkeypatch.setattr(database, "HOT_QUERIES", {"get_history_dates": ()})
+    assert list(db.find_full_scans()) == ["get_history_dates"]
@@ -0,0 +1,36 @@
+"""RecycleView экранов: viewclass сохраняется после построения экрана, ChangeSet применяется к строкам."""
+import os
+
+import pytest
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+pytest.importorskip("kivy")
+
+from app_logic import ChangeSet
+from ui_controls import ProductItem
+from ui_layouts import HistoryScreen, MainScreen, SearchScreen
+from kivy.uix.label import Label
+
+
+@pytest.mark.parametrize("screen_class, view_name, viewclass", [
+    (MainScreen, "products_view", ProductItem),
+    (HistoryScreen, "history_view", Label),
+    (SearchScreen, "results_view", Label),
+])
+def test_viewclass_survives_layout(logic, screen_class, view_name, viewclass):
+    screen = screen_class(name="screen", logic=logic, async_logic=None)
+    assert getattr(screen, view_name).viewclass is viewclass
+
+
+def test_main_screen_applies_changes_of_shown_list(logic):
+    screen = MainScreen(name="main", logic=logic, async_logic=None)
+    logic.current_list_id = 1
+    screen.show_products([(1, "Молоко", "Молочные", 10), (2, "Хлеб", "Хлеб", 20), (3, "Сыр", "Молочные", 30)])
+
+    screen.apply_changes(ChangeSet(removed=[2], list_id=1))
+    screen.apply_changes(ChangeSet(inserted=[(4, "Чай", "Напитки", 25)], list_id=1))
+    # Изменения другого списка не попадают в показанный
+    screen.apply_changes(ChangeSet(removed=[1], inserted=[(5, "Кофе", "Напитки", 5)], list_id=2))
+
+    assert [row["product_id"] for row in screen.products_view.data] == [1, 4, 3]
+    assert screen.find_product_index(3) == 2
@@ -0,0 +1,24 @@
+"""Поиск: порог ранжирования считается только по спискам пользователя."""
+import pytest
+
+import database
+
+
+def test_other_users_hits_keep_ranked_search(db, monkeypatch):
+    if not db.has_search_index:
+        pytest.skip("SQLite собран без FTS5")
+    monkeypatch.setattr(database, "SEARCH_RANK_LIMIT", 3)
+    own_list = db.create_shopping_list("Свой")
+    db.add_products(own_list, [("Молоко", "Молочные"), ("Молоко топленое", "Молочные")])
+
+    db.register_user("other", "password")
+    db.login_user("other", "password")
+    other_list = db.create_shopping_list("Чужой")
+    db.add_products(other_list, [(f"Молоко {index}", "Молочные") for index in range(10)])
+
+    db.login_user("user", "password")
+    db.reset_statement_stats()
+    rows, _ = db.search("молоко")
+    assert sorted(row[3] for row in rows) == ["Молоко", "Молоко топленое"]
+    stats = db.get_statement_stats()
+    assert "search_fts" in stats and "search_fts_recent" not in stats
@@ -0,0 +1,181 @@
+"""Синхронизация двух устройств через сервер: одновременные покупка и правка/удаление."""
+import asyncio
+import threading
+
+import pytest
+
+from sync_server import SyncServer
+
+
+@pytest.fixture
+def server_address():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    server = SyncServer(db_path=None)
+    port = asyncio.run_coroutine_threadsafe(server.start(port=0), loop).result(timeout=5)
+    yield f"127.0.0.1:{port}"
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+    loop.close()
+
+
+def open_device(make_db, server_address, username):
+    db = make_db(f"{username}.db", sync_server=server_address)
+    db.register_user(username, "password")
+    db.login_user(username, "password")
+    return db
+
+
+@pytest.fixture
+def devices(server_address, make_db):
+    """Два устройства с общим списком "Молоко", "Хлеб"; возвращает ((db, list_id), (db, list_id))"""
+    # make_db запрошен после сервера: базы и их клиенты закрываются раньше него
+    first = open_device(make_db, server_address, "anna")
+    second = open_device(make_db, server_address, "boris")
+    first_list = first.create_shopping_list("Дом")
+    first.add_products(first_list, [("Молоко", "Молочные"), ("Хлеб", "Хлеб")])
+    first.sync_list(first_list)
+
+    share_code = first.get_list_info(first_list)[4]
+    assert second.join_shopping_list(share_code)
+    second_list = second.get_user_shopping_lists()[0][0]
+    assert second.sync_list(second_list) == 2
+    return (first, first_list), (second, second_list)
+
+
+def items(db, list_id):
+    """Товары списка: название -> (sort_order, куплен ли)"""
+    conn = db.get_connection()
+    try:
+        rows = conn.execute(
+            """SELECT p.name, si.sort_order, si.bought_date IS NOT NULL
+               FROM shopping_items si JOIN products p ON p.id = si.product_id
+               WHERE si.list_id = ?""",
+            (list_id,)
+        ).fetchall()
+    finally:
+        db.release_connection(conn)
+    return {name: (sort_order, bool(bought)) for name, sort_order, bought in rows}
+
+
+def item_id(db, list_id, name):
+    return next(row[0] for row in db.get_shopping_list(list_id) if row[1] == name)
+
+
+def history(db, list_id):
+    return [row[0] for row in db.get_purchase_history(list_id)]
+
+
+def sync_rounds(order):
+    for db, list_id in order + order:
+        assert db.sync_list(list_id) is not None
+
+
+@pytest.mark.parametrize("buyer_syncs_first", [True, False])
+def test_reorder_does_not_cancel_concurrent_purchase(devices, buyer_syncs_first):
+    buyer, editor = devices
+    assert buyer[0].toggle_bought_status(item_id(*buyer, "Молоко"))
+    assert editor[0].move_product(item_id(*editor, "Молоко"), 1)
+
+    sync_rounds([buyer, editor] if buyer_syncs_first else [editor, buyer])
+
+    assert items(*buyer) == items(*editor)
+    assert items(*editor)["Молоко"][1]
+    assert history(*editor) == ["Молоко"]
+    if buyer_syncs_first:
+        # Перемещение сделано после покупки и тоже сохраняется
+        assert items(*editor)["Молоко"][0] > items(*editor)["Хлеб"][0]
+
+
+@pytest.mark.parametrize("buyer_syncs_first", [True, False])
+def test_delete_does_not_cancel_concurrent_purchase(devices, buyer_syncs_first):
+    buyer, editor = devices
+    assert buyer[0].toggle_bought_status(item_id(*buyer, "Хлеб"))
+    assert editor[0].delete_product(item_id(*editor, "Хлеб"))
+
+    sync_rounds([buyer, editor] if buyer_syncs_first else [editor, buyer])
+
+    assert items(*buyer) == items(*editor)
+    assert items(*editor)["Хлеб"][1]
+    assert history(*editor) == ["Хлеб"]
+
+
+def test_unmark_after_seen_purchase_wins(devices):
+    buyer, editor = devices
+    assert buyer[0].toggle_bought_status(item_id(*buyer, "Молоко"))
+    sync_rounds([buyer, editor])
+    assert items(*editor)["Молоко"][1]
+
+    conn = editor[0].get_connection()
+    try:
+        bought_id = conn.execute("SELECT id FROM shopping_items WHERE bought_date IS NOT NULL").fetchone()[0]
+    finally:
+        editor[0].release_connection(conn)
+    assert editor[0].toggle_bought_status(bought_id)
+    sync_rounds([editor, buyer])
+
+    assert items(*buyer) == items(*editor)
+    assert not items(*buyer)["Молоко"][1]
+
+
+def test_purchase_applies_to_locally_changed_item(devices):
+    (buyer, buyer_list), (editor, editor_list) = devices
+    conn = buyer.get_connection()
+    try:
+        uid, product_name, category, sort_order = conn.execute(
+            """SELECT si.uid, p.name, c.name, si.sort_order FROM shopping_items si
+               JOIN products p ON p.id = si.product_id JOIN categories c ON c.id = si.category_id
+               WHERE p.name = 'Молоко'"""
+        ).fetchone()
+    finally:
+        buyer.release_connection(conn)
+    assert editor.move_product(item_id(editor, editor_list, "Молоко"), 1)
+    moved_order = items(editor, editor_list)["Молоко"][0]
+
+    purchase = {"u": uid, "n": product_name, "c": category, "o": sort_order, "b": "anna",
+                "d": "2026-10-18 12:00:00"}
+    conn = editor.get_connection()
+    try:
+        editor.apply_remote_changes(conn.cursor(), editor_list, [purchase], pending={uid})
+        conn.commit()
+    finally:
+        editor.release_connection(conn)
+
+    # Покупка применена, а локальное перемещение осталось и уйдет на сервер
+    assert items(editor, editor_list)["Молоко"] == (moved_order, True)
+
+
+def test_remote_changes_skip_list_deleted_during_request(devices):
+    (owner, owner_list), (member, member_list) = devices
+    member.add_product(member_list, "Сыр", "Молочные")
+    assert member.sync_list(member_list) is not None
+
+    request = owner.start_sync(owner_list)
+    response = owner.exchange_sync(request)
+    assert response[1]
+    # Пока шел запрос, рабочий поток удалил список
+    assert owner.delete_shopping_list(owner_list)
+
+    assert owner.finish_sync(request, response) is None
+    assert items(owner, owner_list) == {}
+
+
+def test_empty_exchange_does_not_write(devices):
+    (owner, owner_list), _ = devices
+    request = owner.start_sync(owner_list)
+    assert not request.changes
+    response = owner.exchange_sync(request)
+
+    conn = owner.get_connection()
+    try:
+        changes_before = conn.total_changes
+    finally:
+        owner.release_connection(conn)
+    assert owner.finish_sync(request, response) == 0
+    conn = owner.get_connection()
+    try:
+        assert conn.total_changes == changes_before
+    finally:
+        owner.release_connection(conn)
@@ -2,6 +2,7 @@ from kivy.uix.button import Button
 from kivy.uix.label import Label
 from kivy.uix.textinput import TextInput
 from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivy.metrics import dp
 
 
@@ -38,17 +39,24 @@ def create_input_field(hint_text):
     )
 
 
-class ProductItem(BoxLayout):
-    def __init__(self, product_id, product_name, category, logic, main_screen, created_by=None, bought_by=None,
-                 **kwargs):
+class ProductItem(RecycleDataViewBehavior, BoxLayout):
+    """Строка товара в RecycleView.
+
+    Виджеты строки создаются один раз, а при прокрутке RecycleView
+    переиспользует строку для других товаров через refresh_view_attrs.
+    """
+
+    def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.product_id = product_id
-        self.product_name = product_name
-        self.category = category
-        self.logic = logic
-        self.main_screen = main_screen
-        self.created_by = created_by
-        self.is_bought = bought_by is not None
+        self.index = None
+        self.product_id = None
+        self.product_name = ""
+        self.category = ""
+        self.logic = None
+        self.main_screen = None
+        self.created_by = None
+        self.bought_by = None
+        self.is_bought = False
 
         self.orientation = 'horizontal'
         self.size_hint_y = None
@@ -57,20 +65,20 @@ class ProductItem(BoxLayout):
         self.spacing = dp(5)
 
         # Кнопка удаления
-        delete_btn = Button(
+        self.delete_btn = Button(
             text="Удалить",
             size_hint_x=0.2,
             background_color=(0.8, 0, 0, 1),
             font_size=dp(12)
         )
-        delete_btn.bind(on_press=self.delete_product)
+        self.delete_btn.bind(on_press=self.delete_product)
 
         # Центральная часть с информацией
         center_layout = BoxLayout(orientation='vertical', size_hint_x=0.6)
         center_layout.padding = [dp(5), dp(5)]
 
-        name_label = Label(
-            text=product_name,
+        self.name_label = Label(
+            text="",
             font_size=dp(16),
             halign='left',
             valign='middle',
@@ -78,16 +86,8 @@ class ProductItem(BoxLayout):
             text_size=(dp(200), None)
         )
 
-        # Информация о создателе и покупателе
-        info_text = f"{category}"
-        if self.is_bought:
-            info_text += " • Куплен"
-        elif self.created_by:
-            current_user = self.logic.get_current_username()
-            info_text += f" • {current_user}"
-
-        info_label = Label(
-            text=info_text,
+        self.info_label = Label(
+            text="",
             font_size=dp(12),
             color=(0.7, 0.7, 0.7, 1),
             halign='left',
@@ -95,33 +95,76 @@ class ProductItem(BoxLayout):
             text_size=(dp(200), None)
         )
 
-        center_layout.add_widget(name_label)
-        center_layout.add_widget(info_label)
+        center_layout.add_widget(self.name_label)
+        center_layout.add_widget(self.info_label)
 
         # Кнопка купить/куплено
         self.bought_btn = Button(
-            text="Куплено" if self.is_bought else "Купить",
+            text="Купить",
             size_hint_x=0.2,
-            background_color=(0, 0.6, 0, 1) if self.is_bought else (0, 0.8, 0, 1),
+            background_color=(0, 0.8, 0, 1),
             font_size=dp(12)
         )
         self.bought_btn.bind(on_press=self.mark_bought)
 
-        self.add_widget(delete_btn)
+        self.add_widget(self.delete_btn)
         self.add_widget(center_layout)
         self.add_widget(self.bought_btn)
 
+    def refresh_view_attrs(self, rv, index, data):
+        """Заполняет переиспользуемую строку данными товара"""
+        self.index = index
+        result = super().refresh_view_attrs(rv, index, data)
+        self.is_bought = self.bought_by is not None
+
+        # Информация о создателе и покупателе
+        info_text = f"{self.category}"
+        if self.is_bought:
+            info_text += " • Куплен"
+        elif self.created_by:
+            current_user = self.logic.get_current_username()
+            info_text += f" • {current_user}"
+
+        self.name_label.text = self.product_name
+        self.info_label.text = info_text
+        self.bought_btn.text = "Куплено" if self.is_bought else "Купить"
+        self.bought_btn.background_color = (0, 0.6, 0, 1) if self.is_bought else (0, 0.8, 0, 1)
+        return result
+
+    def on_touch_down(self, touch):
+        # Перетаскивание за название: ScrollView передает касание строке,
+        # если палец задержался на месте, поэтому это "нажать и тянуть"
+        if (self.collide_point(*touch.pos)
+                and not self.delete_btn.collide_point(*touch.pos)
+                and not self.bought_btn.collide_point(*touch.pos)):
+            touch.grab(self)
+            touch.ud['drag_start_y'] = touch.y
+            self.opacity = 0.6
+            return True
+        return super().on_touch_down(touch)
+
+    def on_touch_up(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_up(touch)
+
+        touch.ungrab(self)
+        self.opacity = 1
+        # Ось Y направлена вверх: движение вниз переносит товар ближе к концу списка
+        row_height = self.height + self.parent.spacing if self.parent else self.height
+        steps = int(round((touch.ud['drag_start_y'] - touch.y) / row_height))
+        if steps and self.index is not None:
+            self.main_screen.move_product(self.index, self.index + steps)
+        return True
+
     def mark_bought(self, instance):
-        result = self.logic.toggle_bought(self.product_id)
-        self.main_screen.update_display()
+        self.main_screen.async_logic.toggle_bought(self.product_id, callback=self.main_screen.apply_result)
 
     def delete_product(self, instance):
-        result = self.logic.delete_item(self.product_id)
-        self.main_screen.update_display()
+        self.main_screen.async_logic.delete_item(self.product_id, callback=self.main_screen.apply_result)
 
 
 class SuggestionItem(BoxLayout):
-    def __init__(self, product_name, count, logic, suggestions_screen, **kwargs):
+    def __init__(self, product_name, count, logic, suggestions_screen, is_due=False, **kwargs):
         super().__init__(**kwargs)
         self.product_name = product_name
         self.count = count
@@ -135,7 +178,7 @@ class SuggestionItem(BoxLayout):
         self.spacing = dp(10)
 
         info_label = Label(
-            text=f"{product_name}\n(куплен {count} раз)",
+            text=f"{product_name}\n(куплен {count} раз{', пора купить' if is_due else ''})",
             size_hint_x=0.7,
             font_size=dp(16),
             halign='left',
@@ -157,7 +200,10 @@ class SuggestionItem(BoxLayout):
         self.add_widget(add_btn)
 
     def add_to_list(self, instance):
-        result = self.logic.add_suggestion(self.product_name)
+        self.suggestions_screen.async_logic.add_suggestion(self.product_name, callback=self.on_added)
+
+    def on_added(self, result):
+        message, changes = result
         self.suggestions_screen.manager.current = 'main'
         main_screen = self.suggestions_screen.manager.get_screen('main')
-        main_screen.update_display()
+        main_screen.apply_changes(changes)
@@ -1,6 +1,8 @@
 from kivy.uix.screenmanager import ScreenManager, Screen
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.scrollview import ScrollView
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
@@ -10,8 +12,14 @@ from kivy.core.clipboard import Clipboard
 from kivy.uix.dropdown import DropDown
 from kivy.metrics import dp
 from kivy.core.window import Window
-from datetime import datetime
+from kivy.clock import Clock
+import bisect
+import time
 from ui_controls import create_button, create_label, create_input_field, ProductItem, SuggestionItem
+from async_logic import AsyncAppLogic
+from log_config import get_logger
+
+logger = get_logger(__name__)
 
 # Устанавливаем минимальный размер для мобильных устройств
 Window.minimum_width = dp(300)
@@ -34,22 +42,46 @@ class MainLayout(ScreenManager):
     def __init__(self, logic):
         super().__init__()
         self.logic = logic
+        # Запросы к БД выполняются в фоне, результаты возвращаются в главный поток
+        self.async_logic = AsyncAppLogic(logic, schedule=lambda func: Clock.schedule_once(lambda dt: func()))
+        # Экраны создаются при первом обращении (переход или get_screen)
+        self.screen_factories = {
+            'login': LoginScreen,
+            'register': RegisterScreen,
+            'main': MainScreen,
+            'create_list': CreateListScreen,
+            'join_list': JoinListScreen,
+            'list_info': ListInfoScreen,
+            'add_item': AddItemScreen,
+            'history': HistoryScreen,
+            'suggestions': SuggestionsScreen,
+            'search': SearchScreen,
+        }
         # Начинаем с экрана авторизации
-        self.add_widget(LoginScreen(name='login', logic=logic))
-        self.add_widget(RegisterScreen(name='register', logic=logic))
-        self.add_widget(MainScreen(name='main', logic=logic))
-        self.add_widget(CreateListScreen(name='create_list', logic=logic))
-        self.add_widget(JoinListScreen(name='join_list', logic=logic))
-        self.add_widget(ListInfoScreen(name='list_info', logic=logic))
-        self.add_widget(AddItemScreen(name='add_item', logic=logic))
-        self.add_widget(HistoryScreen(name='history', logic=logic))
-        self.add_widget(SuggestionsScreen(name='suggestions', logic=logic))
+        self.build_screen('login')
+
+    def build_screen(self, name):
+        """Создает экран по фабрике из screen_factories и добавляет его"""
+        started = time.perf_counter()
+        screen = self.screen_factories[name](name=name, logic=self.logic, async_logic=self.async_logic)
+        self.add_widget(screen)
+        logger.debug("Экран %s создан за %.1f мс", name, (time.perf_counter() - started) * 1000)
+        return screen
+
+    def has_screen(self, name):
+        return name in self.screen_factories or super().has_screen(name)
+
+    def get_screen(self, name):
+        if name in self.screen_factories and not super().has_screen(name):
+            return self.build_screen(name)
+        return super().get_screen(name)
 
 
 class LoginScreen(Screen):
-    def __init__(self, name, logic):
+    def __init__(self, name, logic, async_logic):
         super().__init__(name=name)
         self.logic = logic
+        self.async_logic = async_logic
 
         # Главный контейнер с центрированием
         main_layout = BoxLayout(orientation='vertical', padding=dp(20))
@@ -111,26 +143,31 @@ class LoginScreen(Screen):
         password = self.password_input.text.strip()
 
         if username and password:
-            if self.logic.login_user(username, password):
-                self.message.text = "Успешный вход!"
-                # Обновляем главный экран
-                main_screen = self.manager.get_screen('main')
-                main_screen.update_user_info()
-                main_screen.load_user_lists()
-                self.manager.current = 'main'
-            else:
-                self.message.text = "Неверные данные"
+            self.message.text = "Вход..."
+            self.async_logic.login_user(username, password, callback=self.on_login)
         else:
             self.message.text = "Заполните все поля"
 
+    def on_login(self, success):
+        if success:
+            self.message.text = "Успешный вход!"
+            # Обновляем главный экран
+            main_screen = self.manager.get_screen('main')
+            main_screen.update_user_info()
+            main_screen.load_user_lists()
+            self.manager.current = 'main'
+        else:
+            self.message.text = "Неверные данные"
+
     def goto_register(self, instance):
         self.manager.current = 'register'
 
 
 class RegisterScreen(Screen):
-    def __init__(self, name, logic):
+    def __init__(self, name, logic, async_logic):
         super().__init__(name=name)
         self.logic = logic
+        self.async_logic = async_logic
 
         # Главный контейнер с центрированием
         main_layout = BoxLayout(orientation='vertical', padding=dp(20))
@@ -217,7 +254,11 @@ class RegisterScreen(Screen):
             self.message.text = "Пароль должен быть не менее 4 символов"
             return
 
-        if self.logic.register_user(username, password):
+        self.message.text = "Регистрация..."
+        self.async_logic.register_user(username, password, callback=self.on_register)
+
+    def on_register(self, success):
+        if success:
             self.message.text = "Регистрация успешна! Теперь войдите в систему"
             self.manager.current = 'login'
         else:
@@ -228,9 +269,19 @@ class RegisterScreen(Screen):
 
 
 class MainScreen(Screen):
-    def __init__(self, name, logic):
+    # Пока экран открыт, изменения других участников забираются с этим периодом (в секундах)
+    sync_interval = 5
+
+    def __init__(self, name, logic, async_logic):
         super().__init__(name=name)
         self.logic = logic
+        self.async_logic = async_logic
+        self.sync_event = None
+        self.sync_running = False
+        # sort_order строк products_view.data (в том же порядке) и товара по id:
+        # строка находится бинарным поиском, без обхода списка
+        self.row_orders = []
+        self.product_orders = {}
 
         layout = BoxLayout(orientation='vertical', padding=dp(15), spacing=dp(10))
 
@@ -310,12 +361,31 @@ class MainScreen(Screen):
         scroll_lists.add_widget(self.lists_layout)
         layout.add_widget(scroll_lists)
 
-        # Прокручиваемая область для списка товаров
-        scroll = ScrollView()
-        self.list_layout = GridLayout(cols=1, size_hint_y=None, spacing=dp(5))
-        self.list_layout.bind(minimum_height=self.list_layout.setter('height'))
-        scroll.add_widget(self.list_layout)
-        layout.add_widget(scroll)
+        # Сообщение о пустом списке (скрыто, когда есть товары)
+        self.list_status = Label(
+            text="",
+            font_size=dp(18),
+            color=(1, 1, 1, 1),
+            size_hint_y=None,
+            height=0,
+            halign='center'
+        )
+        layout.add_widget(self.list_status)
+
+        # Список товаров: RecycleView создает строки только для видимой области
+        self.products_view = RecycleView()
+        products_layout = RecycleBoxLayout(
+            orientation='vertical',
+            default_size=(None, dp(90)),
+            default_size_hint=(1, None),
+            size_hint_y=None,
+            spacing=dp(5)
+        )
+        products_layout.bind(minimum_height=products_layout.setter('height'))
+        self.products_view.add_widget(products_layout)
+        # viewclass хранится в layout manager: до add_widget присваивание теряется
+        self.products_view.viewclass = ProductItem
+        layout.add_widget(self.products_view)
 
         # Кнопки управления
         buttons = [
@@ -323,6 +393,7 @@ class MainScreen(Screen):
             ("ОЧИСТИТЬ СПИСОК", self.clear_list, (0.8, 0.2, 0, 1)),
             ("ИСТОРИЯ ПОКУПОК", self.goto_history, (0.2, 0.4, 0.8, 1)),
             ("УМНЫЕ ПРЕДЛОЖЕНИЯ", self.goto_suggestions, (1, 0.5, 0, 1)),
+            ("ПОИСК", self.goto_search, (0.3, 0.3, 0.6, 1)),
         ]
 
         for text, callback, color in buttons:
@@ -333,6 +404,32 @@ class MainScreen(Screen):
         self.add_widget(layout)
         self.update_display()
 
+    def on_enter(self):
+        if self.logic.sync_enabled() and self.sync_event is None:
+            self.sync_event = Clock.schedule_interval(self.request_sync, self.sync_interval)
+
+    def on_leave(self):
+        if self.sync_event is not None:
+            self.sync_event.cancel()
+            self.sync_event = None
+
+    def request_sync(self, *args):
+        """Синхронизирует текущий список с сервером в фоне"""
+        # Запрос к серверу идет в своем потоке и не задерживает операции с
+        # товарами; sync_running не дает синхронизациям копиться в очереди
+        if self.sync_running or not self.logic.current_list_id or not self.logic.sync_enabled():
+            return
+        self.sync_running = True
+        self.async_logic.sync_current_list(callback=self.on_synced, error_callback=self.on_sync_failed)
+
+    def on_synced(self, result):
+        self.sync_running = False
+        self.apply_result(result)
+
+    def on_sync_failed(self, error):
+        self.sync_running = False
+        logger.warning("Ошибка синхронизации: %s", error)
+
     def update_user_info(self):
         """Обновляет информацию о пользователе"""
         self.user_info.text = f"СОВМЕСТНЫЕ СПИСКИ\nПользователь: {self.logic.get_current_username()}"
@@ -340,7 +437,18 @@ class MainScreen(Screen):
     def load_user_lists(self):
         """Загружает списки пользователя"""
         self.lists_layout.clear_widgets()
-        lists = self.logic.get_user_lists()
+        self.lists_layout.add_widget(Label(
+            text="Загрузка...",
+            font_size=dp(14),
+            color=(0.8, 0.8, 0.8, 1),
+            size_hint_y=None,
+            height=dp(80)
+        ))
+        self.async_logic.get_user_lists(callback=self.show_user_lists)
+
+    def show_user_lists(self, lists):
+        """Показывает загруженные списки пользователя"""
+        self.lists_layout.clear_widgets()
 
         if not lists:
             empty_label = Label(
@@ -398,11 +506,18 @@ class MainScreen(Screen):
     def select_list(self, list_id):
         """Выбирает список для работы"""
         self.logic.set_current_list(list_id)
-        list_info = self.logic.get_current_list_info()
+        self.list_info.text = "Загрузка..."
+        self.async_logic.get_current_list_info(callback=self.show_selected_list)
+        self.request_sync()
+
+    def show_selected_list(self, list_info):
         if list_info:
             list_id, list_name, owner_id, owner_name, share_code = list_info
-            members = self.logic.get_list_members()
-            self.list_info.text = f"{list_name} (Участников: {len(members)})"
+
+            def show_members(members):
+                self.list_info.text = f"{list_name} (Участников: {len(members)})"
+
+            self.async_logic.get_list_members(callback=show_members)
             self.update_display()
 
     def show_list_info(self, list_id):
@@ -415,15 +530,16 @@ class MainScreen(Screen):
     def delete_list(self, list_id, list_name):
         """Удаляет список"""
 
-        def confirm_delete(instance):
-            result = self.logic.delete_shopping_list(list_id)
+        def on_deleted(result):
             print(result)
             self.load_user_lists()
-            if self.logic.current_list_id == list_id:
-                self.logic.current_list_id = None
+            if self.logic.current_list_id is None:
                 self.list_info.text = "Выберите список покупок"
                 self.update_display()
+
+        def confirm_delete(instance):
             popup.dismiss()
+            self.async_logic.delete_shopping_list(list_id, callback=on_deleted)
 
         content = BoxLayout(orientation='vertical', padding=dp(20), spacing=dp(15))
         content.add_widget(Label(
@@ -464,56 +580,139 @@ class MainScreen(Screen):
     def leave_current_list(self, instance):
         """Покидает текущий список"""
         if self.logic.current_list_id:
-            result = self.logic.leave_current_list()
-            print(result)
-            self.list_info.text = "Выберите список покупок"
-            self.load_user_lists()
-            self.update_display()
+            self.async_logic.leave_current_list(callback=self.on_left_list)
+
+    def on_left_list(self, result):
+        print(result)
+        self.list_info.text = "Выберите список покупок"
+        self.load_user_lists()
+        self.update_display()
 
     def logout(self, instance):
-        self.logic.logout_user()
+        self.async_logic.logout_user()
         self.manager.current = 'login'
 
-    def update_display(self):
-        self.list_layout.clear_widgets()
+    def show_list_status(self, text):
+        """Показывает сообщение вместо списка товаров"""
+        self.list_status.text = text
+        self.list_status.height = dp(120) if text else 0
+
+    def make_product_data(self, product_data):
+        """Преобразует строку из БД в словарь данных для ProductItem"""
+        if len(product_data) >= 4:
+            product_id, product_name, category, order = product_data[:4]
+            created_by = product_data[4] if len(product_data) > 4 else None
+            bought_by = product_data[5] if len(product_data) > 5 else None
+        else:
+            product_id, product_name = product_data
+            category = 'Другое'
+            order = 0
+            created_by = bought_by = None
+
+        return {
+            'product_id': product_id,
+            'product_name': product_name,
+            'category': category,
+            'sort_order': order,
+            'created_by': created_by,
+            'bought_by': bought_by,
+            'logic': self.logic,
+            'main_screen': self,
+        }
+
+    def set_rows(self, rows):
+        """Заменяет строки products_view вместе с индексом по sort_order"""
+        self.products_view.data = rows
+        self.row_orders = [row['sort_order'] for row in rows]
+        self.product_orders = {row['product_id']: row['sort_order'] for row in rows}
 
+    def update_display(self):
         if not self.logic.current_list_id:
-            empty_label = Label(
-                text="Выберите список покупок\n\nСоздайте новый список или выберите существующий",
-                font_size=dp(18),
-                color=(1, 1, 1, 1),
-                size_hint_y=None,
-                height=dp(120),
-                halign='center'
-            )
-            self.list_layout.add_widget(empty_label)
+            self.set_rows([])
+            self.show_list_status("Выберите список покупок\n\nСоздайте новый список или выберите существующий")
             return
 
-        products = self.logic.get_current_list()
+        self.set_rows([])
+        self.show_list_status("Загрузка...")
+        self.async_logic.get_current_list(callback=self.show_products)
+
+    def show_products(self, products):
+        """Показывает загруженные товары текущего списка"""
         if not products:
-            empty_label = Label(
-                text="Список покупок пустой\n\nДобавьте товары через кнопку ниже",
-                font_size=dp(18),
-                color=(1, 1, 1, 1),
-                size_hint_y=None,
-                height=dp(120),
-                halign='center'
-            )
-            self.list_layout.add_widget(empty_label)
+            self.set_rows([])
+            self.show_list_status("Список покупок пустой\n\nДобавьте товары через кнопку ниже")
             return
 
-        for product_data in products:
-            if len(product_data) >= 4:
-                product_id, product_name, category, order = product_data[:4]
-                created_by = product_data[4] if len(product_data) > 4 else None
-                bought_by = product_data[5] if len(product_data) > 5 else None
-            else:
-                product_id, product_name = product_data
-                category = 'Другое'
-                created_by = bought_by = None
+        self.show_list_status("")
+        self.set_rows([self.make_product_data(product_data) for product_data in products])
+
+    def find_product_index(self, product_id):
+        order = self.product_orders.get(product_id)
+        if order is None:
+            return None
+        data = self.products_view.data
+        index = bisect.bisect_left(self.row_orders, order)
+        # sort_order товаров, полученных синхронизацией, может совпадать
+        while index < len(data) and self.row_orders[index] == order:
+            if data[index]['product_id'] == product_id:
+                return index
+            index += 1
+        return None
+
+    def remove_row(self, product_id):
+        index = self.find_product_index(product_id)
+        if index is not None:
+            del self.products_view.data[index]
+            del self.row_orders[index]
+            del self.product_orders[product_id]
+
+    def insert_row(self, product_data):
+        item = self.make_product_data(product_data)
+        # Строки отсортированы по sort_order, вставляем на свое место
+        index = bisect.bisect_right(self.row_orders, item['sort_order'])
+        self.products_view.data.insert(index, item)
+        self.row_orders.insert(index, item['sort_order'])
+        self.product_orders[item['product_id']] = item['sort_order']
+
+    def move_product(self, from_index, to_index):
+        """Перемещает товар после перетаскивания в списке"""
+        data = self.products_view.data
+        if not 0 <= from_index < len(data):
+            return
+        to_index = min(max(to_index, 0), len(data) - 1)
+        if to_index != from_index:
+            self.async_logic.move_item(data[from_index]['product_id'], to_index, callback=self.apply_result)
+
+    def apply_result(self, result):
+        """Обрабатывает результат (сообщение, ChangeSet) операции над товарами"""
+        message, changes = result
+        self.apply_changes(changes)
+
+    def apply_changes(self, changes):
+        """Применяет ChangeSet к показанному списку, не перестраивая остальные строки"""
+        if changes.list_id is not None and changes.list_id != self.logic.current_list_id:
+            # Операция над списком, который уже не показан: он перечитается при выборе
+            return
+        if changes.reset or not self.logic.current_list_id:
+            self.update_display()
+            return
+
+        for product_id in changes.removed:
+            self.remove_row(product_id)
 
-            item = ProductItem(product_id, product_name, category, self.logic, self, created_by, bought_by)
-            self.list_layout.add_widget(item)
+        for product_data in changes.updated:
+            # sort_order мог измениться: строка переставляется
+            if self.find_product_index(product_data[0]) is not None:
+                self.remove_row(product_data[0])
+                self.insert_row(product_data)
+
+        for product_data in changes.inserted:
+            self.insert_row(product_data)
+
+        if self.products_view.data:
+            self.show_list_status("")
+        else:
+            self.show_list_status("Список покупок пустой\n\nДобавьте товары через кнопку ниже")
 
     def goto_create_list(self, instance):
         self.manager.current = 'create_list'
@@ -529,12 +728,15 @@ class MainScreen(Screen):
 
     def clear_list(self, instance):
         if self.logic.current_list_id:
-            result = self.logic.clear_all_items()
-            print(result)
-            self.update_display()
+            self.async_logic.clear_all_items(callback=self.on_list_cleared)
         else:
             print("Сначала выберите список")
 
+    def on_list_cleared(self, result):
+        message, changes = result
+        print(message)
+        self.apply_changes(changes)
+
     def goto_history(self, instance):
         if self.logic.current_list_id:
             history_screen = self.manager.get_screen('history')
@@ -551,11 +753,15 @@ class MainScreen(Screen):
         else:
             print("Сначала выберите список")
 
+    def goto_search(self, instance):
+        self.manager.current = 'search'
+
 
 class CreateListScreen(Screen):
-    def __init__(self, name, logic):
+    def __init__(self, name, logic, async_logic):
         super().__init__(name=name)
         self.logic = logic
+        self.async_logic = async_logic
 
         main_layout = BoxLayout(orientation='vertical', padding=dp(20))
         main_layout.add_widget(BoxLayout(size_hint_y=0.2))
@@ -595,20 +801,26 @@ class CreateListScreen(Screen):
         list_name = self.list_name_input.text.strip()
 
         if list_name:
-            list_id, result = self.logic.create_shared_list(list_name)
-            self.message.text = result
-            if list_id:
-                list_info = self.logic.get_current_list_info()
-                if list_info:
-                    share_code = list_info[4]
-                    self.show_share_code(share_code)
-                self.list_name_input.text = ""
-                main_screen = self.manager.get_screen('main')
-                main_screen.load_user_lists()
-                main_screen.select_list(list_id)
+            self.message.text = "Создание..."
+            self.async_logic.create_shared_list(list_name, callback=self.on_list_created)
         else:
             self.message.text = "Введите название списка!"
 
+    def on_list_created(self, result):
+        list_id, message = result
+        self.message.text = message
+        if list_id:
+            self.list_name_input.text = ""
+            self.async_logic.get_current_list_info(callback=self.on_list_info)
+            main_screen = self.manager.get_screen('main')
+            main_screen.load_user_lists()
+            main_screen.select_list(list_id)
+
+    def on_list_info(self, list_info):
+        if list_info:
+            share_code = list_info[4]
+            self.show_share_code(share_code)
+
     def show_share_code(self, share_code):
         content = BoxLayout(orientation='vertical', padding=dp(20), spacing=dp(15))
         content.add_widget(Label(
@@ -672,9 +884,10 @@ class CreateListScreen(Screen):
 
 
 class JoinListScreen(Screen):
-    def __init__(self, name, logic):
+    def __init__(self, name, logic, async_logic):
         super().__init__(name=name)
         self.logic = logic
+        self.async_logic = async_logic
 
         main_layout = BoxLayout(orientation='vertical', padding=dp(20))
         main_layout.add_widget(BoxLayout(size_hint_y=0.2))
@@ -710,24 +923,30 @@ class JoinListScreen(Screen):
     def join_list(self, instance):
         share_code = self.code_input.text.strip()
         if share_code:
-            result = self.logic.join_shared_list(share_code)
-            self.message.text = result
-            if "успешно" in result.lower():
-                self.code_input.text = ""
-                main_screen = self.manager.get_screen('main')
-                main_screen.load_user_lists()
-                self.manager.current = 'main'
+            self.message.text = "Подключение..."
+            self.async_logic.join_shared_list(share_code, callback=self.on_joined)
         else:
             self.message.text = "Введите код списка!"
 
+    def on_joined(self, result):
+        self.message.text = result
+        if "успешно" in result.lower():
+            self.code_input.text = ""
+            main_screen = self.manager.get_screen('main')
+            main_screen.load_user_lists()
+            self.manager.current = 'main'
+
     def go_back(self, instance):
         self.manager.current = 'main'
 
 
 class ListInfoScreen(Screen):
-    def __init__(self, name, logic):
+    def __init__(self, name, logic, async_logic):
         super().__init__(name=name)
         self.logic = logic
+        self.async_logic = async_logic
+
+        self.list_info_data = None
 
         layout = BoxLayout(orientation='vertical', padding=dp(20), spacing=dp(15))
         layout.add_widget(create_label("ИНФОРМАЦИЯ О СПИСКЕ", dp(24), (1, 1, 1, 1)))
@@ -765,7 +984,12 @@ class ListInfoScreen(Screen):
 
     def update_info(self):
         """Обновляет информацию при входе на экран"""
-        list_info = self.logic.get_current_list_info()
+        self.list_info_label.text = "Загрузка..."
+        self.members_layout.clear_widgets()
+        self.async_logic.get_current_list_info(callback=self.show_info)
+
+    def show_info(self, list_info):
+        self.list_info_data = list_info
         if list_info:
             list_id, list_name, owner_id, owner_name, share_code = list_info
             current_user_id = self.logic.db.get_current_user_id()
@@ -779,23 +1003,28 @@ class ListInfoScreen(Screen):
             # Показываем/скрываем кнопку кода в зависимости от прав
             self.code_btn.disabled = (owner_id != current_user_id)
 
-            # Показываем участников
-            self.members_layout.clear_widgets()
-            members = self.logic.get_list_members()
-            for member in members:
-                is_owner = (member == owner_name)
-                member_text = f"{member} (владелец)" if is_owner else f"{member}"
-                member_label = Label(
-                    text=member_text,
-                    size_hint_y=None,
-                    height=dp(30),
-                    color=(1, 1, 1, 1),
-                    font_size=dp(14)
-                )
-                self.members_layout.add_widget(member_label)
+            self.async_logic.get_list_members(callback=self.show_members)
+
+    def show_members(self, members):
+        """Показывает участников списка"""
+        self.members_layout.clear_widgets()
+        if not self.list_info_data:
+            return
+        owner_name = self.list_info_data[3]
+        for member in members:
+            is_owner = (member == owner_name)
+            member_text = f"{member} (владелец)" if is_owner else f"{member}"
+            member_label = Label(
+                text=member_text,
+                size_hint_y=None,
+                height=dp(30),
+                color=(1, 1, 1, 1),
+                font_size=dp(14)
+            )
+            self.members_layout.add_widget(member_label)
 
     def show_code(self, instance):
-        list_info = self.logic.get_current_list_info()
+        list_info = self.list_info_data
         if list_info:
             list_id, list_name, owner_id, owner_name, share_code = list_info
 
@@ -873,9 +1102,15 @@ class ListInfoScreen(Screen):
 
 
 class AddItemScreen(Screen):
-    def __init__(self, name, logic):
+    # Подсказки запрашиваются, когда ввод замер на это время (в секундах)
+    completion_delay = 0.25
+
+    def __init__(self, name, logic, async_logic):
         super().__init__(name=name)
         self.logic = logic
+        self.async_logic = async_logic
+
+        self.last_product = None
 
         layout = BoxLayout(orientation='vertical', padding=dp(20), spacing=dp(15))
         layout.add_widget(create_label("ДОБАВИТЬ ТОВАР", dp(24), (1, 1, 1, 1)))
@@ -905,10 +1140,23 @@ class AddItemScreen(Screen):
         )
         layout.add_widget(self.last_product_info)
 
-        # Поле ввода названия
-        self.input_field = create_input_field("Введите название товара")
+        # Поле ввода названия; можно вставить список, по одному товару в строке
+        self.input_field = TextInput(
+            hint_text="Введите название товара\n(или вставьте список, по товару в строке)",
+            size_hint_y=None,
+            height=dp(100),
+            multiline=True,
+            font_size=dp(18),
+            padding=[dp(15), dp(15)]
+        )
+        self.input_field.bind(text=self.on_input_text)
         layout.add_widget(self.input_field)
 
+        # Подсказки по началу названия в последней строке ввода
+        self.completions_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=dp(44), spacing=dp(5))
+        layout.add_widget(self.completions_layout)
+        self.completion_trigger = Clock.create_trigger(self.request_completions, self.completion_delay)
+
         # Выбор категории с выпадающим списком
         category_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=dp(50), spacing=dp(10))
         category_label = Label(text="Категория:", size_hint_x=0.3, color=(1, 1, 1, 1), font_size=dp(16))
@@ -923,6 +1171,8 @@ class AddItemScreen(Screen):
         )
         self.category_btn.bind(on_press=self.show_category_dropdown)
         category_layout.add_widget(self.category_btn)
+        # True, если категорию выбрали вручную: тогда предсказание ее не меняет
+        self.category_chosen = False
 
         layout.add_widget(category_layout)
 
@@ -958,27 +1208,90 @@ class AddItemScreen(Screen):
     def on_enter(self):
         """Очищаем поля при входе на экран"""
         self.input_field.text = ""
-        self.category_btn.text = "Другое"
+        self.reset_category()
         self.message.text = ""
         self.update_info()
 
+    def current_prefix(self):
+        lines = self.input_field.text.split("\n")
+        return lines[-1].strip()
+
+    def on_input_text(self, instance, text):
+        # Перезапускаем таймер на каждое нажатие: запрос уходит после паузы в наборе
+        self.completion_trigger.cancel()
+        self.completion_trigger()
+
+    def request_completions(self, *args):
+        prefix = self.current_prefix()
+        if not prefix:
+            self.completions_layout.clear_widgets()
+            self.show_predicted_category(None, prefix)
+            return
+        self.async_logic.complete_product_name(
+            prefix,
+            callback=lambda names: self.show_completions(names, prefix)
+        )
+        self.async_logic.predict_category(
+            prefix,
+            callback=lambda category: self.show_predicted_category(category, prefix)
+        )
+
+    def show_predicted_category(self, category, prefix):
+        """Подставляет предсказанную категорию, пока пользователь не выбрал свою"""
+        if self.category_chosen or prefix != self.current_prefix():
+            return
+        self.category_btn.text = category or "Другое"
+
+    def reset_category(self):
+        self.category_chosen = False
+        self.category_btn.text = "Другое"
+
+    def show_completions(self, names, prefix):
+        """Показывает подсказки, если ввод не изменился с момента запроса"""
+        if prefix != self.current_prefix():
+            return
+        self.completions_layout.clear_widgets()
+        for product_name in names:
+            btn = Button(
+                text=product_name,
+                background_color=(0.3, 0.3, 0.5, 1),
+                font_size=dp(14),
+                shorten=True
+            )
+            btn.bind(on_press=lambda btn_instance, name=product_name: self.select_completion(name))
+            self.completions_layout.add_widget(btn)
+
+    def select_completion(self, product_name):
+        """Подставляет подсказку вместо последней строки ввода"""
+        lines = self.input_field.text.split("\n")
+        lines[-1] = product_name
+        self.input_field.text = "\n".join(lines)
+        self.completions_layout.clear_widgets()
+
     def show_category_dropdown(self, instance):
         """Показывает выпадающий список категорий"""
         self.category_dropdown.open(instance)
 
     def select_category(self, category):
         """Выбирает категорию из выпадающего списка"""
+        self.category_chosen = True
         self.category_btn.text = category
         self.category_dropdown.dismiss()
 
     def update_info(self, *args):
         """Обновляет информацию о списке и последнем товаре"""
-        list_info = self.logic.get_current_list_info()
+        self.last_product_info.text = "Загрузка..."
+        self.repeat_btn.disabled = True
+        self.async_logic.get_current_list_info(callback=self.show_list_info)
+        self.async_logic.get_last_purchased_product(callback=self.show_last_product)
+
+    def show_list_info(self, list_info):
         if list_info:
             list_id, list_name, owner_id, owner_name, share_code = list_info
             self.current_list_info.text = f"Список: {list_name}"
 
-        last_product = self.logic.get_last_purchased_product()
+    def show_last_product(self, last_product):
+        self.last_product = last_product
         if last_product:
             self.last_product_info.text = f"Последний купленный: {last_product}"
             self.repeat_btn.disabled = False
@@ -988,7 +1301,7 @@ class AddItemScreen(Screen):
 
     def repeat_last_product(self, instance):
         """Добавляет последний купленный товар в список"""
-        last_product = self.logic.get_last_purchased_product()
+        last_product = self.last_product
         if last_product:
             self.input_field.text = last_product
             self.message.text = f"'{last_product}' готов к добавлению"
@@ -996,44 +1309,74 @@ class AddItemScreen(Screen):
             self.message.text = "Нет истории покупок"
 
     def add_item(self, instance):
-        product_name = self.input_field.text.strip()
-        category = self.category_btn.text
-
-        if product_name:
-            result = self.logic.add_item(product_name, category)
-            self.message.text = result
-            if "добавлен" in result.lower():
-                self.input_field.text = ""
-                # Сбрасываем категорию на "Другое"
-                self.category_btn.text = "Другое"
-                self.manager.get_screen('main').update_display()
+        product_names = [line.strip() for line in self.input_field.text.splitlines() if line.strip()]
+        # Без явного выбора категория предсказывается для каждого товара
+        category = self.category_btn.text if self.category_chosen else None
+
+        if len(product_names) == 1:
+            self.async_logic.add_item(product_names[0], category, callback=self.on_item_added)
+        elif product_names:
+            self.async_logic.add_items(product_names, category, callback=self.on_item_added)
         else:
             self.message.text = "Введите название товара!"
 
+    def on_item_added(self, result):
+        message, changes = result
+        self.message.text = message
+        if not changes.is_empty():
+            self.input_field.text = ""
+            # Сбрасываем категорию на "Другое"
+            self.reset_category()
+            self.manager.get_screen('main').apply_changes(changes)
+
     def go_back(self, instance):
         self.manager.current = 'main'
 
 
 class HistoryScreen(Screen):
-    def __init__(self, name, logic):
+    def __init__(self, name, logic, async_logic):
         super().__init__(name=name)
         self.logic = logic
+        self.async_logic = async_logic
 
         layout = BoxLayout(orientation='vertical', padding=dp(20), spacing=dp(10))
 
-        # Информация о текущем списке
-        list_info = self.logic.get_current_list_info()
-        if list_info:
-            list_name = list_info[1]
-            layout.add_widget(create_label(f"ИСТОРИЯ ПОКУПОК: {list_name}", dp(24), (1, 1, 1, 1)))
-        else:
-            layout.add_widget(create_label("ИСТОРИЯ ПОКУПОК", dp(24), (1, 1, 1, 1)))
+        # Название текущего списка подставляется в update_display
+        self.title_label = create_label("ИСТОРИЯ ПОКУПОК", dp(24), (1, 1, 1, 1))
+        layout.add_widget(self.title_label)
 
-        scroll = ScrollView()
-        self.history_layout = GridLayout(cols=1, size_hint_y=None, spacing=dp(5))
-        self.history_layout.bind(minimum_height=self.history_layout.setter('height'))
-        scroll.add_widget(self.history_layout)
-        layout.add_widget(scroll)
+        self.history_status = Label(
+            text="",
+            font_size=dp(18),
+            color=(1, 1, 1, 1),
+            size_hint_y=None,
+            height=0,
+            text_size=(dp(350), None),
+            halign='center',
+            valign='middle'
+        )
+        layout.add_widget(self.history_status)
+
+        # История подгружается страницами по мере прокрутки вниз
+        self.history_view = RecycleView()
+        history_layout = RecycleBoxLayout(
+            orientation='vertical',
+            default_size=(None, dp(80)),
+            default_size_hint=(1, None),
+            size_hint_y=None,
+            spacing=dp(5)
+        )
+        history_layout.bind(minimum_height=history_layout.setter('height'))
+        self.history_view.add_widget(history_layout)
+        # viewclass хранится в layout manager: до add_widget присваивание теряется
+        self.history_view.viewclass = Label
+        self.history_view.bind(scroll_y=self.on_history_scroll)
+        layout.add_widget(self.history_view)
+
+        # Курсор следующей страницы и номер загрузки (чтобы отбросить устаревшие ответы)
+        self.next_cursor = None
+        self.loading_page = False
+        self.load_generation = 0
 
         back_btn = create_button("НАЗАД", (0.5, 0.5, 0.5, 1), height=dp(50))
         back_btn.bind(on_press=self.go_back)
@@ -1041,88 +1384,229 @@ class HistoryScreen(Screen):
 
         self.add_widget(layout)
 
+    def show_history_status(self, text):
+        """Показывает сообщение вместо истории покупок"""
+        self.history_status.text = text
+        self.history_status.height = dp(100) if text else 0
+
     def update_display(self):
-        self.history_layout.clear_widgets()
+        self.load_generation += 1
+        self.history_view.data = []
+        self.next_cursor = None
+        self.loading_page = False
 
         if not self.logic.current_list_id:
-            empty_label = Label(
-                text="Выберите список покупок для просмотра истории",
-                font_size=dp(18),
-                color=(1, 1, 1, 1),
-                size_hint_y=None,
-                height=dp(100),
-                text_size=(dp(350), None),
-                halign='center',
-                valign='middle'
-            )
-            self.history_layout.add_widget(empty_label)
+            self.title_label.text = "ИСТОРИЯ ПОКУПОК"
+            self.show_history_status("Выберите список покупок для просмотра истории")
             return
 
-        history = self.logic.get_purchase_history()
+        self.show_history_status("Загрузка...")
+        self.async_logic.get_current_list_info(callback=self.show_title)
+        self.load_page()
 
-        if not history:
-            empty_label = Label(
-                text="История покупок пуста\n\nОтмечайте товары купленными",
-                font_size=dp(18),
-                color=(1, 1, 1, 1),
-                size_hint_y=None,
-                height=dp(100),
-                text_size=(dp(350), None),
-                halign='center',
-                valign='middle'
-            )
-            self.history_layout.add_widget(empty_label)
+    def show_title(self, list_info):
+        self.title_label.text = f"ИСТОРИЯ ПОКУПОК: {list_info[1]}" if list_info else "ИСТОРИЯ ПОКУПОК"
+
+    def load_page(self):
+        """Запрашивает следующую страницу истории в фоне"""
+        self.loading_page = True
+        generation = self.load_generation
+        self.async_logic.get_purchase_history_page(
+            self.next_cursor,
+            callback=lambda result: self.show_history_page(result, generation)
+        )
+
+    def on_history_scroll(self, view, scroll_y):
+        # scroll_y == 0 соответствует нижнему краю списка
+        if scroll_y <= 0.05 and self.next_cursor is not None and not self.loading_page:
+            self.load_page()
+
+    def show_history_page(self, result, generation):
+        """Добавляет загруженную страницу истории в конец списка"""
+        if generation != self.load_generation:
+            return
+        history, self.next_cursor = result
+        self.loading_page = False
+
+        if not history and not self.history_view.data:
+            self.show_history_status("История покупок пуста\n\nОтмечайте товары купленными")
+            return
+
+        self.show_history_status("")
+        self.history_view.data.extend(self.make_history_data(item) for item in history)
+
+    @staticmethod
+    def format_date(bought_date):
+        """Переводит 'ГГГГ-ММ-ДД ЧЧ:ММ:СС' в 'ДД.ММ.ГГГГ ЧЧ:ММ' без разбора через strptime"""
+        if not bought_date:
+            return "Дата неизвестна"
+        if len(bought_date) < 16:
+            return bought_date
+        return f"{bought_date[8:10]}.{bought_date[5:7]}.{bought_date[0:4]} {bought_date[11:16]}"
+
+    def make_history_data(self, item):
+        """Преобразует строку истории в словарь данных для Label"""
+        product_name, category, bought_by, bought_date = item
+        bought_by_text = bought_by if bought_by else "Неизвестно"
+
+        item_text = f"{product_name}\n"
+        item_text += f"Категория: {category}\n"
+        item_text += f"Купил: {bought_by_text}\n"
+        item_text += f"Дата: {self.format_date(bought_date)}"
+
+        return {
+            'text': item_text,
+            'font_size': dp(14),
+            'color': (1, 1, 1, 1),
+            'text_size': (dp(350), None),
+            'halign': 'left',
+            'valign': 'middle'
+        }
+
+    def go_back(self, instance):
+        self.manager.current = 'main'
+
+
+class SearchScreen(Screen):
+    """Поиск товаров и покупок во всех списках пользователя"""
+
+    def __init__(self, name, logic, async_logic):
+        super().__init__(name=name)
+        self.logic = logic
+        self.async_logic = async_logic
+
+        layout = BoxLayout(orientation='vertical', padding=dp(20), spacing=dp(10))
+        layout.add_widget(create_label("ПОИСК ПО СПИСКАМ", dp(24), (1, 1, 1, 1)))
+
+        search_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=dp(50), spacing=dp(10))
+        self.search_input = create_input_field("Название или категория")
+        self.search_input.bind(on_text_validate=self.start_search)
+        search_layout.add_widget(self.search_input)
+        search_btn = Button(
+            text="НАЙТИ",
+            size_hint_x=0.35,
+            background_color=(0.2, 0.4, 0.8, 1),
+            font_size=dp(16)
+        )
+        search_btn.bind(on_press=self.start_search)
+        search_layout.add_widget(search_btn)
+        layout.add_widget(search_layout)
+
+        self.search_status = Label(
+            text="",
+            font_size=dp(18),
+            color=(1, 1, 1, 1),
+            size_hint_y=None,
+            height=0,
+            text_size=(dp(350), None),
+            halign='center',
+            valign='middle'
+        )
+        layout.add_widget(self.search_status)
+
+        # Результаты подгружаются страницами по мере прокрутки вниз
+        self.results_view = RecycleView()
+        results_layout = RecycleBoxLayout(
+            orientation='vertical',
+            default_size=(None, dp(70)),
+            default_size_hint=(1, None),
+            size_hint_y=None,
+            spacing=dp(5)
+        )
+        results_layout.bind(minimum_height=results_layout.setter('height'))
+        self.results_view.add_widget(results_layout)
+        # viewclass хранится в layout manager: до add_widget присваивание теряется
+        self.results_view.viewclass = Label
+        self.results_view.bind(scroll_y=self.on_results_scroll)
+        layout.add_widget(self.results_view)
+
+        self.query = ""
+        self.next_offset = None
+        self.loading_page = False
+        self.search_generation = 0
+
+        back_btn = create_button("НАЗАД", (0.5, 0.5, 0.5, 1), height=dp(50))
+        back_btn.bind(on_press=self.go_back)
+        layout.add_widget(back_btn)
+
+        self.add_widget(layout)
+
+    def show_search_status(self, text):
+        self.search_status.text = text
+        self.search_status.height = dp(100) if text else 0
+
+    def start_search(self, instance):
+        self.search_generation += 1
+        self.query = self.search_input.text.strip()
+        self.results_view.data = []
+        self.next_offset = None
+        self.loading_page = False
+
+        if not self.query:
+            self.show_search_status("Введите название товара или категорию")
+            return
+
+        self.show_search_status("Поиск...")
+        self.next_offset = 0
+        self.load_page()
+
+    def load_page(self):
+        """Запрашивает следующую страницу результатов в фоне"""
+        self.loading_page = True
+        generation = self.search_generation
+        self.async_logic.search(
+            self.query, self.next_offset,
+            callback=lambda result: self.show_results_page(result, generation)
+        )
+
+    def on_results_scroll(self, view, scroll_y):
+        if scroll_y <= 0.05 and self.next_offset is not None and not self.loading_page:
+            self.load_page()
+
+    def show_results_page(self, result, generation):
+        if generation != self.search_generation:
+            return
+        rows, self.next_offset = result
+        self.loading_page = False
+
+        if not rows and not self.results_view.data:
+            self.show_search_status("Ничего не найдено")
+            return
+
+        self.show_search_status("")
+        self.results_view.data.extend(self.make_result_data(row) for row in rows)
+
+    def make_result_data(self, row):
+        source, list_id, list_name, product_name, category, bought_date = row
+        if source == 'item':
+            status = "Сейчас в списке покупок"
         else:
-            for item in history:
-                product_name, category, bought_by, bought_date = item
-                bought_by_text = bought_by if bought_by else "Неизвестно"
-
-                # Форматируем дату для лучшего отображения
-                if bought_date:
-                    try:
-                        # Преобразуем строку даты в читаемый формат
-                        date_obj = datetime.strptime(bought_date, '%Y-%m-%d %H:%M:%S')
-                        formatted_date = date_obj.strftime('%d.%m.%Y %H:%M')
-                    except:
-                        formatted_date = bought_date
-                else:
-                    formatted_date = "Дата неизвестна"
-
-                item_text = f"{product_name}\n"
-                item_text += f"Категория: {category}\n"
-                item_text += f"Купил: {bought_by_text}\n"
-                item_text += f"Дата: {formatted_date}"
-
-                item_label = Label(
-                    text=item_text,
-                    font_size=dp(14),
-                    size_hint_y=None,
-                    height=dp(80),
-                    color=(1, 1, 1, 1),
-                    text_size=(dp(350), None),
-                    halign='left',
-                    valign='middle'
-                )
-                self.history_layout.add_widget(item_label)
+            status = f"Куплено: {HistoryScreen.format_date(bought_date)}"
+
+        return {
+            'text': f"{product_name} ({category})\nСписок: {list_name}\n{status}",
+            'font_size': dp(14),
+            'color': (1, 1, 1, 1),
+            'text_size': (dp(350), None),
+            'halign': 'left',
+            'valign': 'middle'
+        }
 
     def go_back(self, instance):
         self.manager.current = 'main'
 
 
 class SuggestionsScreen(Screen):
-    def __init__(self, name, logic):
+    def __init__(self, name, logic, async_logic):
         super().__init__(name=name)
         self.logic = logic
+        self.async_logic = async_logic
 
         layout = BoxLayout(orientation='vertical', padding=dp(20), spacing=dp(10))
 
-        # Информация о текущем списке
-        list_info = self.logic.get_current_list_info()
-        if list_info:
-            list_name = list_info[1]
-            layout.add_widget(create_label(f"ПРЕДЛОЖЕНИЯ: {list_name}", dp(24), (1, 1, 1, 1)))
-        else:
-            layout.add_widget(create_label("УМНЫЕ ПРЕДЛОЖЕНИЯ", dp(24), (1, 1, 1, 1)))
+        # Название текущего списка подставляется в update_display
+        self.title_label = create_label("УМНЫЕ ПРЕДЛОЖЕНИЯ", dp(24), (1, 1, 1, 1))
+        layout.add_widget(self.title_label)
 
         scroll = ScrollView()
         self.suggestions_layout = GridLayout(cols=1, size_hint_y=None, spacing=dp(10))
@@ -1138,7 +1622,22 @@ class SuggestionsScreen(Screen):
 
     def update_display(self):
         self.suggestions_layout.clear_widgets()
-        suggestions = self.logic.get_smart_suggestions()
+        self.suggestions_layout.add_widget(Label(
+            text="Загрузка...",
+            font_size=dp(18),
+            color=(1, 1, 1, 1),
+            size_hint_y=None,
+            height=dp(100)
+        ))
+        self.async_logic.get_current_list_info(callback=self.show_title)
+        self.async_logic.get_smart_suggestions(callback=self.show_suggestions)
+
+    def show_title(self, list_info):
+        self.title_label.text = f"ПРЕДЛОЖЕНИЯ: {list_info[1]}" if list_info else "УМНЫЕ ПРЕДЛОЖЕНИЯ"
+
+    def show_suggestions(self, suggestions):
+        """Показывает загруженные предложения"""
+        self.suggestions_layout.clear_widgets()
 
         if not suggestions:
             empty_label = Label(
@@ -1156,12 +1655,14 @@ class SuggestionsScreen(Screen):
             for item in suggestions:
                 product_name = item[0]
                 count = item[1]
+                is_due = item[2] if len(item) > 2 else False
 
                 suggestion_item = SuggestionItem(
                     product_name=product_name,
                     count=count,
                     logic=self.logic,
-                    suggestions_screen=self
+                    suggestions_screen=self,
+                    is_due=is_due
                 )
                 self.suggestions_layout.add_widget(suggestion_item)
 